@@ -0,0 +1,94 @@
+import functools
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from api.models.table_version import TableVersion
+
+
+@dataclass
+class Validators:
+    """条件付きGETの検証子（本体をシリアライズせずに求められる値から作る）"""
+    etag: str
+    last_modified: datetime | None = None
+
+
+def table_version_validators(*names: str) -> Validators:
+    """テーブルのバージョン番号（TableVersion）から検証子を作る"""
+    versions = dict(TableVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    return Validators(etag='-'.join(f"{name}.{versions.get(name, 0)}" for name in names))
+
+
+def queryset_validators(queryset, field: str = 'updated_at') -> Validators:
+    """
+    クエリセットの最終更新日時と件数から検証子を作る（削除は件数の変化で検出）
+    update()で更新日時を書き換えない変更は検出できないため、その場合はtable_version_validatorsを使う
+    """
+    summary = queryset.order_by().aggregate(last_modified=Max(field), count=Count('pk'))
+    last_modified = summary['last_modified']
+    stamp = last_modified.timestamp() if last_modified else 0
+    return Validators(etag=f"{summary['count']}-{stamp}", last_modified=last_modified)
+
+
+def _make_etag(request: Request, validators: Validators) -> str:
+    # 同じ検証子でも表現が変わる要素（クエリ文字列・Accept）を含めてハッシュ化
+    seed = f"{validators.etag}|{request.get_full_path()}|{request.headers.get('Accept', '')}"
+    return quote_etag(hashlib.sha1(seed.encode()).hexdigest()[:20])
+
+
+def _not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # 弱い比較（W/付きも同じタグとして扱う）
+        client_etags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+        return '*' in client_etags or etag in client_etags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if last_modified is not None and if_modified_since is not None:
+        return int(last_modified.timestamp()) <= if_modified_since
+    return False
+
+
+def conditional_get(validators_func, cache_control: str = 'no-cache'):
+    """
+    DRFのビュー（関数ビュー・APIView/ViewSetのメソッド）に条件付きGETを付ける
+    - validators_func(request, **kwargs)で検証子を求め、If-None-Match / If-Modified-Sinceが一致すれば本体を作らずに304を返す
+    - 200の場合はETag / Last-Modified / Cache-Controlを付与する
+    - validators_funcがNoneを返した場合（対象が存在しない等）は通常通り処理する
+
+    使用例:
+        @conditional_get(lambda request, **kwargs: table_version_validators('menus'), cache_control='public, max-age=60')
+        def list(self, request, *args, **kwargs):
+            return super().list(request, *args, **kwargs)
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(*args, **kwargs):
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(*args, **kwargs)
+
+            validators = validators_func(request, **kwargs)
+            if validators is None:
+                return view_func(*args, **kwargs)
+
+            etag = _make_etag(request, validators)
+            headers = {'ETag': etag, 'Cache-Control': cache_control}
+            if validators.last_modified is not None:
+                headers['Last-Modified'] = http_date(validators.last_modified.timestamp())
+
+            if _not_modified(request, etag, validators.last_modified):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            response = view_func(*args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                for name, value in headers.items():
+                    response[name] = value
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from api.models.library import Library
+from api.models.menu import Menu
+
+
+class Command(BaseCommand):
+    help = 'Libraryのused_form_dataからカテゴリID・メニューIDを取り出し、未設定の既存行を分割して補完します（エンジンはメニューの現在の値で補完）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='1回のトランザクションで補完する行数',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='バッチ間の待機秒数（本番DBへの負荷を抑える場合に指定）',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実際の補完を行わず、補完できる件数を表示するだけ',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        # used_form_dataにカテゴリがない行はメニューの現在のカテゴリで補う
+        menu_categories = dict(Menu.objects.values_list('id', 'category_id'))
+        # 生成時のエンジンが記録されていない行はメニューの現在のエンジンで補う
+        menu_engines = dict(Menu.objects.values_list('id', 'engine'))
+
+        checked = 0
+        filled = 0
+        last_pk = None
+        while True:
+            # 主キー順に未設定の行を走査（補完できない行も再走査しないようにキーセットで進める）
+            batch = Library.objects.filter(Q(category_id__isnull=True) | Q(menu_id__isnull=True)).order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            rows = list(batch.values('pk', 'used_form_data', 'category_id', 'menu_id', 'engine')[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1]['pk']
+            checked += len(rows)
+
+            updates = []
+            for row in rows:
+                category_id, menu_id = Library.extract_form_dimensions(row['used_form_data'])
+                menu_id = row['menu_id'] if row['menu_id'] is not None else menu_id
+                category_id = row['category_id'] if row['category_id'] is not None else category_id
+                if category_id is None and menu_id is not None:
+                    category_id = menu_categories.get(menu_id)
+                engine = row['engine'] or menu_engines.get(menu_id, '')
+                if (category_id, menu_id, engine) != (row['category_id'], row['menu_id'], row['engine']):
+                    updates.append(Library(pk=row['pk'], category_id=category_id, menu_id=menu_id, engine=engine))
+            filled += len(updates)
+
+            if updates and not dry_run:
+                with transaction.atomic():
+                    Library.objects.bulk_update(updates, ['category_id', 'menu_id', 'engine'])
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+
+            self.stdout.write(f'⏳ 確認: {checked}件 / 補完: {filled}件')
+
+        self.stdout.write(f'🔍 確認: {checked}件 / 補完対象: {filled}件')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: 実際の補完は行われません'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'✅ カテゴリID・メニューIDを{filled}件補完しました'))
+        if filled:
+            self.stdout.write('💡 日次集計に反映するには rollup_generation_stats --all を実行してください')
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models.generation_job import GenerationJob
+
+
+class Command(BaseCommand):
+    help = '期限切れの冪等性キーを解放し、保持件数の上限（IDEMPOTENCY_MAX_KEYS）を超えた古いキーを解放します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実際の解放を行わず、対象件数を表示するだけ',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        active = GenerationJob.objects.filter(idempotency_key__isnull=False)
+
+        # 期限切れのキー
+        expired = active.filter(expires_at__lte=timezone.now())
+        expired_count = expired.count()
+
+        # 上限を超えた古いキー（新しい順に上限件数を残す）
+        max_keys = getattr(settings, 'IDEMPOTENCY_MAX_KEYS', 100000)
+        overflow_ids = list(
+            active.filter(expires_at__gt=timezone.now())
+            .order_by('-created_at')
+            .values_list('id', flat=True)[max_keys:]
+        )
+
+        self.stdout.write(f'🔍 期限切れ: {expired_count}件 / 上限超過: {len(overflow_ids)}件')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: 実際の解放は行われません'))
+            return
+
+        released = expired.update(idempotency_key=None)
+        if overflow_ids:
+            released += GenerationJob.objects.filter(id__in=overflow_ids).update(idempotency_key=None)
+        self.stdout.write(self.style.SUCCESS(f'✅ 冪等性キーを{released}件解放しました'))
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models.car_settings import CarSettings
+from api.models.library import Library
+from api.services.gcs_upload_service import gcs_upload_service
+from api.services.public_feed_service import refresh_public_feed_entries
+from api.services.rehost_service import gcs_url_prefixes, is_gcs_url
+
+CAR_SETTINGS_IMAGE_FIELDS = (
+    'logo_mark_image_url',
+    'original_number_image_url',
+    'car_photo_front_url',
+    'car_photo_side_url',
+    'car_photo_rear_url',
+    'car_photo_diagonal_url',
+)
+
+
+class Command(BaseCommand):
+    help = 'GCSに保存済みで派生画像（WebPサムネイル）のない画像について、派生画像を並列に作成して記録します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='並列に処理する画像数（GCSのダウンロード・エンコード・アップロード）',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='1回のクエリで取得する行数',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='処理する最大件数（未指定時は全件）',
+        )
+        parser.add_argument(
+            '--car-settings',
+            action='store_true',
+            help='愛車設定の画像も対象にする',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実際の作成を行わず、対象件数を表示するだけ',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f'🔍 対象（タイムライン）: {self._library_targets().count()}件')
+            if options['car_settings']:
+                self.stdout.write(f'🔍 対象（愛車設定）: {CarSettings.objects.filter(image_variants={}).count()}件')
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: 実際の作成は行われません'))
+            return
+
+        # DBの読み書きはメインスレッドで行い、ワーカーはGCSの処理（取得・縮小・アップロード）のみ行う
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            processed, created = self._process_library(pool, options['batch_size'], options['limit'])
+            self.stdout.write(self.style.SUCCESS(f'✅ タイムライン: {processed}件中{created}件の派生画像を作成しました'))
+            if options['car_settings']:
+                processed, created = self._process_car_settings(pool, options['batch_size'])
+                self.stdout.write(self.style.SUCCESS(f'✅ 愛車設定: {processed}件中{created}件の派生画像を作成しました'))
+
+    @staticmethod
+    def _library_targets():
+        gcs_url = Q()
+        for prefix in gcs_url_prefixes():
+            gcs_url |= Q(image_url__startswith=prefix)
+        return Library.objects.filter(gcs_url, rehost_status='hosted', image_variants={})
+
+    def _process_library(self, pool: ThreadPoolExecutor, batch_size: int, limit: int | None) -> tuple[int, int]:
+        processed = 0
+        created = 0
+        last_pk = None
+        while limit is None or processed < limit:
+            # 作成に失敗した行も再取得しないよう主キーのキーセットで進める
+            batch = self._library_targets().order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            size = batch_size if limit is None else min(batch_size, limit - processed)
+            rows = list(batch.values('pk', 'image_url', 'is_public')[:size])
+            if not rows:
+                break
+            last_pk = rows[-1]['pk']
+            processed += len(rows)
+
+            results = pool.map(lambda row: gcs_upload_service.create_variants_for_url(row['image_url']), rows)
+            for row, variants in zip(rows, results):
+                if not variants:
+                    continue
+                # 処理中に画像が差し替えられた行は上書きしない
+                updated = Library.objects.filter(pk=row['pk'], image_url=row['image_url']).update(
+                    image_variants=variants,
+                    updated_at=timezone.now(),
+                )
+                if updated:
+                    created += 1
+                    if row['is_public']:
+                        refresh_public_feed_entries(pk=row['pk'])
+            self.stdout.write(f'⏳ タイムライン: {processed}件処理 / {created}件作成')
+        return processed, created
+
+    def _process_car_settings(self, pool: ThreadPoolExecutor, batch_size: int) -> tuple[int, int]:
+        processed = 0
+        created = 0
+        last_pk = None
+        while True:
+            batch = CarSettings.objects.filter(image_variants={}).order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            rows = list(batch.values('pk', *CAR_SETTINGS_IMAGE_FIELDS)[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1]['pk']
+            processed += len(rows)
+
+            for row in rows:
+                urls = {
+                    field: row[field] for field in CAR_SETTINGS_IMAGE_FIELDS
+                    if row[field] and is_gcs_url(row[field])
+                }
+                results = dict(zip(urls, pool.map(gcs_upload_service.create_variants_for_url, urls.values())))
+                variants = {field: result for field, result in results.items() if result}
+                if not variants:
+                    continue
+                # 処理中に画像が差し替えられていないフィールドのみ記録
+                current = CarSettings.objects.filter(pk=row['pk']).values(*CAR_SETTINGS_IMAGE_FIELDS).first()
+                if current is None:
+                    continue
+                variants = {field: value for field, value in variants.items() if current[field] == urls[field]}
+                if variants and CarSettings.objects.filter(pk=row['pk'], image_variants={}).update(image_variants=variants):
+                    created += 1
+            self.stdout.write(f'⏳ 愛車設定: {processed}件処理 / {created}件作成')
+        return processed, created
@@ -0,0 +1,167 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models.library import Library
+
+TABLE = Library._meta.db_table
+UNPARTITIONED_TABLE = f'{TABLE}_unpartitioned'
+
+CONVERSION_WARNING = (
+    '変換後は(user_id, frontend_id)の一意制約が(user_id, frontend_id, timestamp)になり、'
+    'unique_togetherおよびバッチ保存（bulk_createのignore_conflicts）による重複防止がDBで保証されなくなります'
+    '（生成日時が異なれば同じ生成IDの行を保存できてしまいます）。'
+    'また、api_libraryを参照する外部キー制約（コメント・いいね・公開フィード等）は削除され、'
+    '参照整合性はORMのCASCADEと保持期間の削除処理でのみ保たれます'
+)
+
+
+def _month_start(year: int, month: int) -> datetime:
+    """ローカルタイムゾーンでの月初（パーティションの境界）"""
+    return timezone.make_aware(datetime(year, month, 1))
+
+
+def _add_months(year: int, month: int, months: int) -> tuple[int, int]:
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+class Command(BaseCommand):
+    help = (
+        'api_libraryを生成日時（timestamp）の月単位のパーティションテーブルとして運用する場合のオプションです。'
+        '--convertで通常のテーブルから変換し、以降は定期実行で先の月のパーティションを作成します。'
+        '変換すると(user_id, frontend_id)の一意性がDBで保証されなくなり、api_libraryへの外部キー制約も削除されます'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help=(
+                '通常のテーブルからパーティションテーブルに変換（変換中はテーブルをロックするためメンテナンス時間に実行）。'
+                '主キーは(id, timestamp)、重複防止の一意制約は(user_id, frontend_id, timestamp)になり、'
+                '同じ生成IDの重複保存（unique_together・バッチ保存のignore_conflictsによる重複防止）がDBで防げなくなる。'
+                'api_libraryを参照する外部キー制約は削除される（関連行の削除はORMのCASCADEで行われる）。'
+                '--accept-weaker-constraintsの指定が必要'
+            ),
+        )
+        parser.add_argument(
+            '--accept-weaker-constraints',
+            action='store_true',
+            help='--convertで一意制約が弱まり外部キー制約が削除されることを了承して変換する',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='作成しておく今月以降の月数',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実行するSQLを表示するだけ',
+        )
+
+    def handle(self, *args, **options):
+        partitioned = self._is_partitioned()
+        if options['convert']:
+            if partitioned:
+                self.stdout.write(f'✅ {TABLE}は既にパーティションテーブルです')
+                return
+            if not options['accept_weaker_constraints']:
+                raise CommandError(f'{CONVERSION_WARNING}。了承して変換する場合は--accept-weaker-constraintsを指定してください')
+            self.stdout.write(self.style.WARNING(f'⚠️ {CONVERSION_WARNING}'))
+            statements = self._conversion_sql(options['months_ahead'])
+        elif not partitioned:
+            raise CommandError(f'{TABLE}はパーティションテーブルではありません（変換する場合は--convertを指定）')
+        else:
+            now = timezone.localtime()
+            statements = self._partition_sql(now.year, now.month, options['months_ahead'], if_not_exists=True)
+
+        if options['dry_run']:
+            for sql in statements:
+                self.stdout.write(f'{sql};')
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: SQLは実行されません'))
+            return
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        if options['convert']:
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {TABLE}')
+            self.stdout.write(self.style.SUCCESS(f'✅ {TABLE}を月単位のパーティションテーブルに変換しました'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ 今月から{options["months_ahead"]}か月先までのパーティションを確認しました'))
+
+    @staticmethod
+    def _is_partitioned() -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+            row = cursor.fetchone()
+        if row is None:
+            raise CommandError(f'{TABLE}が存在しません')
+        return row[0] == 'p'
+
+    @staticmethod
+    def _partition_sql(year: int, month: int, months: int, if_not_exists: bool = False) -> list[str]:
+        """指定した月から先のmonths月分の月次パーティションを作成するSQL"""
+        statements = []
+        for offset in range(months + 1):
+            start = _add_months(year, month, offset)
+            end = _add_months(*start, 1)
+            statements.append(
+                f"CREATE TABLE {'IF NOT EXISTS ' if if_not_exists else ''}{TABLE}_p{start[0]:04d}_{start[1]:02d} "
+                f"PARTITION OF {TABLE} FOR VALUES FROM ('{_month_start(*start).isoformat()}') "
+                f"TO ('{_month_start(*end).isoformat()}')"
+            )
+        return statements
+
+    def _conversion_sql(self, months_ahead: int) -> list[str]:
+        """通常のテーブルをパーティションテーブルに置き換えるSQL（1トランザクションで実行）"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'f' AND confrelid = %s::regclass",
+                [TABLE],
+            )
+            foreign_keys = cursor.fetchall()
+            cursor.execute(f'SELECT min(timestamp) FROM {TABLE}')
+            first = cursor.fetchone()[0]
+
+        first = timezone.localtime(first) if first else timezone.localtime()
+        now = timezone.localtime()
+        months = (now.year - first.year) * 12 + (now.month - first.month) + months_ahead
+
+        columns = ', '.join(
+            connection.ops.quote_name(field.column) for field in Library._meta.concrete_fields if not field.generated
+        )
+
+        statements = [f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE']
+        # パーティションテーブルの一意制約はパーティションキーを含む必要があり、idのみを参照する外部キーは張れない
+        statements += [f'ALTER TABLE {table} DROP CONSTRAINT {name}' for table, name in foreign_keys]
+        statements += [
+            f'ALTER TABLE {TABLE} RENAME TO {UNPARTITIONED_TABLE}',
+            f'CREATE TABLE {TABLE} (LIKE {UNPARTITIONED_TABLE} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING STORAGE) '
+            f'PARTITION BY RANGE (timestamp)',
+            *self._partition_sql(first.year, first.month, months),
+            # 範囲外（パーティション未作成の先の月等）の行の受け皿
+            f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT',
+            # 生成列（image_url_hash）はDBが計算するため列を指定して移す
+            f'INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {UNPARTITIONED_TABLE}',
+            # 元のテーブルのインデックス・制約・トリガーと名前が重ならないよう、削除してから作り直す
+            f'DROP TABLE {UNPARTITIONED_TABLE}',
+            f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, timestamp)',
+            f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_user_id_frontend_id_timestamp_uniq '
+            f'UNIQUE (user_id, frontend_id, timestamp)',
+        ]
+        with connection.schema_editor(collect_sql=True) as schema_editor:
+            statements += [str(index.create_sql(Library, schema_editor)) for index in Library._meta.indexes]
+        # 全文検索ベクトルのトリガー（0033_library_search_vector）を作り直す
+        statements.append(
+            f'CREATE TRIGGER api_library_search_vector_trigger BEFORE INSERT OR UPDATE ON {TABLE} '
+            f'FOR EACH ROW EXECUTE FUNCTION api_library_search_vector_update()'
+        )
+        return statements
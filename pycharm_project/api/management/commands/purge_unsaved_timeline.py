@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q, Sum
+
+from api.models.library import Library
+from api.services.gcs_upload_service import gcs_upload_service
+from api.services.timeline_retention_service import (
+    PurgeResult,
+    expired_entries,
+    library_table_bytes,
+    purge_expired_chunk,
+    retention_cutoff,
+    retention_days,
+)
+
+
+def _format_bytes(size: int) -> str:
+    return f'{size / 1024 / 1024:,.1f}MB'
+
+
+class Command(BaseCommand):
+    help = '保持期間を過ぎた未保存（ライブラリ未保存・非公開・グッズ未作成）のタイムラインエントリとGCSの画像を分割して削除します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='保持日数（未指定時はTIMELINE_UNSAVED_RETENTION_DAYS）',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'TIMELINE_RETENTION_CHUNK_SIZE', 1000),
+            help='1回のトランザクションで削除する行数',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='削除する最大件数（未指定時は全件）',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='バッチ間の待機秒数（本番DBへの負荷を抑える場合に指定）',
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='削除後にVACUUM (ANALYZE)を実行し、削除した行の領域を再利用可能にする',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実際の削除を行わず、削除対象の件数と容量を表示するだけ',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else retention_days()
+        if days <= 0:
+            raise CommandError('保持日数が指定されていません（--days または TIMELINE_UNSAVED_RETENTION_DAYS）')
+        cutoff = retention_cutoff(days)
+        self.stdout.write(f'📅 削除対象: {cutoff:%Y-%m-%d %H:%M} より前に生成された未保存エントリ（保持 {days}日）')
+
+        if options['dry_run']:
+            summary = expired_entries(cutoff).aggregate(
+                rows=Count('pk'),
+                image_bytes=Sum('image_size_bytes'),
+                unknown_size_rows=Count('pk', filter=Q(image_size_bytes__isnull=True)),
+            )
+            self.stdout.write(
+                f"🔍 対象: {summary['rows']}件 / 元画像 {_format_bytes(summary['image_bytes'] or 0)}"
+                f"（サイズ不明 {summary['unknown_size_rows']}件）"
+            )
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: 実際の削除は行われません'))
+            return
+
+        table_bytes_before = library_table_bytes()
+        total = PurgeResult()
+        deleted_objects = 0
+        limit = options['limit']
+        while limit is None or total.rows < limit:
+            size = options['batch_size'] if limit is None else min(options['batch_size'], limit - total.rows)
+            chunk = purge_expired_chunk(cutoff, size)
+            if not chunk.rows:
+                break
+            total.add(chunk)
+            # 行の削除をコミットした後に画像をバッチリクエストでまとめて削除（失敗した画像は孤立するだけで行は戻らない）
+            if chunk.image_urls:
+                deleted_objects += gcs_upload_service.delete_images(chunk.image_urls)
+            self.stdout.write(f'⏳ 削除: {total.rows}件 / 元画像 {_format_bytes(total.image_bytes)}')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        if options['vacuum'] and total.rows:
+            self.stdout.write('🧹 VACUUM (ANALYZE) 実行中...')
+            with connection.cursor() as cursor:
+                cursor.execute(f'VACUUM (ANALYZE) {Library._meta.db_table}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ 未保存エントリを{total.rows}件削除しました'
+            f'（GCS画像 {deleted_objects}件 / 元画像 {_format_bytes(total.image_bytes)}、サイズ不明 {total.unknown_size_rows}件）'
+        ))
+        table_bytes_after = library_table_bytes()
+        self.stdout.write(
+            f'📊 api_libraryの使用量: {_format_bytes(table_bytes_before)} → {_format_bytes(table_bytes_after)}'
+            '（削除した行の領域はVACUUM後に再利用され、ファイルサイズは縮小しません）'
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models.library import Library
+from api.models.public_feed_entry import PublicFeedEntry
+from api.services.public_feed_service import rebuild_public_feed
+
+
+class Command(BaseCommand):
+    help = '公開タイムライン（PublicFeedEntry）を公開中のLibraryから作り直します（初回構築・補正用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実際の再構築を行わず、件数を表示するだけ',
+        )
+
+    def handle(self, *args, **options):
+        public_count = Library.objects.filter(is_public=True).count()
+        entry_count = PublicFeedEntry.objects.count()
+        self.stdout.write(f'🔍 公開中のLibrary: {public_count}件 / 公開タイムライン: {entry_count}件')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: 実際の再構築は行われません'))
+            return
+
+        with transaction.atomic():
+            count = rebuild_public_feed()
+        self.stdout.write(self.style.SUCCESS(f'✅ 公開タイムラインを再構築しました: {count}件'))
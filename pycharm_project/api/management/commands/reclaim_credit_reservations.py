@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+
+from api.models.credit_reservation import CreditReservation
+from api.services.unified_credit_service import UnifiedCreditService
+
+
+class Command(BaseCommand):
+    help = '有効期限を過ぎたクレジットの仮押さえ（held）を残高に戻します（cronで定期実行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='1回で回収する上限件数',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実際の回収を行わず、対象件数を表示するだけ',
+        )
+
+    def handle(self, *args, **options):
+        expired = CreditReservation.objects.filter(status='held', expires_at__lt=timezone.now())
+        summary = expired.aggregate(total=Sum('amount'))
+        self.stdout.write(f'🔍 期限切れの仮押さえ: {expired.count()}件 / {summary["total"] or 0}クレジット')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: 実際の回収は行われません'))
+            return
+
+        reclaimed = UnifiedCreditService.reclaim_expired_reservations(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'✅ 仮押さえを{reclaimed}件回収しました'))
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models.library import Library
+from api.services.rehost_service import gcs_url_prefixes, rehost_library_image
+
+
+class Command(BaseCommand):
+    help = '上流URL（S3等）のままのLibrary画像をGCSへ再ホストします（write-behindの取りこぼし回収）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実際の再ホストを行わず、対象件数を表示するだけ',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='1回の実行で処理する最大件数',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=300,
+            help='作成からこの秒数以上経過した行のみ対象（バックグラウンド処理中の行を避ける）',
+        )
+        parser.add_argument(
+            '--include-failed',
+            action='store_true',
+            help='試行回数の上限に達したfailedの行も再試行する',
+        )
+        parser.add_argument(
+            '--scan-urls',
+            action='store_true',
+            help='hostedの行のうちimage_urlがGCS以外のもの（同期モードでのアップロード失敗時の保存分）もpendingにする',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+
+        if options['scan_urls']:
+            is_gcs = Q()
+            for prefix in gcs_url_prefixes():
+                is_gcs |= Q(image_url__startswith=prefix)
+            legacy = Library.objects.filter(rehost_status='hosted', created_at__lte=cutoff).exclude(is_gcs)
+            self.stdout.write(f'🔍 GCS以外のURLのままの行: {legacy.count()}件')
+            if not dry_run:
+                marked = legacy.update(rehost_status='pending', rehost_attempts=0)
+                self.stdout.write(f'📝 {marked}件をpendingにしました')
+
+        statuses = ['pending', 'failed'] if options['include_failed'] else ['pending']
+        max_attempts = getattr(settings, 'GCS_REHOST_MAX_ATTEMPTS', 5)
+        targets = Library.objects.filter(rehost_status__in=statuses, created_at__lte=cutoff)
+        if not options['include_failed']:
+            targets = targets.filter(rehost_attempts__lt=max_attempts)
+        target_ids = list(targets.order_by('created_at').values_list('id', flat=True)[:options['limit']])
+
+        self.stdout.write(f'🔍 再ホスト対象: {len(target_ids)}件')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: 実際の再ホストは行われません'))
+            return
+
+        succeeded = 0
+        for library_id in target_ids:
+            # バックグラウンド処理と同じ関数で再試行（1行につき1回の試行）
+            if rehost_library_image(library_id, retries=1):
+                succeeded += 1
+
+        failed = len(target_ids) - succeeded
+        self.stdout.write(self.style.SUCCESS(f'✅ 再ホスト完了: 成功 {succeeded}件 / 失敗 {failed}件'))
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from api.models.comment import Comment, Like
+from api.models.library import Library
+from api.models.public_comment import PublicComment
+
+
+def _count_subquery(queryset, field: str):
+    """相関サブクエリでの件数（0件はNULLになるため0に変換）"""
+    subquery = queryset.order_by().values(field).annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def _expected_like_count():
+    return _count_subquery(Like.objects.filter(library_id=OuterRef('pk')), 'library_id')
+
+
+def _expected_comment_count():
+    return (
+        _count_subquery(Comment.objects.filter(library_id=OuterRef('pk')), 'library_id')
+        + _count_subquery(PublicComment.objects.filter(frontend_id=OuterRef('frontend_id')), 'frontend_id')
+    )
+
+
+class Command(BaseCommand):
+    help = 'Libraryのいいね数・コメント数（非正規化カウンタ）を実データから再計算し、ずれている行を補正します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='1回のクエリで確認する行数',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実際の補正を行わず、ずれている件数を表示するだけ',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        checked = 0
+        mismatched = 0
+        last_pk = None
+        while True:
+            batch = Library.objects.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            batch_pks = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not batch_pks:
+                break
+            last_pk = batch_pks[-1]
+            checked += len(batch_pks)
+
+            # カウンタと実データの件数がずれている行
+            mismatched_pks = list(
+                Library.objects.filter(pk__in=batch_pks)
+                .annotate(expected_likes=_expected_like_count(), expected_comments=_expected_comment_count())
+                .filter(~Q(like_count=F('expected_likes')) | ~Q(comment_count=F('expected_comments')))
+                .values_list('pk', flat=True)
+            )
+            if not mismatched_pks:
+                continue
+            mismatched += len(mismatched_pks)
+
+            if not dry_run:
+                # 件数はUPDATE時点で再計算する（確認〜補正の間のいいね・コメントも反映される）
+                Library.objects.filter(pk__in=mismatched_pks).update(
+                    like_count=_expected_like_count(),
+                    comment_count=_expected_comment_count(),
+                )
+
+        self.stdout.write(f'🔍 確認: {checked}件 / カウンタのずれ: {mismatched}件')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: 実際の補正は行われません'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'✅ いいね数・コメント数を{mismatched}件補正しました'))
@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from api.models.library import Library
+from api.services.generation_stats_service import rebuild_daily_stats
+from api.services.timeline_retention_service import retention_cutoff, retention_days
+
+
+class Command(BaseCommand):
+    help = '生成履歴の日次集計（GenerationDailyStat）を指定期間についてLibraryから再集計します（定期実行で書き込み時の取りこぼしを補正）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=2,
+            help='今日から遡って再集計する日数（--since未指定時）',
+        )
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            default=None,
+            help='再集計の開始日（YYYY-MM-DD）',
+        )
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            default=None,
+            help='再集計の終了日（YYYY-MM-DD、未指定時は今日）',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='最初の生成日から全期間を再集計（初回構築・backfill_library_dimensionsの後に使用）',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=31,
+            help='1回のトランザクションで再集計する日数',
+        )
+        parser.add_argument(
+            '--ignore-retention',
+            action='store_true',
+            help='未保存エントリの保持期間（TIMELINE_UNSAVED_RETENTION_DAYS）より前の日も再集計する',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='実際の再集計を行わず、対象期間を表示するだけ',
+        )
+
+    def handle(self, *args, **options):
+        until = options['until'] or timezone.localdate()
+        if options['all']:
+            first = Library.objects.aggregate(first=Min('timestamp'))['first']
+            if first is None:
+                self.stdout.write('📭 Libraryが空のため再集計は不要です')
+                return
+            since = timezone.localdate(first)
+        else:
+            since = options['since'] or until - timedelta(days=options['days'] - 1)
+        if since > until:
+            raise CommandError(f'開始日（{since}）が終了日（{until}）より後です')
+
+        # purge_unsaved_timelineで削除された行は再集計すると数えられなくなるため、保持期間内の日に限る
+        days = retention_days()
+        if days > 0 and not options['ignore_retention']:
+            retained_since = timezone.localdate(retention_cutoff(days)) + timedelta(days=1)
+            if since < retained_since:
+                self.stdout.write(self.style.WARNING(
+                    f'⚠️ {retained_since}より前は未保存エントリが削除されている可能性があるため再集計しません（--ignore-retentionで対象に含める）'
+                ))
+                since = retained_since
+            if since > until:
+                self.stdout.write('📭 保持期間内に再集計する日がありません')
+                return
+
+        self.stdout.write(f'📅 再集計期間: {since} 〜 {until}')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('🔍 ドライラン: 実際の再集計は行われません'))
+            return
+
+        rows = 0
+        chunk_start = since
+        while chunk_start <= until:
+            chunk_end = min(until, chunk_start + timedelta(days=options['chunk_days'] - 1))
+            rows += rebuild_daily_stats(chunk_start, chunk_end)
+            self.stdout.write(f'⏳ {chunk_start} 〜 {chunk_end} を再集計しました')
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ 日次集計を再集計しました（{rows}行）'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2025-08-04 10:00
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_add_public_comment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('menu_id', models.IntegerField(help_text='実行したメニューID')),
+                ('user_id', models.CharField(help_text='MyGarageユーザーID', max_length=100)),
+                ('frontend_id', models.CharField(blank=True, default='', help_text='フロントエンドで使用する画像ID', max_length=100)),
+                ('status', models.CharField(choices=[('queued', '待機中'), ('running', '実行中'), ('succeeded', '成功'), ('failed', '失敗')], default='queued', max_length=20)),
+                ('stage', models.CharField(choices=[('accepted', '受付'), ('generating', '画像生成中'), ('uploading', 'GCSアップロード中'), ('saving', 'ライブラリ保存中'), ('done', '完了')], default='accepted', max_length=20)),
+                ('request_data', models.JSONField(blank=True, default=dict, help_text='リクエストパラメータ（ファイル除く）')),
+                ('result', models.JSONField(blank=True, help_text='MenuExecutionResponseSerializer形式の結果', null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('status_code', models.IntegerField(blank=True, help_text='同期実行時に返すHTTPステータス', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'generation_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user_id', '-created_at'], name='generation__user_id_1a1c21_idx'), models.Index(fields=['status', 'created_at'], name='generation__status_166da0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2025-08-05 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_generationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menu',
+            name='prompt_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
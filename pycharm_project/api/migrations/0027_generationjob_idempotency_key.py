@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2025-08-05 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_menu_prompt_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='冪等性キーの有効期限', null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='generationjob',
+            unique_together={('user_id', 'idempotency_key')},
+        ),
+    ]
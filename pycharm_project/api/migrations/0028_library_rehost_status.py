@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2025-08-06 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_generationjob_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='rehost_status',
+            field=models.CharField(choices=[('hosted', 'GCS保存済み'), ('pending', '再ホスト待ち'), ('failed', '再ホスト失敗')], default='hosted', help_text='GCS再ホスト状態', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='library',
+            name='image_source_url',
+            field=models.URLField(blank=True, help_text='再ホスト元の上流URL（S3署名付きURL等）', max_length=1000, null=True),
+        ),
+        migrations.AddField(
+            model_name='library',
+            name='rehost_attempts',
+            field=models.IntegerField(default=0, help_text='GCS再ホストの試行回数'),
+        ),
+        migrations.AddIndex(
+            model_name='library',
+            index=models.Index(fields=['rehost_status', 'created_at'], name='api_library_rehost__e54988_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2025-08-07 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_library_rehost_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('menu_id', models.IntegerField(help_text='実行したメニューID')),
+                ('engine', models.CharField(help_text='画像生成エンジン', max_length=50)),
+                ('user_id', models.CharField(blank=True, default='', help_text='MyGarageユーザーID', max_length=100)),
+                ('mode', models.CharField(choices=[('sync', '同期'), ('async', '非同期ジョブ')], default='sync', max_length=10)),
+                ('status_code', models.IntegerField(help_text='実行結果のHTTPステータス')),
+                ('total_ms', models.FloatField(help_text='全体の所要時間（ミリ秒）')),
+                ('stages', models.JSONField(blank=True, default=dict, help_text='ステージ別の所要時間（ミリ秒） 例: {"generate": 8123.4}')),
+                ('bytes_in', models.BigIntegerField(default=0, help_text='入力画像のバイト数（前処理後）')),
+                ('bytes_out', models.BigIntegerField(default=0, help_text='GCSに再ホストした生成画像のバイト数')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'generation_runs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['engine', '-created_at'], name='generation__engine_a3b5d6_idx'), models.Index(fields=['-created_at'], name='generation__created_b26089_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2025-08-08 10:00
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_generationrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditReservation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('user_id', models.CharField(max_length=100, verbose_name='ユーザーID')),
+                ('amount', models.IntegerField(verbose_name='仮押さえクレジット')),
+                ('menu_id', models.IntegerField(blank=True, help_text='実行したメニューID', null=True)),
+                ('status', models.CharField(choices=[('held', '仮押さえ中'), ('committed', '確定'), ('released', '解放'), ('expired', '期限切れ')], default='held', max_length=20)),
+                ('expires_at', models.DateTimeField(help_text='仮押さえの有効期限（過ぎたら自動で解放）')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('settled_at', models.DateTimeField(blank=True, help_text='確定・解放日時', null=True)),
+            ],
+            options={
+                'db_table': 'credit_reservations',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='credit_rese_status_d2118d_idx'), models.Index(fields=['user_id', '-created_at'], name='credit_rese_user_id_dcb312_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2025-08-08 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_creditreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='like_count',
+            field=models.IntegerField(default=0, help_text='いいね数'),
+        ),
+        migrations.AddField(
+            model_name='library',
+            name='comment_count',
+            field=models.IntegerField(default=0, help_text='コメント数（ログインメンバー + ゲスト）'),
+        ),
+        # 既存データのカウンタを初期化（以降の補正はrecount_engagementで行う）
+        migrations.RunSQL(
+            sql="""
+                UPDATE api_library AS l SET
+                    like_count = (SELECT COUNT(*) FROM api_like WHERE library_id = l.id),
+                    comment_count = (SELECT COUNT(*) FROM api_comment WHERE library_id = l.id)
+                                  + (SELECT COUNT(*) FROM api_publiccomment WHERE frontend_id = l.frontend_id)
+                WHERE EXISTS (SELECT 1 FROM api_like WHERE library_id = l.id)
+                   OR EXISTS (SELECT 1 FROM api_comment WHERE library_id = l.id)
+                   OR EXISTS (SELECT 1 FROM api_publiccomment WHERE frontend_id = l.frontend_id);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2025-08-09 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_library_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'table_versions',
+            },
+        ),
+        migrations.CreateModel(
+            name='PublicFeedEntry',
+            fields=[
+                ('library', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='public_feed_entry', serialize=False, to='api.library')),
+                ('timestamp', models.DateTimeField(help_text='Library.timestamp（並び順）')),
+                ('payload', models.JSONField(help_text='LibrarySerializerの出力')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'public_feed_entries',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['-timestamp', '-library'], name='public_feed_timesta_c12147_idx')],
+            },
+        ),
+    ]
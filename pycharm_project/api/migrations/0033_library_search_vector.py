@@ -0,0 +1,99 @@
+# Generated by Django 5.2.3 on 2025-08-10 10:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# 日本語は単語の区切りがなくPostgreSQL標準の辞書では分かち書きできないため、
+# 正規化（NFKC・小文字化・空白除去）した文字列を2文字ずつ区切った「文字バイグラム」をsimple設定で索引化する。
+# 検索語も同じバイグラム列のフレーズ検索（隣接一致）にすることで、部分一致と同等の結果をGINインデックスで引ける。
+SEARCH_FUNCTIONS_SQL = r"""
+CREATE OR REPLACE FUNCTION api_search_normalize(value text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT regexp_replace(lower(normalize(coalesce(value, ''), NFKC)), '\s+', '', 'g')
+$$;
+
+-- 文字バイグラムを空白区切りで返す（with_tail: 末尾の1文字も単独のトークンとして含める＝1文字の前方一致検索用）
+CREATE OR REPLACE FUNCTION api_search_bigrams(value text, with_tail boolean) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(string_agg(substr(t.s, i, 2), ' ' ORDER BY i), '')
+    FROM (SELECT api_search_normalize(value) AS s) AS t,
+         generate_series(1, char_length(t.s) - CASE WHEN with_tail THEN 0 ELSE 1 END) AS i
+$$;
+
+-- メニュー名を重みA、プロンプトを重みBとして連結（連結時に位置がずれるため列をまたいだフレーズ一致は起きない）
+CREATE OR REPLACE FUNCTION api_library_search_vector(display_prompt text, menu_name text) RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT setweight(to_tsvector('simple', api_search_bigrams(menu_name, true)), 'A')
+        || setweight(to_tsvector('simple', api_search_bigrams(display_prompt, true)), 'B')
+$$;
+
+-- 検索語をtsqueryに変換（1文字は前方一致、2文字以上はバイグラムのフレーズ検索）
+CREATE OR REPLACE FUNCTION api_search_tsquery(value text) RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN char_length(t.s) = 1 THEN to_tsquery('simple', '''' || replace(t.s, '''', '''''') || ''':*')
+        ELSE phraseto_tsquery('simple', api_search_bigrams(t.s, false))
+    END
+    FROM (SELECT api_search_normalize(value) AS s) AS t
+$$;
+
+CREATE OR REPLACE FUNCTION api_library_search_vector_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+       OR NEW.search_vector IS NULL
+       OR NEW.display_prompt IS DISTINCT FROM OLD.display_prompt
+       OR NEW.menu_name IS DISTINCT FROM OLD.menu_name THEN
+        NEW.search_vector := api_library_search_vector(NEW.display_prompt, NEW.menu_name);
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER api_library_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON api_library
+    FOR EACH ROW EXECUTE FUNCTION api_library_search_vector_update();
+"""
+
+DROP_SEARCH_FUNCTIONS_SQL = """
+DROP TRIGGER IF EXISTS api_library_search_vector_trigger ON api_library;
+DROP FUNCTION IF EXISTS api_library_search_vector_update();
+DROP FUNCTION IF EXISTS api_search_tsquery(text);
+DROP FUNCTION IF EXISTS api_library_search_vector(text, text);
+DROP FUNCTION IF EXISTS api_search_bigrams(text, boolean);
+DROP FUNCTION IF EXISTS api_search_normalize(text);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_public_feed'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='library',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='生成履歴検索用の全文検索ベクトル', null=True),
+        ),
+        migrations.RunSQL(sql=SEARCH_FUNCTIONS_SQL, reverse_sql=DROP_SEARCH_FUNCTIONS_SQL),
+        # 既存データの検索ベクトルを計算（以降はトリガーが維持する）
+        migrations.RunSQL(
+            sql="UPDATE api_library SET search_vector = api_library_search_vector(display_prompt, menu_name);",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='library',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='api_library_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='library',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('user_id'), name='gin_trgm_ops'), name='api_library_user_id_trgm'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2025-08-11 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_library_search_vector'),
+    ]
+
+    # 既存データの補完は件数が多いためマイグレーションでは行わず、backfill_library_dimensionsで分割して行う
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='category_id',
+            field=models.IntegerField(blank=True, help_text='生成時のカテゴリID', null=True),
+        ),
+        migrations.AddField(
+            model_name='library',
+            name='menu_id',
+            field=models.IntegerField(blank=True, help_text='生成時のメニューID', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='library',
+            index=models.Index(fields=['category_id', '-timestamp'], name='api_library_categor_017b91_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='library',
+            index=models.Index(fields=['menu_id', '-timestamp'], name='api_library_menu_id_14731b_idx'),
+        ),
+    ]
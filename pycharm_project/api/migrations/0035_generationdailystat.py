@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2025-08-12 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_library_form_dimensions'),
+    ]
+
+    # 既存データの集計はrollup_generation_stats --allで行う（backfill_library_dimensionsの後に実行）
+    operations = [
+        migrations.CreateModel(
+            name='GenerationDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='生成日')),
+                ('category_id', models.IntegerField(default=0, help_text='カテゴリID（0: 不明）')),
+                ('menu_id', models.IntegerField(default=0, help_text='メニューID（0: 不明）')),
+                ('engine', models.CharField(blank=True, default='', help_text='画像生成エンジン（空: 不明）', max_length=50)),
+                ('generation_count', models.IntegerField(default=0, help_text='生成数')),
+                ('library_save_count', models.IntegerField(default=0, help_text='ライブラリ保存数')),
+                ('public_count', models.IntegerField(default=0, help_text='公開数')),
+                ('goods_count', models.IntegerField(default=0, help_text='グッズが作成された画像の数')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'generation_daily_stats',
+                'ordering': ['-date'],
+                'unique_together': {('date', 'category_id', 'menu_id', 'engine')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='library',
+            index=models.Index(fields=['timestamp'], name='api_library_timesta_389a2e_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2025-08-13 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0035_generationdailystat'),
+    ]
+
+    # 既存画像の派生画像はgenerate_image_variantsで作成する
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='派生画像（WebPサムネイル）のURL'),
+        ),
+        migrations.AddField(
+            model_name='carsettings',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='派生画像（WebPサムネイル）のURL'),
+        ),
+    ]
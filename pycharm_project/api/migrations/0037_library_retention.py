@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2025-08-14 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0036_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='image_size_bytes',
+            field=models.BigIntegerField(blank=True, help_text='元画像のサイズ（バイト）', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='library',
+            index=models.Index(
+                condition=models.Q(('goods_creation_count', 0), ('is_public', False), ('is_saved_to_library', False)),
+                fields=['timestamp'],
+                name='api_library_retention_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2025-08-15 10:00
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0037_library_retention'),
+    ]
+
+    # 生成列（STORED）の追加は既存行の書き換えを伴うため、アクセスの少ない時間帯に適用する
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='image_url_hash',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.text.MD5('image_url'),
+                help_text='image_urlのMD5（URL検索用）',
+                output_field=models.CharField(max_length=32),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='library',
+            index=models.Index(fields=['image_url_hash'], name='api_library_image_u_78488b_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2025-08-16 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0038_library_image_url_hash'),
+    ]
+
+    # 既存行は生成時のエンジンが分からないため、メニューの現在のエンジンで補完する
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='engine',
+            field=models.CharField(blank=True, default='', help_text='生成時の画像生成エンジン', max_length=50),
+        ),
+        migrations.RunSQL(
+            sql="UPDATE api_library AS l SET engine = m.engine FROM api_menu AS m WHERE m.id = l.menu_id AND l.engine = ''",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
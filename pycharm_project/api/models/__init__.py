@@ -13,5 +13,11 @@ from .suzuri_merchandise import SuzuriMerchandise
 from .goods_management import GoodsManagement
 from .payment_log import PaymentLog
 from .public_comment import PublicComment
+from .generation_job import GenerationJob
+from .generation_run import GenerationRun
+from .credit_reservation import CreditReservation
+from .table_version import TableVersion
+from .public_feed_entry import PublicFeedEntry
+from .generation_daily_stat import GenerationDailyStat
 
-__all__ = ['Category', 'Menu', 'PromptVariable', 'CarSettings', 'CreditCharge', 'UserCredit', 'CreditTransaction', 'ChargeOption', 'Library', 'Comment', 'Like', 'UserProfile', 'PhoneUser', 'PhoneVerificationSession', 'PhoneLoginToken', 'SuzuriMerchandise', 'GoodsManagement', 'PaymentLog', 'PublicComment']
+__all__ = ['Category', 'Menu', 'PromptVariable', 'CarSettings', 'CreditCharge', 'UserCredit', 'CreditTransaction', 'ChargeOption', 'Library', 'Comment', 'Like', 'UserProfile', 'PhoneUser', 'PhoneVerificationSession', 'PhoneLoginToken', 'SuzuriMerchandise', 'GoodsManagement', 'PaymentLog', 'PublicComment', 'GenerationJob', 'GenerationRun', 'CreditReservation', 'TableVersion', 'PublicFeedEntry', 'GenerationDailyStat']
@@ -56,6 +56,9 @@ class CarSettings(models.Model):
         help_text="斜め前右写真のS3 URL"
     )
     
+    # 派生画像（WebPサムネイル）のURL（画像のURLフィールド名 → {幅（px）の文字列: URL}）
+    image_variants = models.JSONField(default=dict, blank=True, help_text="派生画像（WebPサムネイル）のURL")
+    
     # メタデータ
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
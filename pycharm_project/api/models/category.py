@@ -1,5 +1,9 @@
 from django.db import models
 from django.db.models import CharField, TextField
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models.table_version import TableVersion
 
 
 class Category(models.Model):
@@ -21,3 +25,10 @@ class Category(models.Model):
                 if value is None:
                     setattr(self, field.name, "")
         super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_categories_version(sender, instance, **kwargs):
+    """カテゴリ一覧の条件付きGET用のバージョンを加算"""
+    TableVersion.bump('categories')
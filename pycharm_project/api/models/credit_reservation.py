@@ -0,0 +1,40 @@
+from django.db import models
+import uuid
+
+
+class CreditReservation(models.Model):
+    """
+    メニュー実行時のクレジットの仮押さえ
+    予約時に残高から差し引き、生成成功でcommitted（使用履歴を記録）、失敗でreleased（残高に戻す）にする
+    期限切れのheldはreclaim_credit_reservationsで残高に戻す（expired）
+    """
+
+    STATUS_CHOICES = [
+        ('held', '仮押さえ中'),
+        ('committed', '確定'),
+        ('released', '解放'),
+        ('expired', '期限切れ'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_id = models.CharField(max_length=100, verbose_name='ユーザーID')
+    amount = models.IntegerField(verbose_name='仮押さえクレジット')
+    menu_id = models.IntegerField(null=True, blank=True, help_text="実行したメニューID")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='held')
+
+    # タイムスタンプ
+    expires_at = models.DateTimeField(help_text="仮押さえの有効期限（過ぎたら自動で解放）")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    settled_at = models.DateTimeField(null=True, blank=True, help_text="確定・解放日時")
+
+    class Meta:
+        db_table = 'credit_reservations'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+            models.Index(fields=['user_id', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"CreditReservation({self.user_id}, {self.amount}, {self.status})"
@@ -0,0 +1,53 @@
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models.library import Library
+
+
+class GenerationDailyStat(models.Model):
+    """
+    生成履歴の日次集計（日付 × カテゴリ × メニュー × エンジンごとに1行）
+    Libraryの書き込み時に差分を加算し、取りこぼしはrollup_generation_statsで対象期間を再集計して補正する
+    日付はLibrary.timestamp（生成日時）のTIME_ZONEでの日付。件数は現在のLibraryの状態を生成日に集計したもの
+    """
+
+    date = models.DateField(help_text="生成日")
+    category_id = models.IntegerField(default=0, help_text="カテゴリID（0: 不明）")
+    menu_id = models.IntegerField(default=0, help_text="メニューID（0: 不明）")
+    engine = models.CharField(max_length=50, blank=True, default='', help_text="画像生成エンジン（空: 不明）")
+
+    generation_count = models.IntegerField(default=0, help_text="生成数")
+    library_save_count = models.IntegerField(default=0, help_text="ライブラリ保存数")
+    public_count = models.IntegerField(default=0, help_text="公開数")
+    goods_count = models.IntegerField(default=0, help_text="グッズが作成された画像の数")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'generation_daily_stats'
+        ordering = ['-date']
+        unique_together = ['date', 'category_id', 'menu_id', 'engine']
+
+    def __str__(self):
+        return f"GenerationDailyStat({self.date}, category={self.category_id}, menu={self.menu_id}, {self.generation_count})"
+
+
+@receiver(post_save, sender=Library)
+def update_daily_stats_on_save(sender, instance, created, **kwargs):
+    """Libraryの作成・更新時に日次集計へ差分を加算"""
+    from api.services.generation_stats_service import apply_rollup_change, loaded_rollup_state, rollup_state
+    old_state = None if created else loaded_rollup_state(instance)
+    if not created and old_state is None:
+        # 読み込み時の値が分からない（一部の列のみ読み込んだ等）場合はrollup_generation_statsの再集計に任せる
+        return
+    new_state = rollup_state(instance)
+    apply_rollup_change(old_state, new_state)
+    instance.remember_rollup_values()
+
+
+@receiver(post_delete, sender=Library)
+def update_daily_stats_on_delete(sender, instance, **kwargs):
+    """Libraryの削除時に日次集計から差し引く"""
+    from api.services.generation_stats_service import apply_rollup_change, loaded_rollup_state
+    apply_rollup_change(loaded_rollup_state(instance), None)
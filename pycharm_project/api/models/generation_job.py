@@ -0,0 +1,69 @@
+from django.db import models
+import uuid
+
+
+class GenerationJob(models.Model):
+    """
+    メニュー実行（画像生成）の非同期ジョブモデル
+    リクエスト受付時に作成し、ワーカーが生成→GCS再ホスト→Library保存まで進める
+    """
+
+    STATUS_CHOICES = [
+        ('queued', '待機中'),
+        ('running', '実行中'),
+        ('succeeded', '成功'),
+        ('failed', '失敗'),
+    ]
+
+    # 進捗ステージ（ポーリング用）
+    STAGE_CHOICES = [
+        ('accepted', '受付'),
+        ('generating', '画像生成中'),
+        ('uploading', 'GCSアップロード中'),
+        ('saving', 'ライブラリ保存中'),
+        ('done', '完了'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # 実行対象
+    menu_id = models.IntegerField(help_text="実行したメニューID")
+    user_id = models.CharField(max_length=100, help_text="MyGarageユーザーID")
+    frontend_id = models.CharField(max_length=100, blank=True, default='', help_text="フロントエンドで使用する画像ID")
+
+    # 状態
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default='accepted')
+
+    # 入出力（画像ファイル本体は保存しない）
+    request_data = models.JSONField(default=dict, blank=True, help_text="リクエストパラメータ（ファイル除く）")
+    result = models.JSONField(null=True, blank=True, help_text="MenuExecutionResponseSerializer形式の結果")
+    error_message = models.TextField(blank=True, null=True)
+    status_code = models.IntegerField(null=True, blank=True, help_text="同期実行時に返すHTTPステータス")
+
+    # 冪等性キー（Idempotency-Keyヘッダー、未指定時はfrontend_id）。同じキーの再送には保存済みの結果を返す
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="冪等性キーの有効期限")
+
+    # タイムスタンプ
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'generation_jobs'
+        ordering = ['-created_at']
+        unique_together = ['user_id', 'idempotency_key']  # NULLは重複扱いにならない
+        indexes = [
+            models.Index(fields=['user_id', '-created_at']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    @property
+    def is_finished(self):
+        """ジョブが終了状態かどうか"""
+        return self.status in ('succeeded', 'failed')
+
+    def __str__(self):
+        return f"GenerationJob({self.id}, menu={self.menu_id}, {self.status})"
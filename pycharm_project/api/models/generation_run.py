@@ -0,0 +1,39 @@
+from django.db import models
+
+
+class GenerationRun(models.Model):
+    """
+    メニュー実行1回分の計測ログ
+    ステージ別の所要時間（検証・前処理・生成・GCS再ホスト・Library保存等）と転送バイト数を記録し、
+    エンジン・ステージ別のパーセンタイル集計に使用する
+    """
+
+    MODE_CHOICES = [
+        ('sync', '同期'),
+        ('async', '非同期ジョブ'),
+    ]
+
+    menu_id = models.IntegerField(help_text="実行したメニューID")
+    engine = models.CharField(max_length=50, help_text="画像生成エンジン")
+    user_id = models.CharField(max_length=100, blank=True, default='', help_text="MyGarageユーザーID")
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='sync')
+    status_code = models.IntegerField(help_text="実行結果のHTTPステータス")
+
+    # 計測値
+    total_ms = models.FloatField(help_text="全体の所要時間（ミリ秒）")
+    stages = models.JSONField(default=dict, blank=True, help_text="ステージ別の所要時間（ミリ秒） 例: {\"generate\": 8123.4}")
+    bytes_in = models.BigIntegerField(default=0, help_text="入力画像のバイト数（前処理後）")
+    bytes_out = models.BigIntegerField(default=0, help_text="GCSに再ホストした生成画像のバイト数")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'generation_runs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['engine', '-created_at']),
+            models.Index(fields=['-created_at']),
+        ]
+
+    def __str__(self):
+        return f"GenerationRun({self.engine}, menu={self.menu_id}, {self.status_code}, {self.total_ms:.0f}ms)"
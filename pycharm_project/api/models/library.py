@@ -1,8 +1,19 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.db.models import Count
+from django.db.models import Count, F, Q
+from django.db.models.functions import MD5, Upper
+import hashlib
+import json
 import uuid
 
 
+class LibraryManager(models.Manager):
+    def get_queryset(self):
+        # 検索ベクトルは検索条件・ランキングにのみ使うため、通常の取得では読み込まない
+        return super().get_queryset().defer('search_vector')
+
+
 class Library(models.Model):
     """
     ユーザーのタイムライン（生成画像管理）モデル
@@ -21,12 +32,24 @@ class Library(models.Model):
     
     # 画像情報
     image_url = models.URLField(max_length=1000, help_text="生成画像のURL（GCS等）")
+    # URLでの検索（グッズ作成時の画像の特定等）用のimage_urlのMD5。DBが計算する生成列で、長いURLの代わりにインデックスを張る
+    image_url_hash = models.GeneratedField(
+        expression=MD5('image_url'),
+        output_field=models.CharField(max_length=32),
+        db_persist=True,
+        help_text="image_urlのMD5（URL検索用）",
+    )
     display_prompt = models.TextField(help_text="表示用プロンプト")
     menu_name = models.CharField(max_length=200, blank=True, null=True, help_text="使用したメニュー名")
     
     # 生成時の設定情報（JSON形式で保存）
     used_form_data = models.JSONField(help_text="生成時に使用したフォームデータ（MenuExecutionFormData）")
     
+    # 集計・絞り込み用にused_form_dataから取り出したカテゴリID・メニューID（保存時に設定。既存データはbackfill_library_dimensionsで補完）
+    # カテゴリ・メニューの削除後も履歴を残すため外部キーにはしない
+    category_id = models.IntegerField(blank=True, null=True, help_text="生成時のカテゴリID")
+    menu_id = models.IntegerField(blank=True, null=True, help_text="生成時のメニューID")
+    
     # 評価・公開設定
     rating = models.CharField(
         max_length=10, 
@@ -44,12 +67,49 @@ class Library(models.Model):
         help_text="ユーザーがライブラリに明示的に保存したかどうか"
     )
     
+    # GCS再ホスト状態（write-behindモードでは上流のURLで先に保存し、バックグラウンドでGCSのURLに差し替える）
+    REHOST_STATUS_CHOICES = [
+        ('hosted', 'GCS保存済み'),
+        ('pending', '再ホスト待ち'),
+        ('failed', '再ホスト失敗'),
+    ]
+    rehost_status = models.CharField(
+        max_length=10,
+        choices=REHOST_STATUS_CHOICES,
+        default='hosted',
+        help_text="GCS再ホスト状態"
+    )
+    image_source_url = models.URLField(
+        max_length=1000,
+        blank=True,
+        null=True,
+        help_text="再ホスト元の上流URL（S3署名付きURL等）"
+    )
+    rehost_attempts = models.IntegerField(default=0, help_text="GCS再ホストの試行回数")
+    
+    # 一覧表示用の派生画像（WebPサムネイル）のURL（幅（px）の文字列 → URL。例: {"256": "...", "768": "..."}）
+    # GCSへの保存時に作成し、既存画像はgenerate_image_variantsで補完する
+    image_variants = models.JSONField(default=dict, blank=True, help_text="派生画像（WebPサムネイル）のURL")
+    # GCSに保存した元画像のサイズ（保持期間切れの削除で回収した容量の集計用。既存データ・GCS以外のURLはNone）
+    image_size_bytes = models.BigIntegerField(blank=True, null=True, help_text="元画像のサイズ（バイト）")
+    # 生成に使ったメニューの画像生成エンジン（日次集計のエンジン軸。メニューのエンジンが後から変わっても生成時の値を保つ）
+    engine = models.CharField(max_length=50, blank=True, default='', help_text="生成時の画像生成エンジン")
+    
+    # いいね・コメント数（一覧表示用の非正規化カウンタ）
+    # いいね・コメントの書き込みと同じトランザクションで加減算し、ずれた場合はrecount_engagementで再計算する
+    like_count = models.IntegerField(default=0, help_text="いいね数")
+    comment_count = models.IntegerField(default=0, help_text="コメント数（ログインメンバー + ゲスト）")
+    
     # グッズ作成回数
     goods_creation_count = models.IntegerField(
         default=0,
         help_text="この画像を使ってグッズが作成された回数"
     )
     
+    # 生成履歴検索用の全文検索ベクトル（display_prompt・menu_nameの文字バイグラム）
+    # DBのトリガー（api_library_search_vector_update）が挿入・更新時に計算するため、アプリからは書き込まない
+    search_vector = SearchVectorField(null=True, editable=False, help_text="生成履歴検索用の全文検索ベクトル")
+    
     # タイムスタンプ
     created_at = models.DateTimeField(auto_now_add=True, help_text="作成日時")
     updated_at = models.DateTimeField(auto_now=True, help_text="更新日時")
@@ -66,20 +126,144 @@ class Library(models.Model):
             models.Index(fields=['is_public', '-timestamp']),
             models.Index(fields=['user_id', 'is_public']),
             models.Index(fields=['frontend_id']),
+            models.Index(fields=['image_url_hash']),
             models.Index(fields=['user_id', 'is_saved_to_library']),
             models.Index(fields=['is_saved_to_library', '-timestamp']),
+            models.Index(fields=['rehost_status', 'created_at']),
+            models.Index(fields=['category_id', '-timestamp']),
+            models.Index(fields=['menu_id', '-timestamp']),
+            models.Index(fields=['timestamp']),  # 日次集計の期間再集計（rollup_generation_stats）用
+            # 保持期間切れの未保存エントリの削除（purge_unsaved_timeline）用。削除対象の行のみを古い順に辿る
+            models.Index(
+                fields=['timestamp'],
+                name='api_library_retention_idx',
+                condition=Q(is_saved_to_library=False, is_public=False, goods_creation_count=0),
+            ),
+            # 管理画面の生成履歴検索（プロンプト・メニュー名の全文検索、ユーザーIDの部分一致）
+            GinIndex(fields=['search_vector'], name='api_library_search_gin'),
+            GinIndex(OpClass(Upper('user_id'), name='gin_trgm_ops'), name='api_library_user_id_trgm'),
         ]
     
+    # 加減算はDB上で行うため、インスタンスのsave()では上書きしない
+    COUNTER_FIELDS = ('like_count', 'comment_count')
+    # DB（トリガー・生成列）が計算するため、インスタンスのsave()では書き込まない
+    DB_COMPUTED_FIELDS = ('search_vector', 'image_url_hash')
+    
+    # 日次集計（GenerationDailyStat）の集計軸・件数に関わる列（更新時は読み込み時の値との差分を集計に反映する）
+    ROLLUP_FIELDS = (
+        'timestamp', 'category_id', 'menu_id', 'engine', 'is_saved_to_library', 'is_public', 'goods_creation_count',
+    )
+    
+    objects = LibraryManager()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rollup_values()
+        return instance
+    
+    def remember_rollup_values(self):
+        """日次集計の差分計算用に現在の値を保持（読み込まれていない列があれば保持しない）"""
+        loaded = self.__dict__
+        if all(name in loaded for name in self.ROLLUP_FIELDS):
+            self._rollup_values = {name: loaded[name] for name in self.ROLLUP_FIELDS}
+        else:
+            self._rollup_values = None
+    
+    def save(self, *args, **kwargs):
+        # カテゴリID・メニューIDが未設定ならused_form_dataから取り出す
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'used_form_data' in update_fields:
+            self.fill_form_dimensions()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'category_id', 'menu_id'}
+        # 新規作成時にエンジンが未設定ならメニューの（生成時点の）エンジンを記録
+        if self._state.adding and not self.engine and self.menu_id is not None:
+            from api.models.menu import Menu
+            self.engine = Menu.objects.filter(pk=self.menu_id).values_list('engine', flat=True).first() or ''
+        # 既存レコードの更新時はカウンタをメモリ上の（古い可能性のある）値で上書きしないよう除外
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.name not in self.DB_COMPUTED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def extract_form_dimensions(used_form_data):
+        """
+        used_form_data（MenuExecutionFormData）からカテゴリID・メニューIDを取り出す
+
+        Returns:
+            tuple[int | None, int | None]: (カテゴリID, メニューID)。取り出せない値はNone
+        """
+        if isinstance(used_form_data, str):
+            try:
+                used_form_data = json.loads(used_form_data)
+            except ValueError:
+                return None, None
+        if not isinstance(used_form_data, dict):
+            return None, None
+        
+        def object_id(key):
+            value = used_form_data.get(key)
+            if not isinstance(value, dict):
+                return None
+            try:
+                return int(value.get('id'))
+            except (TypeError, ValueError):
+                return None
+        
+        return object_id('category'), object_id('menu')
+    
+    def fill_form_dimensions(self):
+        """未設定のカテゴリID・メニューIDをused_form_dataから補完（明示的に設定された値は優先）"""
+        if self.category_id is not None and self.menu_id is not None:
+            return
+        category_id, menu_id = self.extract_form_dimensions(self.used_form_data)
+        if self.category_id is None:
+            self.category_id = category_id
+        if self.menu_id is None:
+            self.menu_id = menu_id
+    
+    @staticmethod
+    def image_url_lookup(image_url: str) -> dict:
+        """
+        image_urlが一致するLibraryの絞り込み条件
+        image_url_hashのインデックスで候補を引き、ハッシュの衝突に備えてURL自体も比較する
+        """
+        return {
+            'image_url_hash': hashlib.md5(image_url.encode()).hexdigest(),
+            'image_url': image_url,
+        }
+    
+    @staticmethod
+    def adjust_like_count(library_id, delta):
+        """いいね数を加減算（いいねの作成・削除と同じトランザクションで呼ぶ）"""
+        from api.services.public_feed_service import refresh_public_feed_entries
+        Library.objects.filter(pk=library_id).update(like_count=F('like_count') + delta)
+        refresh_public_feed_entries(pk=library_id)
+    
+    @staticmethod
+    def adjust_comment_count(delta, library_id=None, frontend_id=None):
+        """
+        コメント数を加減算（コメントの作成・削除と同じトランザクションで呼ぶ）
+        ログインメンバーのコメントはlibrary_id、ゲストのコメント（PublicComment）はfrontend_idで対象を指定
+        """
+        from api.services.public_feed_service import refresh_public_feed_entries
+        lookup = {'pk': library_id} if library_id is not None else {'frontend_id': frontend_id}
+        Library.objects.filter(**lookup).update(comment_count=F('comment_count') + delta)
+        refresh_public_feed_entries(**lookup)
+    
     def get_comment_count(self):
         """コメント数を取得（ログインメンバー + ゲスト）"""
-        from .public_comment import PublicComment
-        auth_comments = self.comments.count()
-        guest_comments = PublicComment.objects.filter(frontend_id=self.frontend_id).count()
-        return auth_comments + guest_comments
+        return self.comment_count
     
     def get_like_count(self):
         """いいね数を取得"""
-        return self.likes.count()
+        return self.like_count
     
     def is_liked_by_user(self, user_id):
         """指定されたユーザーがいいねしているかチェック"""
@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from api.models.category import Category
+from api.models.table_version import TableVersion
 
 
 class Menu(models.Model):
@@ -29,3 +33,31 @@ class Menu(models.Model):
     
     # 表示順序（小さい順に表示）
     display_order = models.IntegerField(default=0, help_text="表示順序（小さい順に表示）")
+
+    # プロンプトテンプレートのバージョン（Menu・PromptVariableの保存ごとに加算、コンパイル済みテンプレートのキャッシュキー）
+    prompt_version = models.PositiveIntegerField(default=1, editable=False)
+
+    def save(self, *args, **kwargs):
+        # 既存レコードの更新時はprompt_versionをメモリ上の値で上書きしないよう除外し、保存後にDB上で加算する
+        # （内容の書き込み → バージョン加算の順にすることで、古い内容が新しいバージョンでキャッシュされるのを防ぐ）
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'prompt_version'
+            ]
+        super().save(*args, **kwargs)
+        if kwargs.get('update_fields') is not None:
+            self.bump_prompt_version(self.pk)
+            self.refresh_from_db(fields=['prompt_version'])
+
+    @staticmethod
+    def bump_prompt_version(menu_id):
+        """プロンプトテンプレートのバージョンを加算（キャッシュ済みテンプレートを無効化）"""
+        Menu.objects.filter(pk=menu_id).update(prompt_version=F('prompt_version') + 1)
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def bump_menus_version(sender, instance, **kwargs):
+    """メニュー一覧の条件付きGET用のバージョンを加算"""
+    TableVersion.bump('menus')
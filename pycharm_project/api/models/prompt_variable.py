@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from api.models.menu import Menu
+from api.models.table_version import TableVersion
 
 
 class PromptVariable(models.Model):
@@ -9,3 +12,11 @@ class PromptVariable(models.Model):
 
     label = models.CharField(max_length=255)
     key = models.CharField(max_length=255)
+
+
+@receiver(post_save, sender=PromptVariable)
+@receiver(post_delete, sender=PromptVariable)
+def bump_menu_prompt_version(sender, instance, **kwargs):
+    """PromptVariableが変更されたら親Menuのプロンプトテンプレートのバージョンを加算"""
+    Menu.bump_prompt_version(instance.menu_id)
+    TableVersion.bump('menus')  # メニューのレスポンスにprompt_variablesが含まれるため
@@ -0,0 +1,49 @@
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models.library import Library
+
+
+class PublicFeedEntry(models.Model):
+    """
+    公開タイムラインの事前計算済みエントリ（公開中のLibrary 1件につき1行）
+    表示用のシリアライズ結果（payload）を保持し、公開設定の変更・削除・いいね/コメント数の変更時に更新する
+    """
+
+    library = models.OneToOneField(
+        Library,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='public_feed_entry',
+    )
+    timestamp = models.DateTimeField(help_text="Library.timestamp（並び順）")
+    payload = models.JSONField(help_text="LibrarySerializerの出力")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'public_feed_entries'
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp', '-library']),
+        ]
+
+    def __str__(self):
+        return f"PublicFeedEntry({self.library_id}, {self.timestamp:%Y-%m-%d %H:%M})"
+
+
+@receiver(post_save, sender=Library)
+def sync_public_feed_on_save(sender, instance, created, **kwargs):
+    """Libraryの保存時に公開タイムラインを更新（非公開で新規作成された行は対象外）"""
+    if created and not instance.is_public:
+        return
+    from api.services.public_feed_service import sync_public_feed_entry
+    sync_public_feed_entry(instance)
+
+
+@receiver(post_delete, sender=Library)
+def remove_public_feed_on_delete(sender, instance, **kwargs):
+    """Libraryの削除時に公開タイムラインから除く（行自体はCASCADEで削除済み）"""
+    if instance.is_public:
+        from api.services.public_feed_service import bump_public_feed_version
+        bump_public_feed_version()
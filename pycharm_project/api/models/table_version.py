@@ -0,0 +1,31 @@
+from django.db import models
+from django.db.models import F
+
+
+class TableVersion(models.Model):
+    """
+    キャッシュ無効化用のバージョン番号（名前ごとに1行）
+    データの変更と同じトランザクションで加算し、読み取り側はバージョンをキャッシュキーに含める
+    （プロセスごとのキャッシュでも、全ワーカーが同じバージョンを参照するため古い値を返さない）
+    """
+
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'table_versions'
+
+    @staticmethod
+    def get_version(name: str) -> int:
+        version = TableVersion.objects.filter(name=name).values_list('version', flat=True).first()
+        return version or 0
+
+    @staticmethod
+    def bump(name: str):
+        """バージョンを加算（行がなければ作成）"""
+        if not TableVersion.objects.filter(name=name).update(version=F('version') + 1):
+            TableVersion.objects.get_or_create(name=name)
+
+    def __str__(self):
+        return f"TableVersion({self.name}, {self.version})"
@@ -0,0 +1,186 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TimelineKeysetPagination(BasePagination):
+    """
+    タイムライン用のキーセット（カーソル）ページネーション（Library・PublicFeedEntryで共用）
+    - 並び順は(timestamp, 主キー)の降順。カーソルは最後（最初）の行の(timestamp, 主キー)を不透明な文字列にしたもの
+    - OFFSETを使わず「カーソルより古い行」を条件にするため、履歴が長くても(user_id, -timestamp)等のインデックスの範囲走査で済む
+    - cursor / page_size のどちらも指定されない場合は従来通り全件を返す（既存クライアント互換）
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'TIMELINE_PAGE_SIZE', 30)
+        self.max_page_size = getattr(settings, 'TIMELINE_MAX_PAGE_SIZE', 100)
+        self.request = None
+        self.next_position = None
+        self.previous_position = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params and self.page_size_query_param not in request.query_params:
+            return None
+
+        self.request = request
+        page_size = self._get_page_size(request)
+        cursor = self._decode_cursor(request.query_params.get(self.cursor_query_param))
+        reverse = cursor is not None and cursor['d'] == 'prev'
+
+        if cursor is not None:
+            timestamp, pk = cursor['t'], cursor['i']
+            if reverse:
+                # 新しい方向: timestamp >= t で範囲を絞ってから同時刻をidで比較
+                queryset = queryset.filter(timestamp__gte=timestamp).filter(
+                    Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)
+                )
+            else:
+                # 古い方向: timestamp <= t で範囲を絞ってから同時刻をidで比較
+                queryset = queryset.filter(timestamp__lte=timestamp).filter(
+                    Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk)
+                )
+
+        ordering = ('timestamp', 'pk') if reverse else ('-timestamp', '-pk')
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # 前後のページがあるか: 進んだ方向は1件多く取得して判定、戻る方向はカーソルがあれば存在する
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+        self.next_position = (rows[-1].timestamp, rows[-1].pk) if rows and has_next else None
+        self.previous_position = (rows[0].timestamp, rows[0].pk) if rows and has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.next_position, 'next'),
+            'previous': self._link(self.previous_position, 'prev'),
+            'results': data,
+        })
+
+    def _get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def _link(self, position, direction: str) -> str | None:
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self._encode_cursor(position, direction))
+
+    @staticmethod
+    def _encode_cursor(position, direction: str) -> str:
+        timestamp, pk = position
+        payload = json.dumps({'t': timestamp.isoformat(), 'i': str(pk), 'd': direction}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def _decode_cursor(self, encoded: str | None) -> dict | None:
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            cursor['t'] = datetime.fromisoformat(cursor['t'])
+            cursor['i'] = uuid.UUID(cursor['i'])
+            if cursor['d'] not in ('next', 'prev'):
+                raise ValueError(cursor['d'])
+            return cursor
+        except (TypeError, ValueError, KeyError):
+            raise NotFound('無効なカーソルです')
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'ページ位置のカーソル（レスポンスのnext / previousに含まれる）',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': '1ページの件数',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class SearchRankKeysetPagination(TimelineKeysetPagination):
+    """
+    検索結果用のキーセットページネーション（rankで注釈したクエリセット用。次ページ方向のみ）
+    - 並び順は(rank, timestamp, 主キー)の降順。カーソルは最後の行の3つの値を不透明な文字列にしたもの
+    - 常にページングする（cursor / page_size未指定時は先頭ページ）
+    """
+
+    def __init__(self, page_size: int | None = None, max_page_size: int | None = None):
+        super().__init__()
+        self.page_size = page_size or self.page_size
+        self.max_page_size = max_page_size or self.max_page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self._get_page_size(request)
+        cursor = self._decode_cursor(request.query_params.get(self.cursor_query_param))
+
+        if cursor is not None:
+            rank, timestamp, pk = cursor['r'], cursor['t'], cursor['i']
+            queryset = queryset.filter(
+                Q(rank__lt=rank)
+                | Q(rank=rank, timestamp__lt=timestamp)
+                | Q(rank=rank, timestamp=timestamp, pk__lt=pk)
+            )
+
+        rows = list(queryset.order_by('-rank', '-timestamp', '-pk')[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = (rows[-1].rank, rows[-1].timestamp, rows[-1].pk) if rows and has_next else None
+        return rows
+
+    def get_next_link(self) -> str | None:
+        return self._link(self.next_position, 'next')
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    @staticmethod
+    def _encode_cursor(position, direction: str) -> str:
+        rank, timestamp, pk = position
+        payload = json.dumps({'r': rank, 't': timestamp.isoformat(), 'i': str(pk)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def _decode_cursor(self, encoded: str | None) -> dict | None:
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            cursor['r'] = float(cursor['r'])
+            cursor['t'] = datetime.fromisoformat(cursor['t'])
+            cursor['i'] = uuid.UUID(cursor['i'])
+            return cursor
+        except (TypeError, ValueError, KeyError):
+            raise NotFound('無効なカーソルです')
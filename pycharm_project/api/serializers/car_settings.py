@@ -19,10 +19,11 @@ class CarSettingsSerializer(serializers.ModelSerializer):
             'car_photo_side_url',
             'car_photo_rear_url',
             'car_photo_diagonal_url',
+            'image_variants',
             'created_at',
             'updated_at',
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'image_variants', 'created_at', 'updated_at']
     
     def validate(self, data):
         """バリデーション"""
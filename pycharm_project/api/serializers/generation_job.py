@@ -0,0 +1,32 @@
+from rest_framework import serializers
+
+from api.models.generation_job import GenerationJob
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    """
+    生成ジョブの状態確認用シリアライザー
+    resultにはMenuExecutionResponseSerializer形式（generatedImageUrl等）の結果が入る
+    """
+    jobId = serializers.UUIDField(source='id', read_only=True)
+    menuId = serializers.IntegerField(source='menu_id', read_only=True)
+    frontendId = serializers.CharField(source='frontend_id', read_only=True)
+    error = serializers.CharField(source='error_message', read_only=True, allow_null=True)
+    createdAt = serializers.DateTimeField(source='created_at', read_only=True)
+    startedAt = serializers.DateTimeField(source='started_at', read_only=True)
+    finishedAt = serializers.DateTimeField(source='finished_at', read_only=True)
+
+    class Meta:
+        model = GenerationJob
+        fields = [
+            'jobId',
+            'menuId',
+            'frontendId',
+            'status',
+            'stage',
+            'result',
+            'error',
+            'createdAt',
+            'startedAt',
+            'finishedAt',
+        ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from api.models.library import Library
 from datetime import datetime
@@ -39,21 +40,16 @@ class LibrarySerializer(serializers.ModelSerializer):
     # フロントエンドのisSavedToLibraryフィールドに対応
     isSavedToLibrary = serializers.BooleanField(source='is_saved_to_library')
     
-    # コメント・いいね数を追加
-    comment_count = serializers.SerializerMethodField()
-    like_count = serializers.SerializerMethodField()
+    # 一覧表示用の派生画像（幅（px）の文字列 → WebPのURL。未作成の場合は空。urlの元画像にフォールバックする）
+    imageVariants = serializers.JSONField(source='image_variants', read_only=True)
+    
+    # コメント・いいね数を追加（非正規化カウンタをそのまま返す）
+    comment_count = serializers.IntegerField(read_only=True)
+    like_count = serializers.IntegerField(read_only=True)
     
     # グッズ作成回数を追加
     goods_creation_count = serializers.IntegerField(read_only=True)
     
-    def get_comment_count(self, obj):
-        """コメント数を取得"""
-        return obj.get_comment_count()
-    
-    def get_like_count(self, obj):
-        """いいね数を取得"""
-        return obj.get_like_count()
-    
     class Meta:
         model = Library
         fields = [
@@ -67,6 +63,7 @@ class LibrarySerializer(serializers.ModelSerializer):
             'isPublic',  # is_public
             'authorName',  # author_name
             'isSavedToLibrary',  # is_saved_to_library
+            'imageVariants',  # image_variants
             'comment_count',  # コメント数
             'like_count',  # いいね数
             'goods_creation_count',  # グッズ作成回数
@@ -119,4 +116,37 @@ class LibraryCreateUpdateSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
-        return instance 
\ No newline at end of file
+        return instance 
+
+
+class TimelineBulkSerializer(serializers.Serializer):
+    """
+    タイムライン一括操作の対象指定
+    ids: 対象のフロントエンドID（1回の上限はTIMELINE_BULK_MAX_ITEMS件）
+    """
+    
+    user_id = serializers.CharField()
+    ids = serializers.ListField(child=serializers.CharField(max_length=100), allow_empty=False)
+    
+    def validate_ids(self, value):
+        max_items = getattr(settings, 'TIMELINE_BULK_MAX_ITEMS', 200)
+        if len(value) > max_items:
+            raise serializers.ValidationError(f"一度に操作できるのは{max_items}件までです")
+        # 重複を除いて順序を保つ
+        return list(dict.fromkeys(value))
+
+
+class TimelineBulkUpdateSerializer(TimelineBulkSerializer):
+    """
+    タイムライン一括更新用シリアライザー
+    指定したエントリにまとめて同じ値（ライブラリフラグ・公開設定・評価）を設定する
+    """
+    
+    isSavedToLibrary = serializers.BooleanField(source='is_saved_to_library', required=False)
+    isPublic = serializers.BooleanField(source='is_public', required=False)
+    rating = serializers.ChoiceField(choices=Library._meta.get_field('rating').choices, required=False, allow_null=True)
+    
+    def validate(self, attrs):
+        if not any(field in attrs for field in ('is_saved_to_library', 'is_public', 'rating')):
+            raise serializers.ValidationError("更新する項目（isSavedToLibrary / isPublic / rating）が必要です")
+        return attrs
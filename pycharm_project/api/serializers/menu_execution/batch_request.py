@@ -0,0 +1,87 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+from rest_framework import serializers
+
+from api.models.menu import Menu
+from api.serializers.custom_fields.json_list_field import JSONListField
+from api.serializers.menu_execution.request import PromptVariableRequestSerializer, validate_prompt_variables
+
+logger = logging.getLogger(__name__)
+
+
+# バッチ実行の1件分（メニュー・変数・生成枚数）
+class MenuBatchItemRequestSerializer(serializers.Serializer):
+    menu_id = serializers.IntegerField()
+    additional_prompt_for_my_car = serializers.CharField(default=None, required=False)
+    additional_prompt_for_others = serializers.CharField(default=None, required=False)
+    aspect_ratio = serializers.CharField(default=None, required=False, max_length=16)
+    prompt_variables = serializers.ListField(
+        child=PromptVariableRequestSerializer(),
+        default=[],
+        required=False,
+        allow_empty=True,
+    )
+    num_images = serializers.IntegerField(default=1, required=False, min_value=1)
+    # 生成画像ごとのfrontend_id（省略時はサーバー側で採番）
+    frontend_ids = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        required=False,
+        allow_empty=True,
+    )
+
+    def validate_num_images(self, value):
+        max_images = getattr(settings, 'BATCH_EXECUTION_MAX_IMAGES_PER_ITEM', 4)
+        if value > max_images:
+            raise serializers.ValidationError(f"num_imagesは{max_images}以下で指定してください。")
+        return value
+
+    def validate(self, data):
+        frontend_ids = data.get("frontend_ids")
+        if frontend_ids and len(frontend_ids) != data["num_images"]:
+            raise serializers.ValidationError({"frontend_ids": "frontend_idsの数がnum_imagesと一致しません。"})
+        return data
+
+
+# NOTE itemsはmultipart/form-dataの場合JSON文字列で受け取る（imageは全件で共有）
+class MenuBatchExecutionRequestSerializer(serializers.Serializer):
+    image = serializers.ImageField(default=None, required=False, allow_empty_file=False)
+    items = JSONListField(
+        child=MenuBatchItemRequestSerializer(),
+        allow_empty=False,
+    )
+
+    def validate_items(self, items):
+        max_items = getattr(settings, 'BATCH_EXECUTION_MAX_ITEMS', 10)
+        if len(items) > max_items:
+            raise serializers.ValidationError(f"itemsは{max_items}件以下で指定してください。")
+        return items
+
+    def validate(self, data):
+        # 全件のMenuを1回のクエリで取得し、各itemに紐づける
+        items = data["items"]
+        menus = Menu.objects.in_bulk({item["menu_id"] for item in items})
+
+        errors = {}
+        for index, item in enumerate(items):
+            menu = menus.get(item["menu_id"])
+            if menu is None:
+                errors[index] = {"menu_id": f"Menu ID {item['menu_id']} がDBに存在しません。"}
+                continue
+            try:
+                validate_prompt_variables(menu, item["prompt_variables"])
+            except serializers.ValidationError as e:
+                errors[index] = e.detail
+                continue
+            item["menu"] = menu
+
+        if errors:
+            raise serializers.ValidationError({"items": errors})
+
+        # 同じfrontend_idの画像は1件しか保存できないため、リクエスト内の重複は生成前に拒否
+        counts = Counter(frontend_id for item in items for frontend_id in item.get("frontend_ids") or [])
+        duplicates = sorted(frontend_id for frontend_id, count in counts.items() if count > 1)
+        if duplicates:
+            raise serializers.ValidationError({"items": f"frontend_idsが重複しています: {', '.join(duplicates)}"})
+        return data
@@ -2,12 +2,30 @@ import logging
 
 from rest_framework import serializers
 
+from api.models.car_settings import CarSettings
+from api.models.library import Library
 from api.models.menu import Menu
 from api.serializers.custom_fields.json_list_field import JSONListField
+from api.services.image_reference_service import CAR_PHOTO_FIELDS
+from api.services.prompt_template import get_prompt_template
 
 logger = logging.getLogger(__name__)
 
 
+def validate_prompt_variables(menu: Menu, prompt_variables: list[dict[str, str]]):
+    """Menuに紐づく全てのprompt_variable.keyがリクエストに含まれているか確認"""
+    # Menuに紐づく全てのprompt_variable.keyを取得（コンパイル済みテンプレートのキャッシュから）
+    required_keys = get_prompt_template(menu).required_keys
+    # リクエストから送られた key を取得
+    provided_keys = {prompt_variable["key"] for prompt_variable in prompt_variables}
+    # keyが不足しているか判定
+    missing_keys = required_keys - provided_keys
+    if missing_keys:
+        raise serializers.ValidationError({
+            "prompt_variables": f"次のkeyが不足しています: {', '.join(missing_keys)}"
+        })
+
+
 # MenuExecution APIのリクエストパラメータに複数含まれる子パラメータSerializer
 class PromptVariableRequestSerializer(serializers.Serializer):
     key = serializers.CharField(max_length=255)
@@ -27,27 +45,61 @@ class MenuExecutionRequestSerializer(serializers.Serializer):
         required=False,
         allow_empty=True,
     )
+    # imageの代わりに保存済みの画像を参照で指定（毎回の画像アップロードを省略）
+    # - 愛車写真: car_settings_id + car_photo_angle
+    # - 生成画像: library_frontend_id
+    car_settings_id = serializers.IntegerField(required=False, write_only=True)
+    car_photo_angle = serializers.ChoiceField(choices=list(CAR_PHOTO_FIELDS), required=False, write_only=True)
+    library_frontend_id = serializers.CharField(required=False, max_length=100, write_only=True)
+
+    def _resolve_image_ref(self, data) -> str | None:
+        """参照指定を画像URLに解決（自分の愛車設定・タイムラインのみ参照可能）"""
+        car_settings_id = data.pop("car_settings_id", None)
+        car_photo_angle = data.pop("car_photo_angle", None)
+        library_frontend_id = data.pop("library_frontend_id", None)
+        if car_settings_id is None and car_photo_angle is None and library_frontend_id is None:
+            return None
+
+        if data.get("image"):
+            raise serializers.ValidationError("imageと画像の参照指定は同時に指定できません。")
+        if library_frontend_id is not None and (car_settings_id is not None or car_photo_angle is not None):
+            raise serializers.ValidationError("愛車写真と生成画像の参照は同時に指定できません。")
+
+        user_id = self.context.get("user_id")
+        if library_frontend_id is not None:
+            image_url = Library.objects.filter(
+                user_id=user_id, frontend_id=library_frontend_id
+            ).values_list("image_url", flat=True).first()
+            if not image_url:
+                raise serializers.ValidationError({"library_frontend_id": "指定された画像が見つかりません。"})
+            return image_url
+
+        if car_settings_id is None or car_photo_angle is None:
+            raise serializers.ValidationError("car_settings_idとcar_photo_angleは両方指定してください。")
+        image_url = CarSettings.objects.filter(
+            id=car_settings_id, user_id=user_id
+        ).values_list(CAR_PHOTO_FIELDS[car_photo_angle], flat=True).first()
+        if not image_url:
+            raise serializers.ValidationError({"car_photo_angle": "指定された愛車写真が登録されていません。"})
+        return image_url
 
     def validate(self, data):
         # URLパラメータから（Viewで指定した）menu_idを取得
         menu_id = self.context.get("menu_id")
         if not menu_id:
             raise serializers.ValidationError("menu_idがURLに含まれていません。")
-        # 指定されたmenu_idがDBに存在するか確認
-        try:
-            # この後prompt_variablesにのみアクセスするので、効率化のためprefetch_relatedに指定
-            menu = Menu.objects.prefetch_related("prompt_variables").get(id=menu_id)
-        except Menu.DoesNotExist:
-            raise serializers.ValidationError(f"Menu ID {menu_id} がDBに存在しません。")
-        # Menuに紐づく全てのprompt_variable.keyを取得
-        required_keys = {prompt_variable.key for prompt_variable in menu.prompt_variables.all()}
-        # リクエストから送られた key を取得
-        provided_keys = {prompt_variable["key"] for prompt_variable in data.get("prompt_variables", [])}
-        # keyが不足しているか判定
-        missing_keys = required_keys - provided_keys
-        if missing_keys:
-            raise serializers.ValidationError({
-                "prompt_variables": f"次のkeyが不足しています: {', '.join(missing_keys)}"
-            })
+        # Viewで取得済みのMenuがあれば再利用（なければDBに存在するか確認）
+        menu = self.context.get("menu")
+        if menu is None:
+            try:
+                menu = Menu.objects.get(id=menu_id)
+            except Menu.DoesNotExist:
+                raise serializers.ValidationError(f"Menu ID {menu_id} がDBに存在しません。")
+        validate_prompt_variables(menu, data.get("prompt_variables", []))
+
+        # 参照指定はURLに解決して渡す（画像の取得は実行時にローカルキャッシュ経由で行う）
+        image_ref = self._resolve_image_ref(data)
+        if image_ref:
+            data["image_ref"] = image_ref
 
         return data
@@ -0,0 +1,190 @@
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from api.services.stage_timer import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+class EngineBusy(APIException):
+    """
+    エンジンの同時実行数・待ち行列が上限に達した場合のエラー（429）
+    waitを設定するとDRFの例外ハンドラがRetry-Afterヘッダーを付与する
+    """
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    default_detail = '画像生成が混み合っています。時間をおいて再度お試しください。'
+    default_code = 'engine_busy'
+
+    def __init__(self, engine: str, wait: float):
+        super().__init__(f'{engine} の画像生成が混み合っています。{math.ceil(wait)}秒後に再度お試しください。')
+        self.engine = engine
+        self.wait = math.ceil(wait)
+
+
+class EngineLimiter:
+    """
+    エンジンごとの同時実行数制限（待ち行列付き）
+    - 実行中が max_in_flight 未満なら即座に実行
+    - それ以上は max_queue 件まで待機、待ち行列が満杯なら即座に429
+    - 待ち行列には、枠を待っているスレッド（queued）に加えて、
+      ワーカーに投入済みで未開始の非同期ジョブ（pending）も数える
+    - 待機は queue_timeout と時間予算の残りのうち短い方まで
+    """
+
+    # 平均処理時間の指数移動平均の重み
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, engine: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.engine = engine
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.pending = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.avg_service_seconds = 0.0
+        self._cond = threading.Condition()
+
+    def retry_after(self) -> float:
+        """待ち行列がはけるまでの目安（秒）"""
+        service = self.avg_service_seconds or 10.0
+        return max(service * (self.queued + self.pending + 1) / max(self.max_in_flight, 1), 1)
+
+    def reserve_pending(self):
+        """
+        非同期ジョブをワーカーに投入する前に待ち枠を確保
+        実行中・待機中・投入済みで未開始のジョブの合計が上限（max_in_flight + max_queue）に達していればEngineBusyを送出
+        確保した枠はジョブの開始時・投入失敗時にrelease_pendingで戻す
+        """
+        with self._cond:
+            if self.in_flight + self.queued + self.pending >= self.max_in_flight + self.max_queue:
+                self.rejected += 1
+                logger.warning(
+                    f"🚦 生成ジョブを拒否: {self.engine} (実行中 {self.in_flight}, 待機 {self.queued}, 投入済み {self.pending})"
+                )
+                raise EngineBusy(self.engine, self.retry_after())
+            self.pending += 1
+
+    def release_pending(self):
+        """reserve_pendingで確保した待ち枠を戻す"""
+        with self._cond:
+            self.pending = max(self.pending - 1, 0)
+
+    def acquire(self, deadline=None):
+        """実行枠を確保（確保できなければEngineBusyを送出）"""
+        started = time.monotonic()
+        with self._cond:
+            if self.in_flight >= self.max_in_flight:
+                if self.queued + self.pending >= self.max_queue:
+                    self.rejected += 1
+                    logger.warning(
+                        f"🚦 生成リクエストを拒否: {self.engine} (実行中 {self.in_flight}, 待機 {self.queued}, 投入済み {self.pending})"
+                    )
+                    raise EngineBusy(self.engine, self.retry_after())
+
+                timeout = self.queue_timeout
+                if deadline is not None:
+                    timeout = min(timeout, deadline.remaining())
+                wait_until = started + timeout
+
+                self.queued += 1
+                try:
+                    while self.in_flight >= self.max_in_flight:
+                        remaining = wait_until - time.monotonic()
+                        if remaining <= 0:
+                            self.timed_out += 1
+                            logger.warning(f"⏱️ 生成待ちタイムアウト: {self.engine} ({timeout:.1f}秒)")
+                            raise EngineBusy(self.engine, self.retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.queued -= 1
+
+            self.in_flight += 1
+            self.admitted += 1
+            wait_ms = (time.monotonic() - started) * 1000
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def release(self, service_seconds: float):
+        with self._cond:
+            self.in_flight -= 1
+            if self.avg_service_seconds:
+                self.avg_service_seconds += self.EWMA_ALPHA * (service_seconds - self.avg_service_seconds)
+            else:
+                self.avg_service_seconds = service_seconds
+            self._cond.notify()
+
+    def as_dict(self) -> dict:
+        with self._cond:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'pending': self.pending,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'avg_wait_ms': round(self.total_wait_ms / self.admitted, 1) if self.admitted else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 1),
+                'avg_service_ms': round(self.avg_service_seconds * 1000, 1),
+            }
+
+
+_limiters: dict[str, EngineLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_engine_limiter(engine: str) -> EngineLimiter:
+    """エンジンごとのリミッターを取得（プロセス内で共有）"""
+    limiter = _limiters.get(engine)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(engine)
+            if limiter is None:
+                max_in_flight = getattr(settings, 'ENGINE_MAX_IN_FLIGHT', {})
+                max_queue = getattr(settings, 'ENGINE_MAX_QUEUE', {})
+                limiter = EngineLimiter(
+                    engine,
+                    max_in_flight=max_in_flight.get(engine, getattr(settings, 'ENGINE_MAX_IN_FLIGHT_DEFAULT', 4)),
+                    max_queue=max_queue.get(engine, getattr(settings, 'ENGINE_MAX_QUEUE_DEFAULT', 8)),
+                    queue_timeout=getattr(settings, 'ENGINE_QUEUE_TIMEOUT_SECONDS', 30),
+                )
+                _limiters[engine] = limiter
+    return limiter
+
+
+@contextmanager
+def engine_slot(engine: str, deadline=None):
+    """
+    エンジンの実行枠を確保して処理を実行
+
+    使用例:
+        with engine_slot(instance.engine, deadline):
+            result = generate(...)
+    """
+    limiter = get_engine_limiter(engine)
+    with record_stage('engine_wait'):
+        limiter.acquire(deadline)
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        limiter.release(time.monotonic() - started)
+
+
+def get_engine_states() -> dict[str, dict]:
+    """全エンジンの実行数・待ち行列の状態（管理画面用）"""
+    return {engine: limiter.as_dict() for engine, limiter in list(_limiters.items())}
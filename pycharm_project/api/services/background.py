@@ -0,0 +1,67 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundExecutor:
+    """
+    プロセス内のバックグラウンド実行プール
+    リクエストスレッドから重い処理（生成・GCS再ホスト等）を切り離すために使用
+    """
+
+    def __init__(self, name: str, max_workers_setting: str, default_workers: int):
+        self.name = name
+        self._max_workers_setting = max_workers_setting
+        self._default_workers = default_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """ThreadPoolExecutorの遅延初期化（gunicornのfork後に作成するため）"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    max_workers = getattr(settings, self._max_workers_setting, self._default_workers)
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=max_workers,
+                        thread_name_prefix=self.name,
+                    )
+                    logger.info(f"🧵 バックグラウンドプール作成: {self.name} (workers={max_workers})")
+        return self._executor
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        関数をバックグラウンドで実行
+        スレッドごとのDB接続を実行前後で整理する
+        """
+        def run():
+            close_old_connections()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                logger.exception(f"❌ バックグラウンド処理エラー: {self.name} {getattr(fn, '__name__', fn)}")
+                raise
+            finally:
+                close_old_connections()
+
+        return self._get_executor().submit(run)
+
+
+# 生成ジョブ用のプール（遅いエンジンが他のエンジンのジョブを塞がないようエンジンごとに分ける）
+_generation_executors: dict[str, BackgroundExecutor] = {}
+_generation_executors_lock = threading.Lock()
+
+
+def get_generation_executor(engine: str) -> BackgroundExecutor:
+    """エンジンごとの生成ジョブ用プールを取得"""
+    with _generation_executors_lock:
+        executor = _generation_executors.get(engine)
+        if executor is None:
+            executor = BackgroundExecutor(f'generation-job-{engine}', 'GENERATION_JOB_WORKERS', 4)
+            _generation_executors[engine] = executor
+        return executor
@@ -0,0 +1,273 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.utils import timezone
+
+from api.models.library import Library
+from api.services.circuit_breaker import UpstreamUnavailable
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.gcs_upload_service import StoredImage, gcs_upload_service
+from api.services.generation_stats_service import record_libraries_created
+from api.services.rehost_service import (
+    is_gcs_url, is_write_behind, pending_rehost_fields, schedule_rehost, schedule_variants,
+)
+from api.services.timeline_bulk_service import schedule_image_deletion
+from api.services.tsukuruma_api_execution import generate_or_edit
+
+logger = logging.getLogger(__name__)
+
+
+def _thread_task(fn):
+    """リクエスト内のワーカースレッド用ラッパー（スレッドごとのDB接続を終了時に閉じる）"""
+    def run(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            connections.close_all()
+    return run
+
+
+class BatchExecution:
+    """
+    複数メニュー・複数枚の一括生成
+    - 各itemをBATCH_EXECUTION_CONCURRENCYの上限で並行にTsukurumaへ投げる
+    - 生成結果のGCS再ホストもBATCH_REHOST_CONCURRENCYの上限で並行に行う
+    - Libraryへの保存は全件終了後に1回のbulk_createで行う
+    - 結果はitemごとに完了順で返す（iter_results）
+    """
+
+    def __init__(self, items: list[dict], image, user_id: str, author_name: str = '',
+                 deadline: Deadline | None = None):
+        self.items = items
+        self.user_id = user_id
+        self.author_name = author_name
+        self.deadline = deadline
+        self.write_behind = is_write_behind()
+        self._library_entries: list[Library] = []
+        self._saved_entries: list[Library] = []
+
+        # 共有画像はスレッドごとに読み出せるよう先にバイト列にしておく
+        self._image_bytes = None
+        if image:
+            image.seek(0)
+            self._image_name = image.name
+            self._image_content_type = image.content_type
+            self._image_bytes = image.read()
+
+    def _image_copy(self):
+        if self._image_bytes is None:
+            return None
+        return SimpleUploadedFile(self._image_name, self._image_bytes, content_type=self._image_content_type)
+
+    def iter_results(self):
+        """
+        itemごとの結果を完了順に返すジェネレーター
+        途中でクライアントが切断しても（ジェネレーターが閉じられても）残りの完了を待ってLibraryに保存する
+        """
+        max_workers = min(getattr(settings, 'BATCH_EXECUTION_CONCURRENCY', 4), len(self.items))
+        generation_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-generate')
+        rehost_pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BATCH_REHOST_CONCURRENCY', 4),
+            thread_name_prefix='batch-rehost',
+        )
+        try:
+            futures = {
+                generation_pool.submit(_thread_task(self._run_item), index, item, rehost_pool): index
+                for index, item in enumerate(self.items)
+            }
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            generation_pool.shutdown(wait=True)
+            rehost_pool.shutdown(wait=True)
+            self._save_library_entries()
+
+    def _run_item(self, index: int, item: dict, rehost_pool: ThreadPoolExecutor) -> dict:
+        menu = item["menu"]
+        num_images = item["num_images"]
+        try:
+            result, prompt_formatted = generate_or_edit(
+                menu,
+                image=self._image_copy(),
+                additional_prompt_for_my_car=item["additional_prompt_for_my_car"],
+                additional_prompt_for_others=item["additional_prompt_for_others"],
+                aspect_ratio=item["aspect_ratio"],
+                prompt_variables=item["prompt_variables"],
+                deadline=self.deadline,
+                num_images=num_images,
+            )
+        except Exception as e:
+            logger.exception(f"❌ バッチ生成エラー: index={index}, menu_id={menu.id}")
+            return self._error_result(index, menu.id, getattr(e, 'status_code', 500), str(e))
+
+        if not result.success:
+            return self._error_result(index, menu.id, result.status_code, result.error)
+
+        source_urls = [
+            result.data[f"image_presigned_url_{number}"]
+            for number in range(1, num_images + 1)
+            if result.data.get(f"image_presigned_url_{number}")
+        ]
+        frontend_ids = item.get("frontend_ids") or [str(uuid.uuid4()) for _ in source_urls]
+
+        # 生成画像ごとにGCS再ホストを並行実行（write-behindモードでは保存後にバックグラウンドで実行）
+        if self.write_behind:
+            stored_images = [StoredImage(url=source_url) for source_url in source_urls]
+        else:
+            upload_futures = [
+                rehost_pool.submit(_thread_task(self._rehost), source_url, frontend_id)
+                for source_url, frontend_id in zip(source_urls, frontend_ids)
+            ]
+            stored_images = []
+            failure = None
+            for future in upload_futures:
+                try:
+                    stored_images.append(future.result())
+                except (DeadlineExceeded, UpstreamUnavailable) as e:
+                    failure = failure or e
+            if failure is not None:
+                # 時間切れ・サーキットオープンのitemは上流の一時URLを保存せずに504/503で失敗させ、
+                # 同じitemでアップロード済みの画像は削除する
+                schedule_image_deletion([stored.url for stored in stored_images])
+                return self._error_result(index, menu.id, failure.status_code, str(failure))
+
+        created_at = result.data.get("created_at")
+        images = []
+        for source_url, stored, frontend_id in zip(source_urls, stored_images, frontend_ids):
+            image_url = stored.url
+            library_fields = (
+                pending_rehost_fields(source_url) if self.write_behind
+                else {'image_url': image_url, 'image_size_bytes': stored.size}
+            )
+            # list.appendはスレッドセーフ
+            self._library_entries.append(Library(
+                user_id=self.user_id,
+                frontend_id=frontend_id,
+                display_prompt=prompt_formatted,
+                menu_name=menu.name,
+                used_form_data=self._form_data(item),
+                category_id=menu.category_id,
+                menu_id=menu.id,
+                engine=menu.engine,
+                rating=None,
+                is_public=False,
+                author_name=self.author_name,
+                is_saved_to_library=False,
+                timestamp=timezone.now(),
+                **library_fields,
+            ))
+            images.append({"frontendId": frontend_id, "generatedImageUrl": image_url})
+
+        return {
+            "type": "item",
+            "index": index,
+            "menuId": menu.id,
+            "status": result.status_code,
+            "promptFormatted": prompt_formatted,
+            "createdAt": created_at,
+            "images": images,
+        }
+
+    def _rehost(self, source_url: str, frontend_id: str) -> StoredImage:
+        """
+        GCSへ再ホスト（失敗時は元のURLを使用。時間切れ・サーキットオープンは送出）
+        派生画像はLibrary保存後にバックグラウンドで作成する
+        """
+        try:
+            return gcs_upload_service.store_generated_image_from_url(
+                source_url, self.user_id, frontend_id, deadline=self.deadline, with_variants=False
+            )
+        except (DeadlineExceeded, UpstreamUnavailable):
+            raise
+        except Exception as e:
+            logger.error(f"❌ バッチ生成画像のGCSアップロードエラー: frontend_id={frontend_id}, error={e}")
+            logger.info("⚠️ エラーのため元のURLを使用します")
+            return StoredImage(url=source_url)
+
+    @staticmethod
+    def _form_data(item: dict) -> dict:
+        """Libraryに保存するフォームデータ（Menuオブジェクト等を除く）"""
+        return {
+            key: value for key, value in item.items()
+            if key not in ("menu", "frontend_ids")
+        }
+
+    @staticmethod
+    def _error_result(index: int, menu_id: int, status_code: int, error: str) -> dict:
+        return {
+            "type": "item",
+            "index": index,
+            "menuId": menu_id,
+            "status": status_code,
+            "error": error,
+        }
+
+    @property
+    def requested_frontend_ids(self) -> list[str]:
+        """クライアントが指定したfrontend_id（全item分）"""
+        return [frontend_id for item in self.items for frontend_id in item.get("frontend_ids") or []]
+
+    def _save_library_entries(self):
+        """全件分のLibraryを1回のbulk_createで保存"""
+        if not self._library_entries:
+            return
+        # 既に同じ(user_id, frontend_id)がある行はスキップされる
+        # ignore_conflicts指定時は主キーが返らないため、(frontend_id, timestamp)が一致する行を挿入された行とみなして主キーを設定する
+        Library.objects.bulk_create(self._library_entries, ignore_conflicts=True)
+        inserted = {
+            (frontend_id, timestamp): pk
+            for pk, frontend_id, timestamp in Library.objects.filter(
+                user_id=self.user_id,
+                frontend_id__in=[entry.frontend_id for entry in self._library_entries],
+            ).values_list('pk', 'frontend_id', 'timestamp')
+        }
+        self._saved_entries = []
+        skipped = []
+        for entry in self._library_entries:
+            pk = inserted.get((entry.frontend_id, entry.timestamp))
+            if pk is None:
+                skipped.append(entry)
+                continue
+            entry.pk = pk
+            self._saved_entries.append(entry)
+        logger.info(f"✅ バッチ生成結果をLibraryに保存: {len(self._saved_entries)}件（重複でスキップ {len(skipped)}件）")
+
+        # bulk_createではpost_saveが送られないため日次集計に直接加算
+        record_libraries_created(self._saved_entries)
+        if self.write_behind:
+            for entry in self._saved_entries:
+                schedule_rehost(entry.id)
+        else:
+            schedule_variants([entry.id for entry in self._saved_entries if is_gcs_url(entry.image_url)])
+        if skipped:
+            self._discard_skipped_images(skipped)
+
+    def _discard_skipped_images(self, skipped: list[Library]):
+        """
+        保存されなかった行のためにGCSへ再ホストした画像を削除
+        オブジェクト名はfrontend_idから決まるため、既存の行と同じURLになった画像（上書きされた既存の画像）は残す
+        """
+        existing_urls = set(
+            Library.objects.filter(
+                user_id=self.user_id,
+                frontend_id__in=[entry.frontend_id for entry in skipped],
+            ).values_list('image_url', flat=True)
+        )
+        schedule_image_deletion(
+            entry.image_url for entry in skipped
+            if is_gcs_url(entry.image_url) and entry.image_url not in existing_urls
+        )
+
+    @property
+    def saved_count(self) -> int:
+        return len(self._saved_entries)
+
+    @property
+    def skipped_frontend_ids(self) -> list[str]:
+        """既存の行と重複して保存されなかったfrontend_id"""
+        saved_ids = {entry.frontend_id for entry in self._saved_entries}
+        return [entry.frontend_id for entry in self._library_entries if entry.frontend_id not in saved_ids]
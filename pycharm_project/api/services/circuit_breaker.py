@@ -0,0 +1,114 @@
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(APIException):
+    """
+    サーキットブレーカーが開いている外部APIへの呼び出しエラー（503）
+    waitを設定するとDRFの例外ハンドラがRetry-Afterヘッダーを付与する
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = '外部サービスが一時的に利用できません。時間をおいて再度お試しください。'
+    default_code = 'upstream_unavailable'
+
+    def __init__(self, upstream: str, wait: float):
+        super().__init__(f'{upstream} は一時的に利用できません。{math.ceil(wait)}秒後に再度お試しください。')
+        self.upstream = upstream
+        self.wait = math.ceil(wait)
+
+
+class CircuitBreaker:
+    """
+    外部APIごとのサーキットブレーカー
+    - closed: 通常通り呼び出す。連続失敗がしきい値に達したらopen
+    - open: recovery_seconds の間は呼び出さずに即座に失敗
+    - half_open: 回復確認として1件だけ通し、成功でclosed・失敗で再びopen
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """呼び出し前のチェック（open中はUpstreamUnavailableを送出）"""
+        with self._lock:
+            if self.state == 'closed':
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == 'open' and elapsed >= self.recovery_seconds:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                logger.info(f"🔌 サーキット回復確認: {self.name}")
+                return
+            raise UpstreamUnavailable(self.name, max(self.recovery_seconds - elapsed, 1))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info(f"✅ サーキットclosed: {self.name}")
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(f"🚫 サーキットopen: {self.name} (連続失敗 {self.consecutive_failures}回)")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def record_cancelled(self):
+        """上流の失敗ではない中断（呼び出し側の時間予算切れ等）。失敗にも成功にも数えず、回復確認の枠だけ戻す"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+            }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """外部API名ごとのブレーカーを取得（プロセス内で共有）"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=getattr(settings, 'CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5),
+                    recovery_seconds=getattr(settings, 'CIRCUIT_BREAKER_RECOVERY_SECONDS', 30),
+                )
+                _breakers[name] = breaker
+    return breaker
+
+
+def get_circuit_states() -> dict[str, dict]:
+    """全ブレーカーの状態（管理画面用）"""
+    return {name: breaker.as_dict() for name, breaker in list(_breakers.items())}
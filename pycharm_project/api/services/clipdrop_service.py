@@ -1,5 +1,4 @@
 import os
-import requests
 import logging
 from typing import Tuple, Dict, Any
 from django.conf import settings
@@ -7,6 +6,10 @@ from PIL import Image
 import io
 import tempfile
 
+from api.services.circuit_breaker import UpstreamUnavailable
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.http_client import http_client
+
 logger = logging.getLogger(__name__)
 
 # Anchor position mapping
@@ -23,7 +26,9 @@ ANCHOR_POSITIONS = {
 }
 
 class ClipdropService:
-    def __init__(self):
+    def __init__(self, deadline: Deadline | None = None):
+        # リクエストの時間予算（指定時は各API呼び出しを残り時間で制限）
+        self.deadline = deadline
         self.api_key = os.getenv('CLIPDROP_API_KEY')
         if not self.api_key or self.api_key == 'your_clipdrop_api_key_here':
             raise ValueError('CLIPDROP_API_KEYが設定されていないか、デフォルト値のままです。実際のAPIキーを設定してください。')
@@ -83,11 +88,13 @@ class ClipdropService:
             (width, height) のタプル
         """
         try:
-            response = requests.get(image_url, stream=True, timeout=30)
+            response = http_client.get(image_url, stream=True, timeout=30, deadline=self.deadline)
             response.raise_for_status()
             
             with Image.open(io.BytesIO(response.content)) as img:
                 return img.size
+        except (UpstreamUnavailable, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"画像サイズ取得エラー: {e}")
             raise ValueError(f"画像サイズの取得に失敗しました: {e}")
@@ -103,9 +110,11 @@ class ClipdropService:
             画像のバイナリデータ
         """
         try:
-            response = requests.get(image_url, timeout=30)
+            response = http_client.get(image_url, timeout=30, deadline=self.deadline)
             response.raise_for_status()
             return response.content
+        except (UpstreamUnavailable, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"画像ダウンロードエラー: {e}")
             raise ValueError(f"画像のダウンロードに失敗しました: {e}")
@@ -152,12 +161,14 @@ class ClipdropService:
             
             # 5. Clipdrop APIに送信
             logger.info("Clipdrop API呼び出し開始")
-            response = requests.post(
+            response = http_client.post(
                 self.uncrop_endpoint,
                 files=files,
                 data=data,
                 headers=headers,
-                timeout=60
+                timeout=60,
+                upstream='clipdrop',
+                deadline=self.deadline
             )
             
             if not response.ok:
@@ -173,6 +184,8 @@ class ClipdropService:
             logger.info("Clipdrop API呼び出し成功")
             return response.content
             
+        except (UpstreamUnavailable, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"画像拡張エラー: {e}")
             raise ValueError(f"画像拡張に失敗しました: {e}") 
\ No newline at end of file
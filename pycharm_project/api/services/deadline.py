@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class DeadlineExceeded(APIException):
+    """リクエスト全体の時間予算を使い切った場合のエラー（504）"""
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    default_detail = '処理時間の上限を超えました。時間をおいて再度お試しください。'
+    default_code = 'deadline_exceeded'
+
+
+class Deadline:
+    """
+    リクエスト単位の時間予算
+    Viewで作成し、生成・GCS再ホスト・SUZURI/Clipdrop呼び出しまで引き回して
+    各外部呼び出しのタイムアウトを残り時間で制限する
+    """
+
+    # これ未満の残り時間では外部呼び出しを開始しない
+    MIN_CALL_SECONDS = 0.5
+
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+
+    @classmethod
+    def for_request(cls, setting_name: str = 'REQUEST_DEADLINE_SECONDS', default: float = 110) -> 'Deadline':
+        """設定値の予算でDeadlineを作成（gunicornのtimeoutより短くする）"""
+        return cls(getattr(settings, setting_name, default))
+
+    def remaining(self) -> float:
+        """残り時間（秒）"""
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str = ''):
+        """残り時間がなければDeadlineExceededを送出"""
+        if self.remaining() < self.MIN_CALL_SECONDS:
+            raise DeadlineExceeded(f'処理時間の上限を超えました（{stage}）' if stage else None)
+
+    def timeout(self, timeout=None) -> tuple[float, float]:
+        """
+        requests用の(接続, 読み取り)タイムアウトを残り時間で制限して返す
+
+        Args:
+            timeout: 呼び出し側の希望タイムアウト（数値または(接続, 読み取り)のタプル）
+        """
+        self.check()
+        remaining = self.remaining()
+        if timeout is None:
+            connect, read = remaining, remaining
+        elif isinstance(timeout, (int, float)):
+            connect, read = timeout, timeout
+        else:
+            connect, read = timeout
+        return min(connect, remaining), min(read, remaining)
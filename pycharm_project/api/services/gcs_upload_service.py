@@ -1,8 +1,12 @@
+import base64
+import hashlib
+import io
 import json
 import uuid
 import os
 import requests
 import tempfile
+from dataclasses import dataclass, field
 from datetime import timedelta
 from django.conf import settings
 from google.cloud import storage
@@ -11,8 +15,97 @@ import logging
 import codecs
 from typing import Optional
 
+from api.services.circuit_breaker import UpstreamUnavailable
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.http_client import http_client
+from api.services.image_variants import build_webp_variants, variant_blob_name, variant_widths
+from api.services.stage_timer import record_bytes, record_stage
+
 logger = logging.getLogger(__name__)
 
+# レジューマブルアップロードのチャンクサイズは256KBの倍数である必要がある
+_CHUNK_ALIGNMENT = 256 * 1024
+# アップロードの再送・派生画像作成のため元画像を控えるファイル（これを超える分はディスクに書き出す）
+_SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+# バッチリクエスト1回にまとめる削除の数（GCSのバッチAPIの推奨上限）
+_DELETE_BATCH_SIZE = 100
+
+
+@dataclass
+class StoredImage:
+    """GCSに保存した画像（variantsは幅（文字列）→ 派生画像のURL。作成しなかった場合は空）"""
+    url: str
+    variants: dict[str, str] = field(default_factory=dict)
+    size: Optional[int] = None  # 元画像のサイズ（バイト。不明な場合はNone）
+
+
+class HashingStreamReader:
+    """
+    HTTPレスポンス本体をファイルライクに読み出すラッパー
+    読み出しながらMD5とサイズを計算する（全体をメモリに載せない）
+    読み出した内容はspool（一定サイズを超える分はディスクに書き出す一時ファイル）に書き写し、
+    レジューマブルアップロードの再送・部分コミット時は読み出し済みの位置までシークして読み直せる
+    """
+
+    def __init__(self, raw, spool, read_size: int = 64 * 1024):
+        self._raw = raw
+        self._spool = spool  # 読み出した内容の控え（派生画像の作成にも使う）
+        self._read_size = read_size
+        self._md5 = hashlib.md5()
+        self._position = 0
+        self.bytes_read = 0  # 上流から読み出したバイト数（読み直した分は数えない）
+
+    def read(self, size: int = -1) -> bytes:
+        # レジューマブルアップロードは要求サイズ未満の読み出しを最終チャンクとみなすため、
+        # EOFでない限り要求サイズまで読み切って返す
+        parts = []
+        remaining = -1 if size is None or size < 0 else size
+        # シークで戻った位置からは控えを読み直す
+        if self._position < self.bytes_read and remaining != 0:
+            self._spool.seek(self._position)
+            replay = self._spool.read(self.bytes_read - self._position if remaining < 0
+                                      else min(remaining, self.bytes_read - self._position))
+            parts.append(replay)
+            self._position += len(replay)
+            if remaining > 0:
+                remaining -= len(replay)
+        # 控えの末尾から先は上流から読み出し、MD5・サイズは一度だけ計算する
+        if self._position == self.bytes_read and remaining != 0:
+            self._spool.seek(self.bytes_read)
+            while remaining != 0:
+                part = self._raw.read(self._read_size if remaining < 0 else min(remaining, self._read_size))
+                if not part:
+                    break
+                self._md5.update(part)
+                self._spool.write(part)
+                self.bytes_read += len(part)
+                self._position += len(part)
+                parts.append(part)
+                if remaining > 0:
+                    remaining -= len(part)
+        return b''.join(parts)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('HashingStreamReaderは末尾からのシークに対応していません')
+        if not 0 <= offset <= self.bytes_read:
+            raise io.UnsupportedOperation(f'読み出し済みの範囲外にはシークできません: {offset} (読み出し済み {self.bytes_read})')
+        self._position = offset
+        return self._position
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    @property
+    def md5_base64(self) -> str:
+        """GCSのmd5Hashと同じ形式（base64）"""
+        return base64.b64encode(self._md5.digest()).decode()
+
 
 class GCSUploadService:
     """Google Cloud Storageファイルアップロードサービス"""
@@ -252,20 +345,43 @@ class GCSUploadService:
             
             raise Exception(f"Google Cloud Storage初期化失敗: {bucket_error}")
     
-    def upload_generated_image_from_url(self, image_url: str, user_id: str, frontend_id: str) -> str:
+    def _gcs_timeout(self, deadline: Optional[Deadline], default: float = 60) -> float:
+        """GCS API呼び出しのタイムアウト（Deadline指定時は残り時間で制限）"""
+        if deadline is None:
+            return default
+        deadline.check('GCS')
+        return min(default, deadline.remaining())
+
+    def upload_generated_image_from_url(self, image_url: str, user_id: str, frontend_id: str,
+                                        deadline: Optional[Deadline] = None) -> str:
         """
-        生成画像をURLからダウンロードしてGoogle Cloud Storageにアップロード
+        生成画像をURLからダウンロードしてGoogle Cloud Storageにアップロード（派生画像は作成しない）
+        
+        Returns:
+            str: GCSのパブリックURL
+        """
+        return self.store_generated_image_from_url(
+            image_url, user_id, frontend_id, deadline=deadline, with_variants=False
+        ).url
+
+    def store_generated_image_from_url(self, image_url: str, user_id: str, frontend_id: str,
+                                       deadline: Optional[Deadline] = None,
+                                       with_variants: bool = True) -> StoredImage:
+        """
+        生成画像をURLからダウンロードしてGoogle Cloud Storageにアップロードし、派生画像（WebPサムネイル）も作成
         
         Args:
             image_url: ダウンロードする画像のURL
             user_id: ユーザーID
             frontend_id: フロントエンドの画像ID
+            deadline: リクエストの時間予算（指定時は各呼び出しを残り時間で制限）
+            with_variants: 派生画像を作成するか
             
         Returns:
-            str: GCSのパブリックURL
+            StoredImage: GCSのパブリックURLと派生画像のURL
             
         Raises:
-            Exception: ダウンロードまたはアップロードに失敗した場合
+            Exception: ダウンロードまたはアップロードに失敗した場合（派生画像の失敗では例外にしない）
         """
         logger.info(f"🖼️ === upload_generated_image_from_url開始 ===")
         logger.info(f"📤 image_url: {image_url}")
@@ -276,44 +392,37 @@ class GCSUploadService:
         try:
             logger.info(f"📥 生成画像ダウンロード開始: {image_url}")
             
-            # 画像をダウンロード
+            # 画像をストリーミングでダウンロード（本体はメモリに展開しない）
             logger.info("🌐 HTTP GETリクエスト実行中...")
-            response = requests.get(image_url, timeout=30)
-            logger.info(f"📡 HTTPレスポンス: {response.status_code} {response.reason}")
-            response.raise_for_status()
-            
-            # Content-Typeから拡張子を判定
-            content_type = response.headers.get('content-type', 'image/jpeg')
-            logger.info(f"📄 Content-Type: {content_type}")
-            file_extension = self._get_extension_from_content_type(content_type)
-            logger.info(f"📎 ファイル拡張子: {file_extension}")
-            
-            # データサイズをログ
-            content_length = len(response.content)
-            logger.info(f"📊 ダウンロードデータサイズ: {content_length} bytes")
-            
-            # GCSオブジェクト名を生成
-            unique_filename = f"{frontend_id}{file_extension}"
-            blob_name = f"generated-images/{user_id}/{unique_filename}"
-            
-            logger.info(f"📁 GCSアップロード開始:")
-            logger.info(f"   - blob_name: {blob_name}")
-            logger.info(f"   - content_type: {content_type}")
-            
-            # GCSにアップロード
-            logger.info("☁️ GCSブロブ作成中...")
-            blob = self.bucket.blob(blob_name)
-            blob.content_type = content_type
-            
-            # バイトデータを直接アップロード
-            logger.info("⬆️ データアップロード実行中...")
-            blob.upload_from_string(response.content, content_type=content_type)
-            logger.info("✅ データアップロード完了")
-            
-            # パブリック読み取り権限を設定
-            logger.info("🔓 パブリック権限設定中...")
-            blob.make_public()
-            logger.info("✅ パブリック権限設定完了")
+            with http_client.get(image_url, timeout=30, upstream='generated-image-download', deadline=deadline,
+                                 stream=True) as response:
+                logger.info(f"📡 HTTPレスポンス: {response.status_code} {response.reason}")
+                response.raise_for_status()
+                
+                # Content-Typeから拡張子を判定
+                content_type = response.headers.get('content-type', 'image/jpeg')
+                logger.info(f"📄 Content-Type: {content_type}")
+                file_extension = self._get_extension_from_content_type(content_type)
+                logger.info(f"📎 ファイル拡張子: {file_extension}")
+                logger.info(f"📊 Content-Length: {response.headers.get('content-length', '不明')}")
+                
+                # GCSオブジェクト名を生成
+                unique_filename = f"{frontend_id}{file_extension}"
+                blob_name = f"generated-images/{user_id}/{unique_filename}"
+                
+                logger.info(f"📁 GCSアップロード開始:")
+                logger.info(f"   - blob_name: {blob_name}")
+                logger.info(f"   - content_type: {content_type}")
+                
+                # レスポンス本体を固定サイズのチャンクでGCSへ転送
+                # （レジューマブルアップロード。公開ACLとContent-Typeも同じアップロードで設定）
+                # 再送時の読み直し・派生画像の作成用に転送した内容を控える（一定サイズを超える分は一時ファイル）
+                response.raw.decode_content = True
+                with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY) as original:
+                    reader = HashingStreamReader(response.raw, original)
+                    blob = self._upload_stream(blob_name, reader, content_type, deadline)
+                    record_bytes('rehost', reader.bytes_read)
+                    variants = self.create_image_variants(original, blob_name, deadline) if with_variants else {}
             
             # パブリックURLを生成
             file_url = blob.public_url
@@ -321,8 +430,11 @@ class GCSUploadService:
             logger.info(f"🎉 === 生成画像GCSアップロード成功 ===")
             logger.info(f"🔗 blob_name: {blob_name}")
             logger.info(f"🔗 public_url: {file_url}")
-            return file_url
+            return StoredImage(url=file_url, variants=variants, size=reader.bytes_read)
             
+        except (DeadlineExceeded, UpstreamUnavailable):
+            # 時間切れ・サーキットオープンは呼び出し側で504/503として扱うため包まずに送出
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ === 画像ダウンロードエラー ===")
             logger.error(f"💥 エラータイプ: {type(e).__name__}")
@@ -346,6 +458,102 @@ class GCSUploadService:
             
             raise Exception(f"Google Cloud Storageアップロード失敗: {str(e)}")
     
+    def _upload_stream(self, blob_name: str, reader: HashingStreamReader, content_type: str,
+                       deadline: Optional[Deadline] = None) -> storage.Blob:
+        """
+        ストリームをチャンク単位でGCSにアップロードし、転送中に計算したMD5をGCS側の値と照合する
+        メモリ使用量はチャンクサイズ（GCS_UPLOAD_CHUNK_SIZE）程度に収まる
+        （再送・部分コミット時はreaderが控えから読み直すため、MD5は上流から読んだ内容で一度だけ計算される）
+        """
+        chunk_size = getattr(settings, 'GCS_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+        chunk_size = max(_CHUNK_ALIGNMENT, chunk_size // _CHUNK_ALIGNMENT * _CHUNK_ALIGNMENT)
+
+        blob = self.bucket.blob(blob_name, chunk_size=chunk_size)
+        blob.content_type = content_type
+
+        logger.info(f"⬆️ ストリーミングアップロード実行中... (chunk_size={chunk_size} bytes)")
+        blob.upload_from_file(
+            reader,
+            content_type=content_type,
+            predefined_acl='publicRead',
+            timeout=self._gcs_timeout(deadline),
+        )
+        logger.info(f"✅ データアップロード完了: {reader.bytes_read} bytes, md5={reader.md5_base64}")
+
+        if blob.md5_hash and blob.md5_hash != reader.md5_base64:
+            logger.error(f"❌ チェックサム不一致: local={reader.md5_base64}, gcs={blob.md5_hash}")
+            blob.delete(timeout=self._gcs_timeout(deadline))
+            raise Exception(f"チェックサム不一致のためアップロードを破棄しました: {blob_name}")
+        return blob
+
+    def create_image_variants(self, source, blob_name: str, deadline: Optional[Deadline] = None) -> dict[str, str]:
+        """
+        元画像からWebPの派生画像（IMAGE_VARIANT_WIDTHSの幅）を作成し、元画像の隣にアップロード
+        派生画像は一覧表示の軽量化用のため、失敗しても例外にせず空のdictを返す（クライアントは元画像を表示する）
+        
+        Args:
+            source: 元画像（パスまたはシーク可能なファイルライクオブジェクト）
+            blob_name: 元画像のGCSオブジェクト名
+            deadline: リクエストの時間予算
+            
+        Returns:
+            dict[str, str]: 幅（文字列）→ 派生画像のパブリックURL
+        """
+        widths = variant_widths()
+        if not widths:
+            return {}
+        try:
+            with record_stage('derive'):
+                if hasattr(source, 'seek'):
+                    source.seek(0)
+                rendered = build_webp_variants(source, widths)
+                variants = {}
+                for width, data in rendered.items():
+                    blob = self.bucket.blob(variant_blob_name(blob_name, width))
+                    blob.cache_control = 'public, max-age=86400'
+                    blob.upload_from_string(
+                        data,
+                        content_type='image/webp',
+                        predefined_acl='publicRead',
+                        timeout=self._gcs_timeout(deadline),
+                    )
+                    variants[str(width)] = blob.public_url
+            logger.info(f"🖼️ 派生画像作成: {blob_name} → {sorted(variants, key=int)}")
+            return variants
+        except Exception as e:
+            logger.warning(f"⚠️ 派生画像の作成に失敗しました（元画像のみ保存）: {blob_name}, error={e}")
+            return {}
+
+    def create_variants_for_url(self, image_url: str) -> dict[str, str]:
+        """
+        保存済みのGCS画像から派生画像を作成（既存画像のバックフィル用）
+
+        Returns:
+            dict[str, str]: 幅（文字列）→ 派生画像のパブリックURL（GCSの画像でない・失敗した場合は空）
+        """
+        self._ensure_initialized()
+        blob_name = self._blob_name_from_url(image_url)
+        if not blob_name:
+            return {}
+        with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY) as original:
+            try:
+                self.bucket.blob(blob_name).download_to_file(original, timeout=60)
+            except Exception as e:
+                logger.warning(f"⚠️ 派生画像の元画像を取得できません: {blob_name}, error={e}")
+                return {}
+            return self.create_image_variants(original, blob_name)
+
+    def store_car_setting_image(self, file, user_id: str, car_id: str, image_type: str) -> StoredImage:
+        """
+        愛車設定用画像をGoogle Cloud Storageにアップロードし、派生画像（WebPサムネイル）も作成
+        
+        Returns:
+            StoredImage: GCSのパブリックURLと派生画像のURL
+        """
+        file_url = self.upload_car_setting_image(file, user_id, car_id, image_type)
+        blob_name = self._blob_name_from_url(file_url)
+        return StoredImage(url=file_url, variants=self.create_image_variants(file, blob_name) if blob_name else {})
+
     def upload_car_setting_image(self, file, user_id: str, car_id: str, image_type: str) -> str:
         """
         愛車設定用画像をGoogle Cloud Storageにアップロード
@@ -412,30 +620,8 @@ class GCSUploadService:
             logger.info(f"🗑️ GCS画像削除開始: {image_url}")
             
             # URLからブロブ名を抽出
-            blob_name = None
-            
-            # 例: https://storage.googleapis.com/aisha-car-images/car-settings/...
-            if "storage.googleapis.com" in image_url:
-                logger.info("📍 storage.googleapis.com形式のURLを解析中...")
-                # URLを解析してブロブ名を抽出
-                url_parts = image_url.split(f"{self.bucket_name}/")
-                logger.info(f"🔍 URL分割結果: {url_parts}")
-                if len(url_parts) > 1:
-                    blob_name = url_parts[1]
-                    logger.info(f"✅ ブロブ名抽出成功: {blob_name}")
-                else:
-                    logger.error(f"❌ URLからブロブ名を抽出できません: {image_url}")
-                    return False
-            elif hasattr(settings, 'GCS_CUSTOM_DOMAIN') and settings.GCS_CUSTOM_DOMAIN in image_url:
-                logger.info("📍 カスタムドメイン形式のURLを解析中...")
-                blob_name = image_url.replace(f"https://{settings.GCS_CUSTOM_DOMAIN}/", "")
-                logger.info(f"✅ ブロブ名抽出成功: {blob_name}")
-            else:
-                logger.error(f"❌ 未対応のURL形式: {image_url}")
-                return False
-            
+            blob_name = self._blob_name_from_url(image_url)
             if not blob_name:
-                logger.error("❌ ブロブ名が空です")
                 return False
             
             # GCSから削除
@@ -447,6 +633,7 @@ class GCSUploadService:
                 logger.info("📁 ブロブが存在します。削除実行中...")
                 blob.delete()
                 logger.info(f"✅ GCS削除成功: {blob_name}")
+                self._delete_image_variants(blob_name)
                 return True
             else:
                 logger.warning(f"⚠️ GCS削除対象が存在しません: {blob_name}")
@@ -457,6 +644,35 @@ class GCSUploadService:
             logger.error(f"❌ エラー詳細: type={type(e)}, args={e.args}")
             return False
     
+    def _blob_name_from_url(self, image_url: str) -> Optional[str]:
+        """GCSのパブリックURL（またはカスタムドメインのURL）からブロブ名を抽出（対応しない形式はNone）"""
+        # 例: https://storage.googleapis.com/aisha-car-images/car-settings/...
+        if "storage.googleapis.com" in image_url:
+            logger.info("📍 storage.googleapis.com形式のURLを解析中...")
+            # URLを解析してブロブ名を抽出
+            url_parts = image_url.split(f"{self.bucket_name}/")
+            logger.info(f"🔍 URL分割結果: {url_parts}")
+            if len(url_parts) > 1 and url_parts[1]:
+                logger.info(f"✅ ブロブ名抽出成功: {url_parts[1]}")
+                return url_parts[1]
+            logger.error(f"❌ URLからブロブ名を抽出できません: {image_url}")
+            return None
+        if hasattr(settings, 'GCS_CUSTOM_DOMAIN') and settings.GCS_CUSTOM_DOMAIN in image_url:
+            logger.info("📍 カスタムドメイン形式のURLを解析中...")
+            blob_name = image_url.replace(f"https://{settings.GCS_CUSTOM_DOMAIN}/", "")
+            logger.info(f"✅ ブロブ名抽出成功: {blob_name}")
+            return blob_name or None
+        logger.error(f"❌ 未対応のURL形式: {image_url}")
+        return None
+    
+    def _delete_image_variants(self, blob_name: str):
+        """元画像の隣にある派生画像を削除（作成されていない幅は無視）"""
+        for width in variant_widths():
+            try:
+                self.bucket.blob(variant_blob_name(blob_name, width)).delete()
+            except Exception:
+                pass
+    
     def delete_generated_image(self, image_url: str) -> bool:
         """
         Google Cloud Storageから生成画像を削除
@@ -470,6 +686,43 @@ class GCSUploadService:
         # 愛車設定画像削除と同じロジックを使用
         return self.delete_car_setting_image(image_url)
     
+    def delete_images(self, image_urls: list[str]) -> int:
+        """
+        複数の画像（と派生画像）をGCSのバッチリクエストでまとめて削除
+        存在確認は行わず、存在しないオブジェクトの削除エラーは無視する
+        
+        Args:
+            image_urls: 削除するファイルのURL
+            
+        Returns:
+            int: 削除を要求した元画像の数（URLからブロブ名を抽出できたもの）
+        """
+        self._ensure_initialized()
+        requested = 0
+        blob_names = []
+        for image_url in image_urls:
+            blob_name = self._blob_name_from_url(image_url)
+            if not blob_name:
+                continue
+            requested += 1
+            blob_names.append(blob_name)
+            blob_names.extend(variant_blob_name(blob_name, width) for width in variant_widths())
+        
+        failed = 0
+        for start in range(0, len(blob_names), _DELETE_BATCH_SIZE):
+            chunk = blob_names[start:start + _DELETE_BATCH_SIZE]
+            try:
+                # バッチ内の個別の失敗（404等）では例外にしない
+                with self.client.batch(raise_exception=False):
+                    for blob_name in chunk:
+                        self.bucket.blob(blob_name).delete()
+            except Exception as e:
+                failed += len(chunk)
+                logger.error(f"❌ GCS一括削除エラー: {e}")
+        
+        logger.info(f"🗑️ GCS一括削除: {len(blob_names)}オブジェクト（失敗 {failed}件）")
+        return requested
+    
     def generate_signed_url(self, blob_name: str, expiration_minutes: int = 60) -> str:
         """
         署名付きURLを生成（一時的なプライベートアクセス用）
@@ -525,6 +778,23 @@ class GCSUploadService:
         }
         return content_type_map.get(content_type.lower(), '.jpg')
     
+    def store_image_from_bytes(self, image_data: bytes, user_id: str, frontend_id: str,
+                               file_extension: str = '.jpg', with_variants: bool = True) -> StoredImage:
+        """
+        バイナリデータから生成画像をGoogle Cloud Storageにアップロードし、派生画像（WebPサムネイル）も作成
+        with_variants=Falseの場合、派生画像は呼び出し側で作成する（rehost_service.schedule_variants）
+        
+        Returns:
+            StoredImage: GCSのパブリックURLと派生画像のURL
+        """
+        file_url = self.upload_image_from_bytes(image_data, user_id, frontend_id, file_extension)
+        blob_name = f"generated-images/{user_id}/{frontend_id}{file_extension}"
+        return StoredImage(
+            url=file_url,
+            variants=self.create_image_variants(io.BytesIO(image_data), blob_name) if with_variants else {},
+            size=len(image_data),
+        )
+    
     def upload_image_from_bytes(self, image_data: bytes, user_id: str, frontend_id: str, file_extension: str = '.jpg') -> str:
         """
         バイナリデータから生成画像をGoogle Cloud Storageにアップロード
@@ -0,0 +1,57 @@
+import uuid
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q, QuerySet
+
+from api.models.library import Library
+
+
+class BigramSearchQuery(SearchQuery):
+    """
+    検索語を文字バイグラムのtsqueryに変換する（DB関数api_search_tsquery、マイグレーション0033で作成）
+    Library.search_vectorと同じ正規化・分割を行うため、日本語でも部分一致と同等の結果になる
+    """
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.function = 'api_search_tsquery'
+
+
+def _normalize_search(search: str) -> str:
+    return ''.join(search.split())
+
+
+def build_history_search_filter(search: str) -> Q:
+    """
+    生成履歴の検索条件（インデックスで引ける形）
+    - display_prompt / menu_name: search_vectorのGINインデックス
+    - user_id: UPPER(user_id)のトライグラムGINインデックス（icontainsはUPPER(...) LIKEになる）
+    - 検索語がUUIDの場合はLibraryのIDの完全一致も含める
+    """
+    condition = Q(search_vector=BigramSearchQuery(search)) | Q(user_id__icontains=search.strip())
+    try:
+        condition |= Q(pk=uuid.UUID(search.strip()))
+    except ValueError:
+        pass
+    return condition
+
+
+def search_generation_history(search: str, queryset: QuerySet | None = None) -> QuerySet:
+    """
+    生成履歴をランキング付きで検索
+    rank（ts_rank_cd。メニュー名の一致を重視）の降順、同順位は新しい順。ユーザーID・IDのみの一致はrank=0
+
+    Returns:
+        QuerySet: rankを注釈した検索結果（検索語が空の場合は空）
+    """
+    queryset = Library.objects.all() if queryset is None else queryset
+    if not _normalize_search(search):
+        return queryset.none()
+
+    rank = SearchRank(F('search_vector'), BigramSearchQuery(search), cover_density=True)
+    return (
+        queryset
+        .filter(build_history_search_filter(search))
+        .annotate(rank=rank)
+        .order_by('-rank', '-timestamp', '-pk')
+    )
@@ -0,0 +1,303 @@
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from api.models.generation_job import GenerationJob
+from api.models.menu import Menu
+from api.services.admission import get_engine_limiter
+from api.services.background import get_generation_executor
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.generation_run_service import record_generation_run
+from api.services.menu_execution_service import run_menu_execution
+from api.services.stage_timer import StageTimer
+from api.services.unified_credit_service import CreditReservationExpired, UnifiedCreditService
+
+logger = logging.getLogger(__name__)
+
+# 待機中はgunicornの同期ワーカーを1つ占有するため、設定値にかかわらずこれ以上は待たない
+MAX_WAIT_SECONDS = 10
+
+
+def _detach_uploaded_image(image):
+    """
+    リクエスト終了後も参照できるよう、アップロード画像をメモリ上のファイルに複製
+    （TemporaryUploadedFileはレスポンス返却後に削除されるため）
+    """
+    if not image:
+        return None
+    image.seek(0)
+    return SimpleUploadedFile(image.name, image.read(), content_type=image.content_type)
+
+
+def find_idempotent_job(user_id: str, idempotency_key: str) -> GenerationJob | None:
+    """
+    冪等性キーに対応する有効なジョブを取得
+    期限切れ・失敗したジョブはキーを解放して再実行できるようにする（Noneを返す）
+    """
+    job = GenerationJob.objects.filter(user_id=user_id, idempotency_key=idempotency_key).first()
+    if job is None:
+        return None
+    job = expire_stale_job(job)
+    if job.status == 'failed' or (job.expires_at and job.expires_at <= timezone.now()):
+        _release_idempotency_key(job)
+        return None
+    return job
+
+
+def _release_idempotency_key(job: GenerationJob):
+    GenerationJob.objects.filter(id=job.id, idempotency_key=job.idempotency_key).update(idempotency_key=None)
+    logger.info(f"🔓 冪等性キーを解放: job_id={job.id}, key={job.idempotency_key}")
+
+
+def create_generation_job(
+        instance: Menu,
+        form_data: dict,
+        user_id: str,
+        frontend_id: str | None,
+        idempotency_key: str | None = None,
+        status: str = 'queued') -> tuple[GenerationJob, bool]:
+    """
+    生成ジョブを作成
+
+    Returns:
+        tuple[GenerationJob, bool]: (ジョブ, 新規作成したか)
+        同じ冪等性キーのジョブが同時に作成された場合は既存ジョブを返す
+    """
+    now = timezone.now()
+    ttl = getattr(settings, 'IDEMPOTENCY_TTL_SECONDS', 86400)
+    try:
+        with transaction.atomic():
+            job = GenerationJob.objects.create(
+                menu_id=instance.id,
+                user_id=user_id,
+                frontend_id=frontend_id or '',
+                request_data=form_data,
+                status=status,
+                started_at=now if status == 'running' else None,
+                idempotency_key=idempotency_key,
+                expires_at=now + timedelta(seconds=ttl) if idempotency_key else None,
+            )
+        return job, True
+    except IntegrityError:
+        if not idempotency_key:
+            raise
+        job = GenerationJob.objects.get(user_id=user_id, idempotency_key=idempotency_key)
+        logger.info(f"🔁 同じ冪等性キーのジョブが実行中: job_id={job.id}, key={idempotency_key}")
+        return job, False
+
+
+def submit_generation_job(
+        instance: Menu,
+        validated_data: dict,
+        form_data: dict,
+        user_id: str,
+        frontend_id: str | None,
+        author_name: str = '',
+        idempotency_key: str | None = None,
+        reservation_id=None) -> GenerationJob:
+    """
+    生成ジョブを作成してバックグラウンドワーカーに投入
+    reservation_id指定時はジョブの結果でクレジットの仮押さえを精算する
+
+    Returns:
+        GenerationJob: 作成したジョブ（status=queued）、同じ冪等性キーのジョブがあればそのジョブ
+
+    Raises:
+        EngineBusy: エンジンの待ち行列（投入済みで未開始のジョブを含む）が満杯（ジョブは作成しない）
+    """
+    # ワーカーのキューは上限がないため、投入済みで未開始のジョブもリミッターで数えて429を返せるようにする
+    limiter = get_engine_limiter(instance.engine)
+    limiter.reserve_pending()
+    submitted = False
+    try:
+        job, created = create_generation_job(instance, form_data, user_id, frontend_id, idempotency_key)
+        if not created:
+            # 既存ジョブに合流する場合は今回の仮押さえは不要
+            if reservation_id is not None:
+                UnifiedCreditService.release_reservation(reservation_id)
+            return job
+        job_data = {**validated_data, 'image': _detach_uploaded_image(validated_data.get('image'))}
+
+        get_generation_executor(instance.engine).submit(
+            _run_generation_job,
+            job.id,
+            instance.id,
+            job_data,
+            form_data,
+            user_id,
+            frontend_id,
+            author_name,
+            reservation_id,
+            engine=instance.engine,
+        )
+        submitted = True
+    finally:
+        if not submitted:
+            limiter.release_pending()
+    logger.info(f"📨 生成ジョブ投入: job_id={job.id}, menu_id={instance.id}, user_id={user_id}")
+    return job
+
+
+def _run_generation_job(job_id, menu_id, validated_data, form_data, user_id, frontend_id, author_name,
+                        reservation_id=None, engine=None):
+    """ワーカースレッドで生成ジョブを実行"""
+    # 投入時に確保した待ち枠を戻す（以降はengine_slotの実行枠で制御）
+    if engine is not None:
+        get_engine_limiter(engine).release_pending()
+
+    if not _start_job(job_id, reservation_id):
+        return
+
+    def on_stage(stage):
+        GenerationJob.objects.filter(id=job_id).update(stage=stage, updated_at=timezone.now())
+
+    instance = None
+    timer = StageTimer()
+    with timer.activate():
+        try:
+            instance = Menu.objects.get(pk=menu_id)
+            # ジョブはgunicornのtimeoutに縛られないため専用の予算を使用
+            deadline = Deadline.for_request('GENERATION_JOB_DEADLINE_SECONDS', 300)
+            status_code, response_data = run_menu_execution(
+                instance,
+                validated_data,
+                form_data,
+                user_id,
+                frontend_id,
+                author_name,
+                on_stage=on_stage,
+                deadline=deadline,
+            )
+        except Exception as e:
+            logger.exception(f"❌ 生成ジョブ失敗: job_id={job_id}")
+            fail_job(job_id, e)
+            UnifiedCreditService.settle_reservation(reservation_id, getattr(e, 'status_code', 500))
+            if instance is not None:
+                record_generation_run(instance, user_id, 'async', getattr(e, 'status_code', 500))
+            return
+        record_generation_run(instance, user_id, 'async', status_code)
+
+    UnifiedCreditService.settle_reservation(reservation_id, status_code, f"メニュー実行: {instance.name}")
+    finish_job(job_id, status_code, response_data)
+    logger.info(f"✅ 生成ジョブ終了: job_id={job_id}, status_code={status_code}")
+
+
+def _start_job(job_id, reservation_id=None) -> bool:
+    """
+    ワーカーでの実行開始時にジョブを実行中にする
+    待ち時間の上限を超えたジョブ・取り残し扱いで失敗済みのジョブ・クレジットの仮押さえが期限切れのジョブは
+    生成せずに終了する（Falseを返す）
+    """
+    now = timezone.now()
+    max_queue_seconds = getattr(settings, 'GENERATION_JOB_MAX_QUEUE_SECONDS', 120)
+    queued_job = GenerationJob.objects.filter(id=job_id, status='queued').values('created_at').first()
+    if queued_job is None:
+        # expire_stale_jobで失敗扱いになった等
+        logger.warning(f"⚠️ 待機中でないジョブのため実行しません: job_id={job_id}")
+        UnifiedCreditService.settle_reservation(reservation_id, 504)
+        return False
+    if queued_job['created_at'] < now - timedelta(seconds=max_queue_seconds):
+        logger.warning(f"⏱️ 待ち時間の上限を超えたため実行しません: job_id={job_id}")
+        fail_job(job_id, DeadlineExceeded('生成ジョブの待ち時間の上限を超えました'))
+        UnifiedCreditService.settle_reservation(reservation_id, 504)
+        return False
+    # 生成結果で確定するまで仮押さえが期限切れにならないよう、ジョブの予算分延長する
+    if reservation_id is not None and not UnifiedCreditService.extend_reservation(
+            reservation_id,
+            getattr(settings, 'GENERATION_JOB_DEADLINE_SECONDS', 300)
+            + getattr(settings, 'CREDIT_RESERVATION_TTL_MARGIN_SECONDS', 300)):
+        fail_job(job_id, CreditReservationExpired())
+        return False
+
+    started = GenerationJob.objects.filter(id=job_id, status='queued').update(
+        status='running',
+        started_at=now,
+        updated_at=now,
+    )
+    if not started:
+        UnifiedCreditService.settle_reservation(reservation_id, 504)
+        return False
+    return True
+
+
+def fail_job(job_id, error: Exception):
+    """例外で中断したジョブを失敗にする（冪等性キーは解放して再実行可能にする）"""
+    GenerationJob.objects.filter(id=job_id).update(
+        status='failed',
+        error_message=str(error),
+        status_code=getattr(error, 'status_code', 500),  # UpstreamUnavailable(503) / DeadlineExceeded(504)等
+        idempotency_key=None,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+
+
+def finish_job(job_id, status_code: int, response_data: dict):
+    """
+    実行結果をジョブに保存
+    失敗時・結果がIDEMPOTENCY_RESULT_MAX_BYTESを超える場合は冪等性キーを解放する（再送時は再実行）
+    """
+    succeeded = 200 <= status_code < 300
+    result = dict(response_data) if succeeded else None
+    updates = {}
+    if not succeeded:
+        updates['idempotency_key'] = None
+    elif len(json.dumps(result, ensure_ascii=False).encode()) > getattr(settings, 'IDEMPOTENCY_RESULT_MAX_BYTES', 65536):
+        logger.warning(f"⚠️ 結果サイズが上限を超えたため冪等性キーを解放: job_id={job_id}")
+        updates['idempotency_key'] = None
+
+    GenerationJob.objects.filter(id=job_id).update(
+        status='succeeded' if succeeded else 'failed',
+        stage='done',
+        result=result,
+        error_message=None if succeeded else response_data.get('error'),
+        status_code=status_code,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+        **updates,
+    )
+
+
+def expire_stale_job(job: GenerationJob) -> GenerationJob:
+    """
+    一定時間更新のない未完了ジョブを失敗扱いにする
+    （ワーカープロセスの再起動等でジョブが取り残された場合の対策）
+    """
+    stale_seconds = getattr(settings, 'GENERATION_JOB_STALE_SECONDS', 600)
+    if job.is_finished or job.updated_at > timezone.now() - timedelta(seconds=stale_seconds):
+        return job
+
+    updated = GenerationJob.objects.filter(id=job.id, status=job.status, updated_at=job.updated_at).update(
+        status='failed',
+        error_message='ジョブがタイムアウトしました（ワーカー停止の可能性）',
+        status_code=504,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    if updated:
+        logger.warning(f"⏱️ 取り残されたジョブを失敗扱いに変更: job_id={job.id}")
+    job.refresh_from_db()
+    return job
+
+
+def wait_for_job(job: GenerationJob, wait_seconds: float, max_wait: float | None = None) -> GenerationJob:
+    """
+    ジョブが終了するまで最大wait_seconds秒待機（ロングポーリング・冪等性キーでの再送時の待ち合わせ用）
+    待機中は同期ワーカーを占有するため、max_wait（既定はGENERATION_JOB_LONG_POLL_MAX_SECONDS）と
+    MAX_WAIT_SECONDSの短い方で打ち切る（終わっていなければ呼び出し側で再ポーリングさせる）
+    """
+    if max_wait is None:
+        max_wait = getattr(settings, 'GENERATION_JOB_LONG_POLL_MAX_SECONDS', 5)
+    interval = getattr(settings, 'GENERATION_JOB_POLL_INTERVAL_SECONDS', 0.5)
+    deadline = time.monotonic() + min(max(wait_seconds, 0), max_wait, MAX_WAIT_SECONDS)
+
+    while not job.is_finished and time.monotonic() < deadline:
+        time.sleep(interval)
+        job.refresh_from_db()
+    return expire_stale_job(job)
@@ -0,0 +1,76 @@
+import logging
+from datetime import datetime
+
+from django.db import connection
+
+from api.models.generation_run import GenerationRun
+from api.models.menu import Menu
+from api.services.stage_timer import get_current_timer
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def record_generation_run(instance: Menu, user_id: str, mode: str, status_code: int) -> GenerationRun | None:
+    """
+    現在のタイマーの計測値をgeneration_runsに保存
+    計測ログの保存失敗で実行結果を失敗させないよう、エラーはログ出力のみ
+    """
+    timer = get_current_timer()
+    if timer is None:
+        return None
+    try:
+        return GenerationRun.objects.create(
+            menu_id=instance.id,
+            engine=instance.engine,
+            user_id=user_id or '',
+            mode=mode,
+            status_code=status_code,
+            total_ms=round(timer.total_ms, 1),
+            stages={name: round(duration, 1) for name, duration in timer.stages.items()},
+            bytes_in=timer.bytes.get('input', 0),
+            bytes_out=timer.bytes.get('rehost', 0),
+        )
+    except Exception as e:
+        logger.error(f"❌ 生成計測ログの保存エラー: {e}")
+        return None
+
+
+def get_stage_percentiles(since: datetime, engine: str | None = None) -> list[dict]:
+    """
+    エンジン・ステージ別の所要時間のパーセンタイル（p50/p95/p99）
+    stages(JSON)をjsonb_eachで展開してPostgreSQLのpercentile_contで集計する（totalは全体の所要時間）
+    """
+    engine_filter = "AND engine = %s" if engine else ""
+    params = [since] + ([engine] if engine else [])
+    sql = f"""
+        WITH samples AS (
+            SELECT engine, stage.key AS stage, stage.value::text::float AS duration_ms
+            FROM generation_runs, jsonb_each(stages::jsonb) AS stage
+            WHERE created_at >= %s {engine_filter}
+            UNION ALL
+            SELECT engine, 'total' AS stage, total_ms AS duration_ms
+            FROM generation_runs
+            WHERE created_at >= %s {engine_filter}
+        )
+        SELECT engine, stage, COUNT(*),
+               percentile_cont(ARRAY[{', '.join(str(p) for p in PERCENTILES)}])
+                   WITHIN GROUP (ORDER BY duration_ms)
+        FROM samples
+        GROUP BY engine, stage
+        ORDER BY engine, stage
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + params)
+        rows = cursor.fetchall()
+
+    return [
+        {
+            'engine': row_engine,
+            'stage': stage,
+            'count': count,
+            **{f"p{int(p * 100)}_ms": round(value, 1) for p, value in zip(PERCENTILES, values)},
+        }
+        for row_engine, stage, count, values in rows
+    ]
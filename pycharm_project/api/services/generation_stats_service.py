@@ -0,0 +1,166 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from api.models.generation_daily_stat import GenerationDailyStat
+from api.models.library import Library
+
+logger = logging.getLogger(__name__)
+
+COUNT_FIELDS = ('generation_count', 'library_save_count', 'public_count', 'goods_count')
+
+
+class RollupState(NamedTuple):
+    """Library 1行が日次集計のどの行に何を数えさせるか"""
+    date: date
+    category_id: int
+    menu_id: int
+    engine: str
+    saved: bool
+    public: bool
+    has_goods: bool
+
+    @property
+    def key(self) -> tuple:
+        """日次集計の行（日付, カテゴリID, メニューID, エンジン）"""
+        return self.date, self.category_id, self.menu_id, self.engine
+
+    def counts(self) -> tuple[int, int, int, int]:
+        return 1, int(self.saved), int(self.public), int(self.has_goods)
+
+
+def _local_date(value: datetime) -> date:
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return timezone.localdate(value)
+
+
+def _state_from_values(values: dict) -> RollupState:
+    return RollupState(
+        date=_local_date(values['timestamp']),
+        category_id=values['category_id'] or 0,
+        menu_id=values['menu_id'] or 0,
+        engine=values['engine'] or '',
+        saved=bool(values['is_saved_to_library']),
+        public=bool(values['is_public']),
+        has_goods=(values['goods_creation_count'] or 0) > 0,
+    )
+
+
+def rollup_state(library: Library) -> RollupState:
+    """Libraryの現在の値での集計状態"""
+    return _state_from_values({name: getattr(library, name) for name in Library.ROLLUP_FIELDS})
+
+
+def loaded_rollup_state(library: Library) -> RollupState | None:
+    """Libraryを読み込んだ時点（または前回保存時点）の集計状態（不明な場合はNone）"""
+    values = getattr(library, '_rollup_values', None)
+    return _state_from_values(values) if values else None
+
+
+def _upsert_deltas(deltas: dict[tuple, list[int]]):
+    """(日付, カテゴリID, メニューID, エンジン)ごとの差分を1回のINSERT ... ON CONFLICTで加算"""
+    rows = [(key, counts) for key, counts in deltas.items() if any(counts)]
+    if not rows:
+        return
+    values_sql = ', '.join(['(%s::date, %s::integer, %s::integer, %s::text, %s::integer, %s::integer, %s::integer, %s::integer)'] * len(rows))
+    params = [value for key, counts in rows for value in (*key, *counts)]
+    sql = f"""
+        INSERT INTO {GenerationDailyStat._meta.db_table}
+            (date, category_id, menu_id, engine, {', '.join(COUNT_FIELDS)}, updated_at)
+        SELECT d.date, d.category_id, d.menu_id, d.engine, {', '.join(f'd.{field}' for field in COUNT_FIELDS)}, now()
+        FROM (VALUES {values_sql}) AS d (date, category_id, menu_id, engine, {', '.join(COUNT_FIELDS)})
+        ON CONFLICT (date, category_id, menu_id, engine) DO UPDATE SET
+            {', '.join(f'{field} = {GenerationDailyStat._meta.db_table}.{field} + EXCLUDED.{field}' for field in COUNT_FIELDS)},
+            updated_at = EXCLUDED.updated_at
+    """
+    try:
+        # 集計の失敗で生成結果の保存を失敗させない（ずれはrollup_generation_statsで補正される）
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+    except Exception as e:
+        logger.error(f"❌ 日次集計の更新エラー: {e}")
+
+
+def apply_rollup_change(old_state: RollupState | None, new_state: RollupState | None):
+    """集計状態の変化（作成: old=None、削除: new=None）を日次集計に反映"""
+    apply_rollup_changes([(old_state, new_state)])
+
+
+def apply_rollup_changes(changes: list[tuple[RollupState | None, RollupState | None]]):
+    """複数行の集計状態の変化（queryset.update等、シグナルが送られない一括更新）をまとめて日次集計に反映"""
+    deltas = defaultdict(lambda: [0] * len(COUNT_FIELDS))
+    for old_state, new_state in changes:
+        if old_state == new_state:
+            continue
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state is None:
+                continue
+            for index, count in enumerate(state.counts()):
+                deltas[state.key][index] += sign * count
+    _upsert_deltas(deltas)
+
+
+def record_libraries_created(entries: list[Library]):
+    """bulk_create（シグナルが送られない）で作成したLibraryを日次集計に加算"""
+    deltas = defaultdict(lambda: [0] * len(COUNT_FIELDS))
+    for entry in entries:
+        state = rollup_state(entry)
+        for index, count in enumerate(state.counts()):
+            deltas[state.key][index] += count
+    _upsert_deltas(deltas)
+
+
+def rebuild_daily_stats(start: date, end: date) -> int:
+    """
+    指定期間（両端を含む）の日次集計をLibraryから再集計して置き換える
+
+    Returns:
+        int: 再集計後の集計行数
+    """
+    tz = timezone.get_current_timezone()
+    start_at = timezone.make_aware(datetime.combine(start, time.min), tz)
+    end_at = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+    table = GenerationDailyStat._meta.db_table
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE date BETWEEN %s AND %s", [start, end])
+            cursor.execute(f"""
+                INSERT INTO {table}
+                    (date, category_id, menu_id, engine, {', '.join(COUNT_FIELDS)}, updated_at)
+                SELECT (l.timestamp AT TIME ZONE %s)::date,
+                       COALESCE(l.category_id, 0),
+                       COALESCE(l.menu_id, 0),
+                       l.engine,
+                       COUNT(*),
+                       COUNT(*) FILTER (WHERE l.is_saved_to_library),
+                       COUNT(*) FILTER (WHERE l.is_public),
+                       COUNT(*) FILTER (WHERE l.goods_creation_count > 0),
+                       now()
+                FROM {Library._meta.db_table} AS l
+                WHERE l.timestamp >= %s AND l.timestamp < %s
+                GROUP BY 1, 2, 3, 4
+            """, [settings.TIME_ZONE, start_at, end_at])
+            return cursor.rowcount
+
+
+def get_generation_stats(start: date | None = None, end: date | None = None, group_by: str = 'category_id') -> list[dict]:
+    """
+    日次集計から期間内の件数を集計（期間未指定は全期間）
+
+    Returns:
+        list[dict]: group_byの値ごとの件数（generation_count / library_save_count / public_count / goods_count）
+    """
+    queryset = GenerationDailyStat.objects.order_by()
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    return list(queryset.values(group_by).annotate(**{field: Sum(field) for field in COUNT_FIELDS}))
@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from api.services.circuit_breaker import get_circuit_breaker
+from api.services.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class HostMetrics:
+    """ホストごとのリクエスト計測値"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def record(self, latency_ms: float, error: bool):
+        self.requests += 1
+        if error:
+            self.errors += 1
+        self.total_latency_ms += latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+
+    def as_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_latency_ms': round(self.total_latency_ms / self.requests, 1) if self.requests else 0,
+            'max_latency_ms': round(self.max_latency_ms, 1),
+        }
+
+
+class PooledHTTPClient:
+    """
+    プロセス共通の外部HTTPクライアント
+    - ホストごとのKeep-Alive接続プール（requests.Session + HTTPAdapter）
+    - デフォルトの接続/読み取りタイムアウト
+    - ホストごとの計測値（リクエスト数・レイテンシ・接続再利用）
+    Tsukuruma / SUZURI / Clipdrop / 画像ダウンロードの全てで共有する
+    """
+
+    def __init__(self):
+        self._session = None
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics: dict[str, HostMetrics] = {}
+
+    def _get_session(self) -> requests.Session:
+        """Sessionの遅延初期化（gunicornのfork後に接続プールを作成するため）"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=getattr(settings, 'HTTP_POOL_CONNECTIONS', 10),
+                        pool_maxsize=getattr(settings, 'HTTP_POOL_MAXSIZE', 10),
+                        pool_block=False,
+                    )
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+
+                    # ホスト個別のプールサイズ指定（例: {"suzuri.jp": 4}）
+                    for host, maxsize in getattr(settings, 'HTTP_POOL_MAXSIZE_PER_HOST', {}).items():
+                        host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(maxsize))
+                        session.mount(f'http://{host}', host_adapter)
+                        session.mount(f'https://{host}', host_adapter)
+
+                    self._session = session
+        return self._session
+
+    def default_timeout(self) -> tuple[float, float]:
+        """(接続タイムアウト, 読み取りタイムアウト)"""
+        return (
+            getattr(settings, 'HTTP_CONNECT_TIMEOUT', 5),
+            getattr(settings, 'HTTP_READ_TIMEOUT', 60),
+        )
+
+    def request(self, method: str, url: str, timeout=None, upstream: str | None = None, deadline=None,
+                **kwargs) -> requests.Response:
+        """
+        共有接続プールを使ってリクエストを送信
+        timeout未指定時はデフォルトのタイムアウトを使用する（無制限待ちを防ぐ）
+
+        Args:
+            upstream: サーキットブレーカー名（指定時はopen中なら即座にUpstreamUnavailable）
+            deadline: リクエストの時間予算（指定時はタイムアウトを残り時間で制限）
+        """
+        timeout = timeout or self.default_timeout()
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+
+        breaker = get_circuit_breaker(upstream) if upstream else None
+        if breaker:
+            breaker.before_call()
+
+        host = urlsplit(url).netloc
+        started = time.monotonic()
+        error = True
+        cancelled = False
+        try:
+            response = self._get_session().request(
+                method=method,
+                url=url,
+                timeout=timeout,
+                **kwargs
+            )
+            error = response.status_code >= 500
+            return response
+        except requests.exceptions.Timeout as e:
+            # 時間予算の残りで切り詰めたタイムアウトに達した場合は上流の障害とはみなさない
+            if deadline is not None and deadline.remaining() < deadline.MIN_CALL_SECONDS:
+                cancelled = True
+                raise DeadlineExceeded(f'{host} の応答待ちで処理時間の上限を超えました') from e
+            raise
+        finally:
+            latency_ms = (time.monotonic() - started) * 1000
+            with self._metrics_lock:
+                self._metrics.setdefault(host, HostMetrics()).record(latency_ms, error)
+            if breaker:
+                if cancelled:
+                    breaker.record_cancelled()
+                elif error:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def _pool_stats(self) -> dict[str, dict]:
+        """urllib3の接続プールから新規接続数・再利用数を取得"""
+        stats = {}
+        if self._session is None:
+            return stats
+        adapters = {id(adapter): adapter for adapter in self._session.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = f"{pool.host}:{pool.port}" if pool.port not in (80, 443, None) else pool.host
+                entry = stats.setdefault(host, {'new_connections': 0, 'pooled_requests': 0})
+                entry['new_connections'] += pool.num_connections
+                entry['pooled_requests'] += pool.num_requests
+        return stats
+
+    def get_metrics(self) -> dict[str, dict]:
+        """ホストごとの計測値（管理画面・ログ用）"""
+        with self._metrics_lock:
+            metrics = {host: m.as_dict() for host, m in self._metrics.items()}
+
+        for host, pool_stats in self._pool_stats().items():
+            entry = metrics.setdefault(host, HostMetrics().as_dict())
+            entry.update(pool_stats)
+            # 既存接続で処理されたリクエスト数（= プールヒット）
+            entry['reused_connections'] = max(pool_stats['pooled_requests'] - pool_stats['new_connections'], 0)
+            entry['reuse_ratio'] = round(
+                entry['reused_connections'] / pool_stats['pooled_requests'], 3
+            ) if pool_stats['pooled_requests'] else 0
+        return metrics
+
+
+# シングルトンインスタンス
+http_client = PooledHTTPClient()
@@ -0,0 +1,183 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# 元の画像をそのまま使ってよい形式
+_PASSTHROUGH_FORMATS = frozenset({'JPEG', 'PNG'})
+# 元の画像をそのまま使う場合に残ってよい情報（画素の解釈に関わるもののみ。EXIF・XMP・ICC・テキスト等は不可）
+_PASSTHROUGH_INFO_KEYS = frozenset({
+    'jfif', 'jfif_version', 'jfif_unit', 'jfif_density', 'dpi', 'adobe', 'adobe_transform',
+    'progressive', 'progression', 'transparency', 'gamma', 'srgb', 'aspect', 'interlace',
+})
+# JPEGのAPPセグメントのうち残ってよいもの（JFIF・Adobe。EXIF/XMPのAPP1・ICCのAPP2・IPTCのAPP13等は不可）
+_PASSTHROUGH_JPEG_MARKERS = frozenset({'APP0', 'APP14'})
+
+
+def _has_metadata(source: Image.Image) -> bool:
+    """EXIF・XMP・ICCプロファイル・テキスト等、許可したもの以外のメタデータを含むか"""
+    if source.getexif():
+        return True
+    if any(key not in _PASSTHROUGH_INFO_KEYS for key in source.info):
+        return True
+    return any(marker not in _PASSTHROUGH_JPEG_MARKERS for marker, _ in getattr(source, 'applist', []))
+
+
+@dataclass
+class NormalizeStats:
+    """エンジンごとの前処理の計測値（プロセス内の累計）"""
+    requests: int = 0
+    cache_hits: int = 0
+    failures: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    total_ms: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'failures': self.failures,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'bytes_saved': self.bytes_in - self.bytes_out,
+            'avg_ms': round(self.total_ms / self.requests, 1) if self.requests else 0.0,
+        }
+
+
+class ImageNormalizer:
+    """
+    edit呼び出し前の入力画像の前処理
+    - EXIFの向き情報に従って回転（auto-orient）
+    - 長辺をエンジンごとの上限（ENGINE_INPUT_MAX_EDGE）に縮小
+    - EXIF等のメタデータを除去して再エンコード（透過ありはPNG、それ以外はJPEG）
+    回転・縮小が不要でメタデータもなく、再エンコードしても小さくならないJPEG・PNGは元のバイト列のまま使う
+    結果は入力内容のハッシュでキャッシュし、同じ写真の再送時は再処理しない
+    """
+
+    def __init__(self):
+        self._cache: OrderedDict[str, tuple[bytes, str, str]] = OrderedDict()
+        self._cache_bytes = 0
+        self._stats: dict[str, NormalizeStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _max_edge(engine: str) -> int:
+        max_edges = getattr(settings, 'ENGINE_INPUT_MAX_EDGE', {})
+        return max_edges.get(engine, getattr(settings, 'ENGINE_INPUT_MAX_EDGE_DEFAULT', 2048))
+
+    def normalize(self, image, engine: str):
+        """
+        入力画像を前処理したファイルを返す（前処理に失敗した場合は元のファイルをそのまま返す）
+
+        Args:
+            image: UploadedFile等（name, content_type, read, seekを持つファイル）
+            engine: 画像生成エンジン名
+        """
+        if not getattr(settings, 'IMAGE_NORMALIZE_ENABLED', True):
+            return image
+
+        started = time.monotonic()
+        image.seek(0)
+        data = image.read()
+        image.seek(0)
+
+        max_edge = self._max_edge(engine)
+        quality = getattr(settings, 'IMAGE_NORMALIZE_JPEG_QUALITY', 88)
+        cache_key = f"{hashlib.sha256(data).hexdigest()}:{max_edge}:{quality}"
+
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+        cache_hit = cached is not None
+
+        if cached is None:
+            try:
+                cached = self._encode(data, image.name, max_edge, quality)
+            except Exception as e:
+                logger.warning(f"⚠️ 入力画像の前処理に失敗したため元の画像を使用: {e}")
+                self._record(engine, len(data), len(data), started, cache_hit=False, failed=True)
+                return image
+            self._store(cache_key, cached)
+
+        output, name, content_type = cached
+        elapsed_ms = self._record(engine, len(data), len(output), started, cache_hit=cache_hit)
+        logger.info(
+            f"🖼️ 入力画像前処理: {engine} {len(data)} → {len(output)} bytes "
+            f"({elapsed_ms:.1f}ms{', キャッシュ' if cache_hit else ''})"
+        )
+        return SimpleUploadedFile(name, output, content_type=content_type)
+
+    @staticmethod
+    def _encode(data: bytes, original_name: str, max_edge: int, quality: int) -> tuple[bytes, str, str]:
+        with Image.open(io.BytesIO(data)) as source:
+            # メタデータ（向き情報のEXIFを含む）がないJPEG・PNGのみ元の画像をそのまま使える
+            passthrough = source.format in _PASSTHROUGH_FORMATS and not _has_metadata(source)
+            original_content_type = source.get_format_mimetype()
+            img = ImageOps.exif_transpose(source)
+            size = img.size
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            resized = img.size != size
+
+            has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            buffer = io.BytesIO()
+            stem = os.path.splitext(os.path.basename(original_name or 'image'))[0] or 'image'
+            # exif/icc等は引き継がない（save時に明示しなければ書き込まれない）
+            if has_alpha:
+                img.convert('RGBA').save(buffer, format='PNG', optimize=True)
+                encoded = buffer.getvalue(), f"{stem}.png", 'image/png'
+            else:
+                img.convert('RGB').save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+                encoded = buffer.getvalue(), f"{stem}.jpg", 'image/jpeg'
+
+        # 回転・縮小・メタデータ除去が不要で小さくもならない場合は、再エンコードによる画質劣化・サイズ増を避けて元の画像を使う
+        if passthrough and not resized and len(encoded[0]) >= len(data):
+            return data, os.path.basename(original_name or 'image'), original_content_type
+        return encoded
+
+    def _store(self, cache_key: str, value: tuple[bytes, str, str]):
+        max_bytes = getattr(settings, 'IMAGE_NORMALIZE_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        size = len(value[0])
+        if size > max_bytes:
+            return
+        with self._lock:
+            if cache_key in self._cache:
+                return
+            self._cache[cache_key] = value
+            self._cache_bytes += size
+            while self._cache_bytes > max_bytes:
+                _, (evicted, _, _) = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def _record(self, engine: str, bytes_in: int, bytes_out: int, started: float,
+                cache_hit: bool, failed: bool = False) -> float:
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            stats = self._stats.setdefault(engine, NormalizeStats())
+            stats.requests += 1
+            stats.cache_hits += int(cache_hit)
+            stats.failures += int(failed)
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.total_ms += elapsed_ms
+        return elapsed_ms
+
+    def get_stats(self) -> dict[str, dict]:
+        """エンジンごとの前処理の計測値（管理画面用）"""
+        with self._lock:
+            return {engine: stats.as_dict() for engine, stats in self._stats.items()}
+
+
+# シングルトンインスタンス
+image_normalizer = ImageNormalizer()
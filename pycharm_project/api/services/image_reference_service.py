@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files import File
+
+from api.services.deadline import Deadline
+from api.services.http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+# 愛車写真の向き → CarSettingsのフィールド
+CAR_PHOTO_FIELDS = {
+    'front': 'car_photo_front_url',
+    'side': 'car_photo_side_url',
+    'rear': 'car_photo_rear_url',
+    'diagonal': 'car_photo_diagonal_url',
+}
+
+_CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+
+class ReferenceImageFile(File):
+    """参照画像のファイル（UploadedFileと同じくcontent_typeを持つ）"""
+
+    def __init__(self, file, name: str, content_type: str):
+        super().__init__(file, name=name)
+        self.content_type = content_type
+
+
+class ReferenceImageCache:
+    """
+    参照画像（GCS/S3上の愛車写真・生成画像）のローカルディスクキャッシュ
+    - キーはURLのハッシュ（写真を更新するとURLが変わるため、古いキャッシュは参照されなくなる）
+    - 合計サイズがIMAGE_REF_CACHE_MAX_BYTESを超えたら最終利用の古い順に削除
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def cache_dir(self) -> str:
+        cache_dir = getattr(settings, 'IMAGE_REF_CACHE_DIR', '') or os.path.join(tempfile.gettempdir(), 'aisha-image-refs')
+        os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir
+
+    def _path(self, url: str) -> str:
+        extension = os.path.splitext(urlsplit(url).path)[1].lower()
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + extension)
+
+    def get_path(self, url: str, deadline: Deadline | None = None) -> str:
+        """キャッシュ済みファイルのパスを返す（なければダウンロード）"""
+        path = self._path(url)
+        if os.path.exists(path):
+            os.utime(path)  # 最終利用時刻を更新（LRU用）
+            logger.info(f"📦 参照画像キャッシュヒット: {url}")
+            return path
+
+        logger.info(f"📥 参照画像ダウンロード: {url}")
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file, \
+                    http_client.get(url, timeout=30, upstream='reference-image-download', deadline=deadline,
+                                    stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    tmp_file.write(chunk)
+            # 同時ダウンロード時も完成したファイルだけが見えるよう置き換え
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._evict()
+        return path
+
+    def _evict(self):
+        max_bytes = getattr(settings, 'IMAGE_REF_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith('.part'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+
+reference_image_cache = ReferenceImageCache()
+
+
+@contextmanager
+def open_reference_image(url: str, deadline: Deadline | None = None):
+    """
+    参照画像をファイルとして開く（editの入力画像として使用）
+
+    使用例:
+        with open_reference_image(image_ref, deadline) as image:
+            result = edit(prompt_formatted, instance, image)
+    """
+    path = reference_image_cache.get_path(url, deadline)
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        # 取得直後に他スレッドの容量調整で削除された場合は取り直す
+        path = reference_image_cache.get_path(url, deadline)
+        f = open(path, 'rb')
+
+    name = os.path.basename(urlsplit(url).path) or os.path.basename(path)
+    content_type = _CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), 'image/jpeg')
+    with f:
+        yield ReferenceImageFile(f, name=name, content_type=content_type)
@@ -0,0 +1,55 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+def variant_widths() -> list[int]:
+    """作成する派生画像の幅（px、昇順）"""
+    if not getattr(settings, 'IMAGE_VARIANTS_ENABLED', True):
+        return []
+    return sorted(getattr(settings, 'IMAGE_VARIANT_WIDTHS', [256, 768]))
+
+
+def variant_blob_name(blob_name: str, width: int) -> str:
+    """元画像の隣に置く派生画像のオブジェクト名（例: generated-images/u/123.png → generated-images/u/123_w256.webp）"""
+    return f"{os.path.splitext(blob_name)[0]}_w{width}.webp"
+
+
+def build_webp_variants(source, widths: list[int]) -> dict[int, bytes]:
+    """
+    元画像から幅ごとのWebP派生画像を作成
+    - EXIFの向き情報に従って回転し、アスペクト比を保って縮小（元画像より大きい幅は作らない）
+    - JPEGはdraftで縮小読み込みしてデコードを軽くする
+
+    Args:
+        source: 元画像（パスまたはシーク可能なファイルライクオブジェクト）
+        widths: 作成する幅（px）
+
+    Returns:
+        dict[int, bytes]: 幅 → WebPのバイト列
+    """
+    quality = getattr(settings, 'IMAGE_VARIANT_WEBP_QUALITY', 80)
+    with Image.open(source) as image:
+        if widths and image.format == 'JPEG':
+            image.draft('RGB', (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+        variants = {}
+        # 大きい幅から順に縮小し、次の幅は直前の縮小結果から作る
+        current = image
+        for width in sorted(widths, reverse=True):
+            if width >= image.width:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            current = current.resize((width, height), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            current.save(buffer, format='WEBP', quality=quality, method=4)
+            variants[width] = buffer.getvalue()
+        return variants
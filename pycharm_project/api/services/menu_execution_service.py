@@ -0,0 +1,177 @@
+import logging
+
+from django.utils import timezone
+
+from api.models.menu import Menu
+from api.models.library import Library
+from api.serializers.menu_execution.response import MenuExecutionResponseSerializer
+from api.services.tsukuruma_api_execution import generate_or_edit
+from api.services.gcs_upload_service import gcs_upload_service
+from api.services.circuit_breaker import UpstreamUnavailable
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.rehost_service import is_write_behind, pending_rehost_fields, schedule_rehost, schedule_variants
+from api.services.stage_timer import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+def build_serializable_form_data(data) -> dict:
+    """フォームデータをシリアライズ可能な形式に変換（ファイルは名前のみ残す）"""
+    serializable_form_data = {}
+    for key, value in data.items():
+        if hasattr(value, 'read'):  # ファイルの場合
+            serializable_form_data[key] = f"<uploaded_file: {getattr(value, 'name', 'unknown')}>"
+        else:
+            serializable_form_data[key] = value
+    return serializable_form_data
+
+
+def run_menu_execution(
+        instance: Menu,
+        validated_data: dict,
+        form_data: dict,
+        user_id: str,
+        frontend_id: str | None,
+        author_name: str = '',
+        on_stage=None,
+        deadline: Deadline | None = None) -> tuple[int, dict]:
+    """
+    メニュー実行の本体（生成 → GCS再ホスト → Library保存）
+    同期実行（MenuExecutionView）と非同期ジョブの両方から呼ばれる
+
+    Args:
+        instance: 実行するMenu
+        validated_data: MenuExecutionRequestSerializerの検証済みデータ
+        form_data: Libraryに保存するフォームデータ（シリアライズ可能な形式）
+        user_id: ユーザーID
+        frontend_id: フロントエンドの画像ID
+        author_name: 作者名
+        on_stage: 進捗ステージ通知用コールバック（stage名を受け取る）
+        deadline: リクエストの時間予算（生成・GCS再ホストの各呼び出しに引き回す）
+
+    Returns:
+        tuple[int, dict]: (HTTPステータス, レスポンスデータ)
+    """
+    def notify(stage):
+        if on_stage:
+            on_stage(stage)
+
+    # ビジネスロジック
+    notify('generating')
+    result, prompt_formatted = generate_or_edit(instance, deadline=deadline, **validated_data)
+
+    # レスポンスパラメータ整形
+    if result.success:
+        response_data = {**result.data, "prompt_formatted": prompt_formatted}
+
+        original_image_url = response_data.get("image_presigned_url_1")
+
+        def save_pending_rehost():
+            # write-behind: 上流URLのままLibraryに保存して返却し、GCS再ホストはバックグラウンドで行う
+            notify('saving')
+            with record_stage('library_insert'):
+                library_entry = Library.objects.create(
+                    user_id=user_id,
+                    frontend_id=frontend_id,
+                    display_prompt=prompt_formatted,
+                    menu_name=instance.name,
+                    used_form_data=form_data,
+                    category_id=instance.category_id,
+                    menu_id=instance.id,
+                    engine=instance.engine,
+                    rating=None,
+                    is_public=False,
+                    author_name=author_name,
+                    is_saved_to_library=False,
+                    timestamp=timezone.now(),
+                    **pending_rehost_fields(original_image_url),
+                )
+            schedule_rehost(library_entry.id)
+            logger.info(f"✅ Libraryテーブル保存成功（GCS再ホスト待ち） - ID: {library_entry.id}")
+
+        if original_image_url and user_id and frontend_id and is_write_behind():
+            save_pending_rehost()
+        elif original_image_url and user_id and frontend_id:
+            stored_image = None
+            try:
+                logger.info(f"📚 === Libraryテーブルへの保存開始 ===")
+                logger.info(f"📤 original_image_url (S3): {original_image_url}")
+                logger.info(f"👤 user_id: {user_id}")
+                logger.info(f"🆔 frontend_id: {frontend_id}")
+
+                # まずGCSにアップロード
+                notify('uploading')
+                logger.info("☁️ GCS Upload Service呼び出し開始...")
+                with record_stage('rehost'):
+                    stored_image = gcs_upload_service.store_generated_image_from_url(
+                        original_image_url,
+                        user_id,
+                        frontend_id,
+                        deadline=deadline,
+                        with_variants=False,  # 派生画像は保存後にバックグラウンドで作成
+                    )
+                gcp_image_url = stored_image.url
+                logger.info(f"✅ GCSアップロード成功: {gcp_image_url}")
+
+                # Libraryテーブルに保存
+                notify('saving')
+                with record_stage('library_insert'):
+                    library_entry = Library.objects.create(
+                        user_id=user_id,
+                        frontend_id=frontend_id,
+                        image_url=gcp_image_url,  # GCSのURL
+                        image_size_bytes=stored_image.size,
+                        display_prompt=prompt_formatted,
+                        menu_name=instance.name,
+                        used_form_data=form_data,  # シリアライズ可能なデータ
+                        category_id=instance.category_id,
+                        menu_id=instance.id,
+                        engine=instance.engine,
+                        rating=None,
+                        is_public=False,
+                        author_name=author_name,
+                        is_saved_to_library=False,  # 生成時は自動的にfalse
+                        timestamp=timezone.now()  # タイムゾーン対応の現在時刻
+                    )
+                schedule_variants([library_entry.id])
+
+                # GCSのURLをレスポンスに設定
+                response_data["image_presigned_url_1"] = gcp_image_url
+                logger.info(f"✅ Libraryテーブル保存成功 - ID: {library_entry.id}")
+                logger.info(f"🔗 返却するGCS URL: {gcp_image_url}")
+
+            except DeadlineExceeded:
+                if stored_image is not None:
+                    raise
+                # GCS再ホスト中の時間切れ: 生成は成功しているため画像を捨てず（クレジットも消費する）、
+                # 上流URLのまま保存してGCS再ホストはバックグラウンドで行う
+                logger.warning("⏱️ GCS再ホスト中に時間切れのため、上流URLで保存して再ホストはバックグラウンドで行います")
+                save_pending_rehost()
+            except UpstreamUnavailable:
+                # サーキットオープンはS3 URLで成功扱いにせず、呼び出し側で503として返す
+                raise
+            except Exception as error:
+                logger.error(f"❌ === Library保存エラー ===")
+                logger.error(f"💥 エラータイプ: {type(error).__name__}")
+                logger.error(f"💥 エラーメッセージ: {str(error)}")
+                logger.error(f"💥 エラー詳細: {error}")
+
+                # エラーでも元のS3 URLを使用
+                logger.info("⚠️ エラーのため元のS3 URLを使用します")
+        else:
+            missing = []
+            if not original_image_url:
+                missing.append("image_url")
+            if not frontend_id:
+                missing.append("frontend_id")
+            if not user_id:
+                missing.append("user_id")
+            logger.warning(f"⚠️ 必要な情報が不足: {', '.join(missing)}")
+
+        response_data = MenuExecutionResponseSerializer(instance=response_data).data
+    else:
+        response_data = {"error": result.error}
+    notify('done')
+    logger.info(f"response data: {response_data}")
+
+    return result.status_code, response_data
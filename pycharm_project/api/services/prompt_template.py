@@ -0,0 +1,72 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from api.models.menu import Menu
+
+logger = logging.getLogger(__name__)
+
+
+class PromptTemplate:
+    """
+    コンパイル済みのメニュープロンプト
+    {{key}} 形式の変数をまとめた正規表現で、全変数を1回の走査で埋め込む
+    """
+
+    def __init__(self, prompt: str, keys: list[str]):
+        self.prompt = prompt
+        self.required_keys = frozenset(keys)
+        if keys:
+            # 長いkeyを優先（前方一致するkeyの誤置換を防ぐ）
+            alternatives = sorted(self.required_keys, key=len, reverse=True)
+            self._pattern = re.compile('|'.join(re.escape('{{' + key + '}}') for key in alternatives))
+        else:
+            self._pattern = None
+
+    def render(self, prompt_variables: list[dict[str, str]] | None) -> str:
+        """
+        リクエストされた変数を埋め込む（keyの存在チェックはSerializerで実施済）
+        値に含まれる {{...}} は再置換しない
+        """
+        if self._pattern is None:
+            return self.prompt
+        values = {}
+        for prompt_variable in prompt_variables or []:
+            # 同じkeyが複数ある場合は最初の値を使用
+            values.setdefault(prompt_variable['key'], prompt_variable['value'])
+        return self._pattern.sub(lambda match: values[match.group(0)[2:-2]], self.prompt)
+
+
+_cache: OrderedDict[tuple[int, int], PromptTemplate] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_prompt_template(menu: Menu) -> PromptTemplate:
+    """
+    メニューのコンパイル済みテンプレートを取得（プロセス内キャッシュ）
+    キーは (menu.id, menu.prompt_version)。Menu・PromptVariableが保存されるとバージョンが変わり再コンパイルされる
+    """
+    cache_key = (menu.id, menu.prompt_version)
+    with _cache_lock:
+        template = _cache.get(cache_key)
+        if template is not None:
+            _cache.move_to_end(cache_key)
+            return template
+
+    # キャッシュミス時のみPromptVariableを取得（prefetch済みならクエリは発生しない）
+    keys = [prompt_variable.key for prompt_variable in menu.prompt_variables.all()]
+    template = PromptTemplate(menu.prompt, keys)
+
+    max_size = getattr(settings, 'PROMPT_TEMPLATE_CACHE_SIZE', 256)
+    with _cache_lock:
+        # 同じメニューの古いバージョンは不要なので削除
+        for stale_key in [key for key in _cache if key[0] == menu.id and key[1] < menu.prompt_version]:
+            del _cache[stale_key]
+        _cache[cache_key] = template
+        while len(_cache) > max_size:
+            _cache.popitem(last=False)
+    logger.info(f"🧩 プロンプトテンプレートをコンパイル: menu_id={menu.id}, version={menu.prompt_version}")
+    return template
@@ -0,0 +1,117 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.models.library import Library
+from api.models.public_feed_entry import PublicFeedEntry
+from api.models.table_version import TableVersion
+from api.serializers.library import LibrarySerializer
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_FEED_VERSION_NAME = 'public_feed'
+
+
+def get_public_feed_version() -> int:
+    return TableVersion.get_version(PUBLIC_FEED_VERSION_NAME)
+
+
+def bump_public_feed_version():
+    """公開タイムラインのキャッシュを無効化（変更と同じトランザクションで呼ぶ）"""
+    TableVersion.bump(PUBLIC_FEED_VERSION_NAME)
+
+
+def _upsert_entry(library: Library):
+    PublicFeedEntry.objects.update_or_create(
+        library_id=library.id,
+        defaults={
+            'timestamp': library.timestamp,
+            'payload': LibrarySerializer(library).data,
+        },
+    )
+
+
+def sync_public_feed_entry(library: Library):
+    """Libraryの公開設定に合わせて公開タイムラインのエントリを作成・更新・削除"""
+    if library.is_public:
+        # カウンタはsave()で書き込まないため、DB上の最新値で表示内容を作る
+        library.refresh_from_db(fields=list(Library.COUNTER_FIELDS))
+        _upsert_entry(library)
+        bump_public_feed_version()
+        return
+    deleted, _ = PublicFeedEntry.objects.filter(library_id=library.id).delete()
+    if deleted:
+        bump_public_feed_version()
+
+
+def sync_public_feed_entries(library_ids):
+    """
+    複数のLibraryの公開設定に合わせて公開タイムラインをまとめて更新（queryset.update等、シグナルが送られない一括更新の後に呼ぶ）
+    公開中の行はエントリを作成・更新し、非公開の行はエントリを削除する
+    """
+    library_ids = list(library_ids)
+    if not library_ids:
+        return
+    public_libraries = list(Library.objects.filter(pk__in=library_ids, is_public=True))
+    for library in public_libraries:
+        _upsert_entry(library)
+    public_ids = {library.id for library in public_libraries}
+    removed, _ = PublicFeedEntry.objects.filter(library_id__in=library_ids).exclude(library_id__in=public_ids).delete()
+    if public_libraries or removed:
+        bump_public_feed_version()
+
+
+def refresh_public_feed_entries(**lookup):
+    """
+    公開タイムラインに載っているエントリの表示内容を更新（いいね・コメント・グッズ作成数の変更、画像URLの差し替え時等）
+    対象はLibraryの絞り込み条件で指定（例: pk=library_id / frontend_id=frontend_id）
+    """
+    libraries = list(Library.objects.filter(is_public=True, public_feed_entry__isnull=False, **lookup))
+    if not libraries:
+        return
+    for library in libraries:
+        _upsert_entry(library)
+    bump_public_feed_version()
+
+
+def rebuild_public_feed() -> int:
+    """公開タイムラインを公開中のLibraryから作り直す（初期構築・補正用）"""
+    public_ids = set(Library.objects.filter(is_public=True).values_list('id', flat=True))
+    removed, _ = PublicFeedEntry.objects.exclude(library_id__in=public_ids).delete()
+    count = 0
+    for library in Library.objects.filter(is_public=True).iterator(chunk_size=500):
+        _upsert_entry(library)
+        count += 1
+    bump_public_feed_version()
+    logger.info(f"✅ 公開タイムライン再構築: {count}件（削除 {removed}件）")
+    return count
+
+
+def get_public_feed_page(request, paginator) -> list | dict:
+    """
+    公開タイムラインを取得（バージョン付きキャッシュ経由）
+    cursor / page_size指定時はキーセットページネーションの結果、未指定時は最新PUBLIC_FEED_DEFAULT_LIMIT件のリスト
+    """
+    # バージョンを先に読む（変更のコミット前に読んだ場合も、古いバージョンのキーに新しい内容が入るだけで済む）
+    version = get_public_feed_version()
+    cache_key = ':'.join([
+        'public_feed',
+        str(version),
+        request.get_host(),
+        request.query_params.get(paginator.cursor_query_param, ''),
+        request.query_params.get(paginator.page_size_query_param, ''),
+    ])
+    data = cache.get(cache_key)
+    if data is not None:
+        return data
+
+    queryset = PublicFeedEntry.objects.all()
+    page = paginator.paginate_queryset(queryset, request)
+    if page is None:
+        limit = getattr(settings, 'PUBLIC_FEED_DEFAULT_LIMIT', 50)
+        data = [entry.payload for entry in queryset.order_by('-timestamp', '-pk')[:limit]]
+    else:
+        data = paginator.get_paginated_response([entry.payload for entry in page]).data
+    cache.set(cache_key, data, getattr(settings, 'PUBLIC_FEED_CACHE_TTL_SECONDS', 300))
+    return data
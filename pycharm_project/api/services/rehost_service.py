@@ -0,0 +1,170 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.models.library import Library
+from api.services.background import BackgroundExecutor
+from api.services.gcs_upload_service import gcs_upload_service
+from api.services.image_variants import variant_widths
+from api.services.public_feed_service import refresh_public_feed_entries
+
+logger = logging.getLogger(__name__)
+
+# GCS再ホスト用のプール（生成ジョブとは分ける）
+rehost_executor = BackgroundExecutor('gcs-rehost', 'GCS_REHOST_WORKERS', 2)
+# 派生画像（WebPサムネイル）作成用のプール（Pillowのエンコードをリクエストから切り離す）
+variant_executor = BackgroundExecutor('image-variants', 'IMAGE_VARIANT_WORKERS', 2)
+
+
+def is_write_behind() -> bool:
+    """
+    GCS再ホストをレスポンス返却後に行うか
+    - sync: GCSアップロード完了後にLibraryを保存して返す（従来通り）
+    - write_behind: 上流URLでLibraryを保存してすぐに返し、バックグラウンドでGCSのURLに差し替える
+    """
+    return getattr(settings, 'GCS_REHOST_MODE', 'sync') == 'write_behind'
+
+
+def gcs_url_prefixes() -> list[str]:
+    """GCSに再ホスト済みの画像URLの接頭辞"""
+    bucket_name = getattr(settings, 'GCS_BUCKET_NAME', '')
+    prefixes = [f"https://storage.googleapis.com/{bucket_name}/"]
+    custom_domain = getattr(settings, 'GCS_CUSTOM_DOMAIN', '')
+    if custom_domain:
+        prefixes.append(f"https://{custom_domain}/")
+    return prefixes
+
+
+def is_gcs_url(url: str) -> bool:
+    return any(url.startswith(prefix) for prefix in gcs_url_prefixes())
+
+
+def pending_rehost_fields(source_url: str) -> dict:
+    """write-behindモードでLibraryを作成する際のフィールド"""
+    return {
+        'image_url': source_url,
+        'image_source_url': source_url,
+        'rehost_status': 'pending',
+    }
+
+
+def schedule_rehost(library_id):
+    """コミット後にバックグラウンドで再ホストを開始"""
+    transaction.on_commit(lambda: rehost_executor.submit(rehost_library_image, library_id))
+    logger.info(f"📨 GCS再ホスト予約: library_id={library_id}")
+
+
+def schedule_variants(library_ids):
+    """
+    コミット後にバックグラウンドで派生画像を作成
+    失敗・プロセス終了で作成されなかった分は generate_image_variants でバックフィルされる
+    """
+    library_ids = [library_id for library_id in library_ids if library_id is not None]
+    if not library_ids or not variant_widths():
+        return
+
+    def submit():
+        for library_id in library_ids:
+            variant_executor.submit(create_library_variants, library_id)
+
+    transaction.on_commit(submit)
+    logger.info(f"📨 派生画像作成予約: {len(library_ids)}件")
+
+
+def create_library_variants(library_id) -> bool:
+    """
+    GCSに保存済みのLibraryの画像から派生画像を作成して記録
+
+    記録は「image_urlが作成元のまま & 派生画像が未作成」の条件付きUPDATEで行う
+    （その間に画像が差し替えられた行は上書きしない）
+
+    Returns:
+        bool: 記録したか
+    """
+    entry = Library.objects.filter(id=library_id, image_variants={}).values('image_url', 'is_public').first()
+    if entry is None or not is_gcs_url(entry['image_url']):
+        return False
+    variants = gcs_upload_service.create_variants_for_url(entry['image_url'])
+    if not variants:
+        return False
+    updated = Library.objects.filter(id=library_id, image_url=entry['image_url'], image_variants={}).update(
+        image_variants=variants,
+        updated_at=timezone.now(),
+    )
+    if updated and entry['is_public']:
+        refresh_public_feed_entries(pk=library_id)
+    return bool(updated)
+
+
+def rehost_library_image(library_id, retries: int | None = None) -> bool:
+    """
+    Libraryの画像を上流URLからGCSへ再ホストし、image_urlを差し替える
+
+    差し替えは「image_urlが上流URLのまま & pending」の条件付きUPDATEで行うため、
+    その間にユーザーが削除・更新した行を上書きしない（その場合はアップロードしたGCSオブジェクトを削除）
+
+    Returns:
+        bool: 差し替えに成功したか
+    """
+    entry = Library.objects.filter(id=library_id, rehost_status__in=['pending', 'failed']).first()
+    if entry is None:
+        return False
+    source_url = entry.image_source_url or entry.image_url
+
+    if retries is None:
+        retries = getattr(settings, 'GCS_REHOST_RETRIES', 3)
+    backoff = getattr(settings, 'GCS_REHOST_RETRY_BACKOFF_SECONDS', 2)
+
+    for attempt in range(retries):
+        try:
+            stored_image = gcs_upload_service.store_generated_image_from_url(
+                source_url, entry.user_id, entry.frontend_id
+            )
+            gcp_image_url = stored_image.url
+            break
+        except Exception as e:
+            logger.warning(f"⚠️ GCS再ホスト失敗（{attempt + 1}/{retries}回目）: library_id={library_id}, error={e}")
+            if attempt + 1 < retries:
+                time.sleep(backoff * (2 ** attempt))
+    else:
+        _record_failure(entry)
+        return False
+
+    swapped = Library.objects.filter(
+        id=library_id,
+        image_url=entry.image_url,
+        rehost_status__in=['pending', 'failed'],
+    ).update(
+        image_url=gcp_image_url,
+        image_variants=stored_image.variants,
+        image_size_bytes=stored_image.size,
+        image_source_url=None,
+        rehost_status='hosted',
+        rehost_attempts=F('rehost_attempts') + 1,
+        updated_at=timezone.now(),  # update()ではauto_nowが効かないため明示（共有ページの条件付きGETで使用）
+    )
+    if not swapped:
+        logger.warning(f"⚠️ 再ホスト中に行が変更・削除されたためGCS画像を破棄: library_id={library_id}")
+        gcs_upload_service.delete_generated_image(gcp_image_url)
+        return False
+
+    # 公開タイムラインに載っていれば画像URLを差し替え
+    refresh_public_feed_entries(pk=library_id)
+    logger.info(f"✅ GCS再ホスト完了: library_id={library_id}, url={gcp_image_url}")
+    return True
+
+
+def _record_failure(entry: Library):
+    """試行回数を加算し、上限に達したらfailedにする（reconcile_rehostで再試行される）"""
+    max_attempts = getattr(settings, 'GCS_REHOST_MAX_ATTEMPTS', 5)
+    Library.objects.filter(id=entry.id, rehost_status__in=['pending', 'failed']).update(
+        rehost_attempts=F('rehost_attempts') + 1,
+    )
+    Library.objects.filter(id=entry.id, rehost_status='pending', rehost_attempts__gte=max_attempts).update(
+        rehost_status='failed',
+    )
+    logger.error(f"❌ GCS再ホスト失敗: library_id={entry.id}")
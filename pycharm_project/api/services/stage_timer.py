@@ -0,0 +1,79 @@
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_current_timer: contextvars.ContextVar['StageTimer | None'] = contextvars.ContextVar('stage_timer', default=None)
+
+
+class StageTimer:
+    """
+    生成パイプラインのステージ別所要時間の計測
+    Viewやジョブで作成して activate() し、下位のサービスは record_stage() で計測する
+    （引数で引き回さずに済むようcontextvarsで現在のタイマーを保持）
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages: dict[str, float] = {}
+        self.bytes: dict[str, int] = {}
+
+    @contextmanager
+    def activate(self):
+        token = _current_timer.set(self)
+        try:
+            yield self
+        finally:
+            _current_timer.reset(token)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            # 同じステージが複数回ある場合は合算
+            self.stages[name] = self.stages.get(name, 0.0) + (time.monotonic() - started) * 1000
+
+    def add_bytes(self, name: str, size: int):
+        self.bytes[name] = self.bytes.get(name, 0) + size
+
+    @property
+    def total_ms(self) -> float:
+        return (time.monotonic() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Server-Timingヘッダーの値（例: validate;dur=3.2, generate;dur=8123.4, total;dur=9001.0）"""
+        entries = [f"{name};dur={duration:.1f}" for name, duration in self.stages.items()]
+        entries.append(f"total;dur={self.total_ms:.1f}")
+        return ', '.join(entries)
+
+
+def get_current_timer() -> StageTimer | None:
+    return _current_timer.get()
+
+
+@contextmanager
+def record_stage(name: str):
+    """
+    現在のタイマーにステージの所要時間を記録（タイマーがなければ何もしない）
+
+    使用例:
+        with record_stage('generate'):
+            response = http_client.post(...)
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def record_bytes(name: str, size: int):
+    """現在のタイマーに転送バイト数を記録（タイマーがなければ何もしない）"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add_bytes(name, size)
@@ -5,6 +5,10 @@ from typing import Dict, List, Optional, Any
 from django.conf import settings
 import logging
 
+from api.services.circuit_breaker import UpstreamUnavailable
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.http_client import http_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,7 +17,9 @@ class SuzuriAPIService:
     SUZURI API との連携を行うサービスクラス
     """
     
-    def __init__(self):
+    def __init__(self, deadline: Optional[Deadline] = None):
+        # リクエストの時間予算（指定時は各API呼び出しを残り時間で制限）
+        self.deadline = deadline
         self.api_token = os.getenv('SUZURI_API_TOKEN')
         self.base_url = os.getenv('SUZURI_API_BASE_URL', 'https://suzuri.jp/api/v1')
         
@@ -51,13 +57,15 @@ class SuzuriAPIService:
             elif data:
                 logger.info(f"Data size: {len(str(data))} characters (省略)")
             
-            response = requests.request(
+            response = http_client.request(
                 method=method,
                 url=url,
                 headers=headers,
                 json=data if not files else None,
                 files=files,
-                timeout=30
+                timeout=30,
+                upstream='suzuri',
+                deadline=self.deadline
             )
             
             logger.info(f"SUZURI API {method} {url} - Status: {response.status_code}")
@@ -119,7 +127,7 @@ class SuzuriAPIService:
         """
         try:
             # 画像をダウンロード
-            response = requests.get(image_url, timeout=30)
+            response = http_client.get(image_url, timeout=30, deadline=self.deadline)
             response.raise_for_status()
             
             # ファイル形式を判定
@@ -175,7 +183,7 @@ class SuzuriAPIService:
         """
         try:
             # 画像をダウンロード
-            response = requests.get(image_url, timeout=30)
+            response = http_client.get(image_url, timeout=30, deadline=self.deadline)
             response.raise_for_status()
             
             # ファイル形式を判定
@@ -486,7 +494,7 @@ class SuzuriAPIService:
             # 2. Zennのベストプラクティスに従って、画像アップロードと商品作成を同時実行
             try:
                 # 画像をダウンロード
-                response = requests.get(image_url, timeout=30)
+                response = http_client.get(image_url, timeout=30, deadline=self.deadline)
                 response.raise_for_status()
                 
                 # ファイル形式を判定
@@ -650,10 +658,15 @@ class SuzuriAPIService:
             except requests.exceptions.RequestException as e:
                 logger.error(f"Failed to download image from {image_url}: {str(e)}")
                 return {'success': False, 'error': f'画像のダウンロードに失敗しました: {str(e)}'}
+            except (UpstreamUnavailable, DeadlineExceeded):
+                # 503/504としてViewで返却するためそのまま送出
+                raise
             except Exception as e:
                 logger.error(f"Material+Product creation failed: {str(e)}")
                 return {'success': False, 'error': f'画像処理中にエラーが発生しました: {str(e)}'}
             
+        except (UpstreamUnavailable, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"SUZURI merchandise creation failed: {str(e)}")
             
@@ -0,0 +1,97 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from api.models.library import Library
+from api.services.background import BackgroundExecutor
+from api.services.gcs_upload_service import gcs_upload_service
+from api.services.generation_stats_service import apply_rollup_changes, loaded_rollup_state, rollup_state
+from api.services.public_feed_service import sync_public_feed_entries
+from api.services.rehost_service import is_gcs_url
+
+logger = logging.getLogger(__name__)
+
+# 一括更新で変更できる列
+BULK_UPDATE_FIELDS = ('is_saved_to_library', 'is_public', 'rating')
+
+# GCS画像削除用のプール（リクエストスレッドでは削除を待たない）
+image_delete_executor = BackgroundExecutor('gcs-delete', 'GCS_DELETE_WORKERS', 1)
+
+
+def schedule_image_deletion(image_urls):
+    """コミット後にバックグラウンドでGCSの画像（と派生画像）をまとめて削除（GCS以外のURLは対象外）"""
+    image_urls = [url for url in image_urls if url and is_gcs_url(url)]
+    if not image_urls:
+        return
+    transaction.on_commit(lambda: image_delete_executor.submit(gcs_upload_service.delete_images, image_urls))
+    logger.info(f"📨 GCS画像削除予約: {len(image_urls)}件")
+
+
+def bulk_update_timeline(user_id: str, frontend_ids: list[str], changes: dict) -> list[str]:
+    """
+    ユーザーのタイムラインエントリにまとめて同じ値を設定（1回のUPDATE）
+    queryset.update()はシグナルを送らないため、日次集計と公開タイムラインはここで反映する
+
+    Args:
+        user_id: 所有ユーザーID（他ユーザーのエントリは対象外）
+        frontend_ids: 対象のフロントエンドID
+        changes: 設定する値（BULK_UPDATE_FIELDSの列のみ）
+
+    Returns:
+        list[str]: 更新したフロントエンドID
+    """
+    unknown = set(changes) - set(BULK_UPDATE_FIELDS)
+    if unknown:
+        raise ValueError(f"一括更新できない項目です: {sorted(unknown)}")
+
+    with transaction.atomic():
+        # 集計の差分がずれないよう、同じ行の個別更新とは直列化する
+        entries = list(
+            Library.objects.select_for_update()
+            .filter(user_id=user_id, frontend_id__in=frontend_ids)
+            .only('id', 'frontend_id', *Library.ROLLUP_FIELDS)
+        )
+        if not entries:
+            return []
+
+        Library.objects.filter(pk__in=[entry.pk for entry in entries]).update(**changes, updated_at=timezone.now())
+
+        rollup_changes = []
+        for entry in entries:
+            old_state = loaded_rollup_state(entry)
+            for name, value in changes.items():
+                setattr(entry, name, value)
+            rollup_changes.append((old_state, rollup_state(entry)))
+        apply_rollup_changes(rollup_changes)
+        sync_public_feed_entries(entry.pk for entry in entries)
+
+    logger.info(f"✅ タイムライン一括更新: user_id={user_id}, {len(entries)}件, {sorted(changes)}")
+    return [entry.frontend_id for entry in entries]
+
+
+def bulk_delete_timeline(user_id: str, frontend_ids: list[str]) -> list[str]:
+    """
+    ユーザーのタイムラインエントリを1つのトランザクションでまとめて削除
+    GCSの画像はコミット後にバッチリクエストでまとめて削除する
+
+    Args:
+        user_id: 所有ユーザーID（他ユーザーのエントリは対象外）
+        frontend_ids: 対象のフロントエンドID
+
+    Returns:
+        list[str]: 削除したフロントエンドID
+    """
+    with transaction.atomic():
+        rows = list(
+            Library.objects.filter(user_id=user_id, frontend_id__in=frontend_ids)
+            .values_list('pk', 'frontend_id', 'image_url')
+        )
+        if not rows:
+            return []
+        # 日次集計・公開タイムラインの反映は削除シグナルで行う
+        Library.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+        schedule_image_deletion(image_url for _, _, image_url in rows)
+
+    logger.info(f"✅ タイムライン一括削除: user_id={user_id}, {len(rows)}件")
+    return [frontend_id for _, frontend_id, _ in rows]
@@ -0,0 +1,103 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models.comment import Comment, Like
+from api.models.library import Library
+from api.models.public_feed_entry import PublicFeedEntry
+from api.services.rehost_service import is_gcs_url
+
+logger = logging.getLogger(__name__)
+
+# 削除対象の条件はLibraryの部分インデックス（api_library_retention_idx）の条件と揃える
+_PURGE_SQL = f"""
+    WITH expired AS (
+        SELECT id FROM {Library._meta.db_table}
+        WHERE is_saved_to_library = false AND is_public = false AND goods_creation_count = 0
+          AND timestamp < %s
+        ORDER BY timestamp
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM {Library._meta.db_table} AS library USING expired
+    WHERE library.id = expired.id
+    RETURNING library.id, library.image_url, library.image_size_bytes
+"""
+
+
+@dataclass
+class PurgeResult:
+    """保持期間切れの削除結果"""
+    rows: int = 0
+    image_bytes: int = 0  # 回収した元画像の容量（サイズが記録されている行の合計）
+    unknown_size_rows: int = 0  # 元画像のサイズが記録されていない行（image_size_bytes追加前の行等）
+    image_urls: list[str] = field(default_factory=list)  # 削除するGCSの画像
+
+    def add(self, other: 'PurgeResult'):
+        self.rows += other.rows
+        self.image_bytes += other.image_bytes
+        self.unknown_size_rows += other.unknown_size_rows
+
+
+def retention_days() -> int:
+    """未保存エントリの保持日数（0: 削除しない）"""
+    return getattr(settings, 'TIMELINE_UNSAVED_RETENTION_DAYS', 0)
+
+
+def retention_cutoff(days: int) -> datetime:
+    """この日時より前に生成された未保存エントリが削除対象"""
+    return timezone.now() - timedelta(days=days)
+
+
+def expired_entries(cutoff: datetime):
+    """保持期間切れの削除対象（ライブラリ未保存・非公開・グッズ未作成で、生成日時がcutoffより前）"""
+    return Library.objects.filter(
+        is_saved_to_library=False,
+        is_public=False,
+        goods_creation_count=0,
+        timestamp__lt=cutoff,
+    )
+
+
+def purge_expired_chunk(cutoff: datetime, chunk_size: int) -> PurgeResult:
+    """
+    保持期間切れの未保存エントリを古い順に最大chunk_size件削除（1トランザクション）
+    - 部分インデックスを古い順に辿り、他のトランザクションがロック中の行は飛ばす
+    - 日次集計は生成時点の履歴として残すため、削除シグナルを送らないSQLで削除する
+    - GCSの画像は削除しない（コミット後に呼び出し側でimage_urlsをまとめて削除する）
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(_PURGE_SQL, [cutoff, chunk_size])
+            deleted = cursor.fetchall()
+        if not deleted:
+            return PurgeResult()
+        # ORMのCASCADEが働かないため、参照元の行もここで削除（外部キー制約はコミット時に検査される）
+        library_ids = [library_id for library_id, _, _ in deleted]
+        Comment.objects.filter(library_id__in=library_ids).delete()
+        Like.objects.filter(library_id__in=library_ids).delete()
+        PublicFeedEntry.objects.filter(library_id__in=library_ids).delete()
+
+    result = PurgeResult(rows=len(deleted))
+    for _, image_url, image_size_bytes in deleted:
+        if image_size_bytes is None:
+            result.unknown_size_rows += 1
+        else:
+            result.image_bytes += image_size_bytes
+        if image_url and is_gcs_url(image_url):
+            result.image_urls.append(image_url)
+    return result
+
+
+def library_table_bytes() -> int:
+    """api_library（パーティションテーブルの場合は全パーティション）のインデックス・TOASTを含むディスク使用量"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0) FROM pg_partition_tree(%s::regclass)",
+            [Library._meta.db_table],
+        )
+        return cursor.fetchone()[0]
@@ -2,7 +2,14 @@ import logging
 import requests
 
 from api.models.menu import Menu
+from api.services.admission import engine_slot
 from api.services.api_result import APIResult
+from api.services.deadline import Deadline
+from api.services.http_client import http_client
+from api.services.image_normalizer import image_normalizer
+from api.services.image_reference_service import open_reference_image
+from api.services.prompt_template import get_prompt_template
+from api.services.stage_timer import record_bytes, record_stage
 from django_project.settings import TSUKURUMA_API_HOST, TSUKURUMA_API_PORT, APP_NAME, EXE_ENV
 
 logger = logging.getLogger(__name__)
@@ -15,34 +22,51 @@ def generate_or_edit(
         additional_prompt_for_my_car,
         additional_prompt_for_others,
         aspect_ratio,
-        prompt_variables: list[dict[str, str]] | None) \
+        prompt_variables: list[dict[str, str]] | None,
+        deadline: Deadline | None = None,
+        num_images: int = 1,
+        image_ref: str | None = None) \
         -> tuple[APIResult, str]:
-    # プロンプトに変数を埋め込み
-    prompt_formatted = instance.prompt
-    for prompt_variable_menu in instance.prompt_variables.all():
-        # 対応する変数のkeyが見つかればリクエストされたvalueを埋め込む（Serializerで存在チェック済）
-        value = None
-        for prompt_variable_requested in prompt_variables or []:
-            if prompt_variable_menu.key == prompt_variable_requested['key']:
-                value = prompt_variable_requested['value']
-                break
-        prompt_formatted = prompt_formatted.replace('{{' + prompt_variable_menu.key + '}}', value)
+    # プロンプトに変数を埋め込み（コンパイル済みテンプレートで一括置換。keyの存在はSerializerでチェック済）
+    prompt_formatted = get_prompt_template(instance).render(prompt_variables)
     # プロンプトに追加
     if additional_prompt_for_my_car:
         prompt_formatted += f"\n【愛車情報】\n{additional_prompt_for_my_car}"
     if additional_prompt_for_others:
         prompt_formatted += f"\n【追加情報】\n{additional_prompt_for_others}"
 
-    # API実行
-    if image:
-        result = edit(prompt_formatted, instance, image)
+    # 参照指定（保存済みの愛車写真・生成画像）の場合はローカルキャッシュから入力画像を開く
+    if image_ref and not image:
+        with open_reference_image(image_ref, deadline) as reference_image:
+            result = _execute(prompt_formatted, instance, reference_image, aspect_ratio, deadline, num_images)
     else:
-        result = generate(prompt_formatted, instance, aspect_ratio)
+        result = _execute(prompt_formatted, instance, image, aspect_ratio, deadline, num_images)
 
     return result, prompt_formatted
 
 
-def generate(prompt_formatted: str, instance: Menu, aspect_ratio) -> APIResult:
+def _execute(prompt_formatted: str, instance: Menu, image, aspect_ratio, deadline: Deadline | None,
+             num_images: int) -> APIResult:
+    # 入力画像の前処理（向き補正・縮小・メタデータ除去）。CPU処理のためエンジンの実行枠の確保前に行う
+    if image:
+        with record_stage('normalize'):
+            image = image_normalizer.normalize(image, instance.engine)
+        record_bytes('input', image.size)
+
+    # API実行（エンジンごとの同時実行数制限。満杯ならEngineBusy(429)）
+    with engine_slot(instance.engine, deadline), record_stage('generate'):
+        if image:
+            return edit(prompt_formatted, instance, image, deadline=deadline, num_images=num_images)
+        return generate(prompt_formatted, instance, aspect_ratio, deadline=deadline, num_images=num_images)
+
+
+def upstream_name(instance: Menu) -> str:
+    """サーキットブレーカー名（エンジンごとに分ける）"""
+    return f"tsukuruma:{instance.engine}"
+
+
+def generate(prompt_formatted: str, instance: Menu, aspect_ratio, deadline: Deadline | None = None,
+             num_images: int = 1) -> APIResult:
     url = f"{url_base}generate/"
     headers = {
         "Content-Type": "application/json"
@@ -50,7 +74,7 @@ def generate(prompt_formatted: str, instance: Menu, aspect_ratio) -> APIResult:
     params = {
         'generator_name': instance.engine,
         'prompt': prompt_formatted,
-        'num_images': 1,
+        'num_images': num_images,
         'created_by': APP_NAME,
         'exe_env': EXE_ENV,
     }
@@ -60,7 +84,9 @@ def generate(prompt_formatted: str, instance: Menu, aspect_ratio) -> APIResult:
         params["aspect_ratio"] = aspect_ratio
 
     try:
-        response = requests.post(url, headers=headers, json=params)
+        response = http_client.post(
+            url, headers=headers, json=params, upstream=upstream_name(instance), deadline=deadline
+        )
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         error_msg = f"Tsukuruma API execution error: {str(e)}"
@@ -70,22 +96,25 @@ def generate(prompt_formatted: str, instance: Menu, aspect_ratio) -> APIResult:
     return APIResult(data=response.json(), status_code=response.status_code)
 
 
-def edit(prompt_formatted: str, instance: Menu, image):
+def edit(prompt_formatted: str, instance: Menu, image, deadline: Deadline | None = None, num_images: int = 1):
     url = f"{url_base}edit/"
     params = {
         'editor_name': instance.engine,
         'prompt': prompt_formatted,
-        'num_images': 1,
+        'num_images': num_images,
         'created_by': APP_NAME,
         'exe_env': EXE_ENV,
     }
 
+    image.seek(0)
     files = {
         "image": (image.name, image.read(), image.content_type)
     }
 
     try:
-        response = requests.post(url, data=params, files=files)
+        response = http_client.post(
+            url, data=params, files=files, upstream=upstream_name(instance), deadline=deadline
+        )
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         error_msg = f"Tsukuruma API execution error: {str(e)}"
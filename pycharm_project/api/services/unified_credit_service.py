@@ -1,12 +1,26 @@
 import logging
+from datetime import timedelta
 from typing import Optional, Tuple
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
 from ..models.credit_charge import UserCredit, CreditTransaction
+from ..models.credit_reservation import CreditReservation
 from ..models.phone_user import PhoneUser
 
 logger = logging.getLogger(__name__)
 
 
+class CreditReservationExpired(APIException):
+    """クレジットの仮押さえが生成の開始前に期限切れになった場合のエラー（402。生成は行わない）"""
+    status_code = status.HTTP_402_PAYMENT_REQUIRED
+    default_detail = 'クレジットの仮押さえが期限切れになりました。再度お試しください。'
+    default_code = 'credit_reservation_expired'
+
+
 class UnifiedCreditService:
     """統一クレジットサービス - 電話番号ユーザーとマイガレージユーザー共通"""
 
@@ -81,6 +95,182 @@ class UnifiedCreditService:
             logger.error(f"Credit consumption failed: User {user_id}, Error: {str(e)}")
             return False, f"クレジット消費エラー: {str(e)}"
 
+    @staticmethod
+    def reserve_credits(user_id: str, amount: int, menu_id: Optional[int] = None) -> Tuple[Optional[CreditReservation], str]:
+        """
+        クレジットを仮押さえする（残高から差し引き、commit_reservation / release_reservationまで保留）
+        
+        Args:
+            user_id: ユーザーID
+            amount: 仮押さえするクレジット数
+            menu_id: 実行するメニューID
+            
+        Returns:
+            Tuple[Optional[CreditReservation], str]: (仮押さえ / 残高不足等ならNone, メッセージ)
+        """
+        # このユーザーの期限切れの仮押さえを先に残高へ戻す
+        UnifiedCreditService.reclaim_expired_reservations(user_id=user_id)
+
+        ttl = UnifiedCreditService.reservation_ttl_seconds()
+        try:
+            with transaction.atomic():
+                # 残高が足りる場合のみ差し引く（同時実行でも残高がマイナスにならないよう条件付きUPDATE）
+                updated = UserCredit.objects.filter(
+                    user_id=user_id,
+                    credit_balance__gte=amount,
+                ).update(credit_balance=F('credit_balance') - amount, updated_at=timezone.now())
+                if not updated:
+                    balance = UnifiedCreditService.get_user_credits(user_id)
+                    return None, f"クレジット不足: 残高 {balance}, 必要 {amount}"
+
+                reservation = CreditReservation.objects.create(
+                    user_id=user_id,
+                    amount=amount,
+                    menu_id=menu_id,
+                    expires_at=timezone.now() + timedelta(seconds=ttl),
+                )
+
+            logger.info(f"Credits reserved: User {user_id}, Amount: {amount}, Reservation: {reservation.id}")
+            return reservation, f"クレジットを仮押さえしました: {amount}"
+
+        except Exception as e:
+            logger.error(f"Credit reservation failed: User {user_id}, Error: {str(e)}")
+            return None, f"クレジット仮押さえエラー: {str(e)}"
+
+    @staticmethod
+    def reservation_ttl_seconds() -> float:
+        """
+        仮押さえの有効期限（秒）
+        非同期ジョブは投入時に仮押さえし完了後に確定するため、ワーカーでの最大待ち時間とジョブの予算の合計に余裕を加えた長さにする
+        """
+        job_seconds = (
+            getattr(settings, 'GENERATION_JOB_MAX_QUEUE_SECONDS', 120)
+            + getattr(settings, 'GENERATION_JOB_DEADLINE_SECONDS', 300)
+            + getattr(settings, 'CREDIT_RESERVATION_TTL_MARGIN_SECONDS', 300)
+        )
+        return max(getattr(settings, 'CREDIT_RESERVATION_TTL_SECONDS', 900), job_seconds)
+
+    @staticmethod
+    def extend_reservation(reservation_id, seconds: float) -> bool:
+        """
+        有効な仮押さえの期限を今からseconds秒後まで延長（ジョブの実行開始時に使用）
+        
+        Returns:
+            bool: 延長したか（確定・解放済み、または期限切れの場合はFalse。期限切れの仮押さえは残高に戻す）
+        """
+        now = timezone.now()
+        updated = CreditReservation.objects.filter(id=reservation_id, status='held', expires_at__gt=now).update(
+            expires_at=now + timedelta(seconds=seconds), updated_at=now
+        )
+        if updated:
+            return True
+        # 期限切れでまだ回収されていなければここで残高に戻す
+        UnifiedCreditService.release_reservation(reservation_id, status='expired')
+        logger.warning(f"Credit reservation expired before job start: {reservation_id}")
+        return False
+
+    @staticmethod
+    def commit_reservation(reservation_id, description: str = "") -> bool:
+        """
+        仮押さえを確定して使用履歴を記録（残高は仮押さえ時に差し引き済み）
+        期限切れの仮押さえは確定しない（回収処理と競合して残高に戻した後に使用履歴を記録しないよう、
+        期限切れでまだ回収されていなければここで残高に戻す）
+        
+        Returns:
+            bool: 確定したか（既に確定・解放・期限切れの場合はFalse）
+        """
+        with transaction.atomic():
+            # held → committedの遷移は1回だけ、かつ有効期限内のみ（二重確定・解放後や期限切れ後の確定を防ぐ）
+            now = timezone.now()
+            updated = CreditReservation.objects.filter(id=reservation_id, status='held', expires_at__gt=now).update(
+                status='committed', settled_at=now, updated_at=now
+            )
+            if not updated:
+                if UnifiedCreditService.release_reservation(reservation_id, status='expired'):
+                    logger.warning(f"Credit reservation expired before commit, released: {reservation_id}")
+                else:
+                    logger.warning(f"Credit reservation not held, skip commit: {reservation_id}")
+                return False
+
+            reservation = CreditReservation.objects.get(id=reservation_id)
+            balance = UnifiedCreditService.get_user_credits(reservation.user_id)
+            CreditTransaction.objects.create(
+                user_id=reservation.user_id,
+                transaction_type='usage',
+                amount=-reservation.amount,  # 消費は負の値
+                balance_after=balance,
+                description=description or f"クレジット消費: {reservation.amount}"
+            )
+
+        logger.info(f"Credit reservation committed: User {reservation.user_id}, Amount: {reservation.amount}, Reservation: {reservation_id}")
+        return True
+
+    @staticmethod
+    def release_reservation(reservation_id, status: str = 'released') -> bool:
+        """
+        仮押さえを解放して残高に戻す
+        
+        Args:
+            reservation_id: 仮押さえID
+            status: 解放後の状態（released / 期限切れの回収時はexpired）
+            
+        Returns:
+            bool: 解放したか（既に確定・解放済みの場合はFalse）
+        """
+        with transaction.atomic():
+            updated = CreditReservation.objects.filter(id=reservation_id, status='held').update(
+                status=status, settled_at=timezone.now(), updated_at=timezone.now()
+            )
+            if not updated:
+                return False
+
+            reservation = CreditReservation.objects.get(id=reservation_id)
+            UserCredit.objects.filter(user_id=reservation.user_id).update(
+                credit_balance=F('credit_balance') + reservation.amount, updated_at=timezone.now()
+            )
+
+        logger.info(f"Credit reservation {status}: User {reservation.user_id}, Amount: {reservation.amount}, Reservation: {reservation_id}")
+        return True
+
+    @staticmethod
+    def settle_reservation(reservation_id, status_code: int, description: str = "") -> bool:
+        """
+        実行結果に応じて仮押さえを精算（成功なら確定、失敗なら解放）。reservation_idがNoneなら何もしない
+        """
+        if reservation_id is None:
+            return False
+        if status_code < 400:
+            return UnifiedCreditService.commit_reservation(reservation_id, description)
+        return UnifiedCreditService.release_reservation(reservation_id)
+
+    @staticmethod
+    def reclaim_expired_reservations(user_id: Optional[str] = None, limit: Optional[int] = None) -> int:
+        """
+        有効期限を過ぎた仮押さえを残高に戻す（確定も解放もされずにプロセスが落ちた場合等）
+        
+        Args:
+            user_id: 指定時はこのユーザーの仮押さえのみ
+            limit: 1回で処理する上限件数
+            
+        Returns:
+            int: 回収した件数
+        """
+        queryset = CreditReservation.objects.filter(status='held', expires_at__lt=timezone.now())
+        if user_id is not None:
+            queryset = queryset.filter(user_id=user_id)
+        reservation_ids = queryset.order_by('expires_at').values_list('id', flat=True)
+        if limit is not None:
+            reservation_ids = reservation_ids[:limit]
+
+        reclaimed = 0
+        for reservation_id in list(reservation_ids):
+            try:
+                if UnifiedCreditService.release_reservation(reservation_id, status='expired'):
+                    reclaimed += 1
+            except Exception as e:
+                logger.error(f"Failed to reclaim credit reservation: {reservation_id}, Error: {str(e)}")
+        return reclaimed
+
     @staticmethod
     def add_credits(user_id: str, amount: int, description: str = "", transaction_type: str = 'bonus') -> Tuple[bool, str]:
         """
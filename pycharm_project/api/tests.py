@@ -1,3 +1,1133 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import Http404
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+import requests
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import exception_handler
+
+from api.conditional import Validators, conditional_get
+from api.models.credit_charge import CreditTransaction, UserCredit
+from api.models.credit_reservation import CreditReservation
+from api.models.library import Library
+from api.models.menu import Menu
+from api.pagination import SearchRankKeysetPagination, TimelineKeysetPagination
+from api.services import generation_job_service
+from api.services.admission import EngineBusy, EngineLimiter
+from api.services.batch_execution_service import BatchExecution
+from api.services.circuit_breaker import CircuitBreaker, UpstreamUnavailable
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.gcs_upload_service import HashingStreamReader, StoredImage
+from api.services.http_client import PooledHTTPClient
+from api.services.image_normalizer import ImageNormalizer
+from api.services.menu_execution_service import run_menu_execution
+from api.services.prompt_template import PromptTemplate, get_prompt_template
+from api.services.rehost_service import create_library_variants
+from api.services.stage_timer import StageTimer, get_current_timer, record_bytes, record_stage
+from api.services.unified_credit_service import UnifiedCreditService
+from api.views.generation_job import GenerationJobDetailView
+from api.views.menu_batch_execution import MenuBatchExecutionView
+from api.views.suzuri import create_merchandise
+
+
+class _FakeBatchExecution:
+    """生成・再ホスト・保存を行わず、itemごとの結果を完了順（逆順）に返すバッチ実行"""
+
+    def __init__(self, items, image, user_id, author_name='', deadline=None):
+        self.items = items
+        self.requested_frontend_ids = []
+        self.saved_count = 0
+        self.skipped_frontend_ids = []
+
+    def iter_results(self):
+        for index in reversed(range(len(self.items))):
+            self.saved_count += 1
+            yield {"type": "item", "index": index, "menuId": self.items[index]["menu_id"], "status": 200}
+
+
+@mock.patch('api.views.menu_batch_execution.BatchExecution', _FakeBatchExecution)
+@mock.patch('api.serializers.menu_execution.batch_request.validate_prompt_variables')
+class MenuBatchExecutionStreamTests(SimpleTestCase):
+    """バッチ生成のNDJSONストリーミング（Acceptヘッダーでのコンテントネゴシエーション）"""
+
+    def setUp(self):
+        menus = {menu_id: Menu(id=menu_id, name=f'menu{menu_id}') for menu_id in (1, 2)}
+        in_bulk = mock.patch('api.serializers.menu_execution.batch_request.Menu.objects.in_bulk', return_value=menus)
+        in_bulk.start()
+        self.addCleanup(in_bulk.stop)
+        # 保存済みのfrontend_idはなし
+        library_filter = mock.patch('api.views.menu_batch_execution.Library.objects.filter')
+        library_filter.start().return_value.values_list.return_value = []
+        self.addCleanup(library_filter.stop)
+
+    def _post(self, **extra):
+        request = APIRequestFactory().post(
+            '/api/batch-execute/',
+            {'user_id': 'user-1', 'items': [{'menu_id': 1}, {'menu_id': 2}]},
+            format='json',
+            **extra,
+        )
+        return MenuBatchExecutionView.as_view()(request)
+
+    def test_streams_two_item_batch_for_ndjson_accept(self, _validate):
+        response = self._post(HTTP_ACCEPT='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line.get('index') for line in lines[:2]], [1, 0])
+        self.assertEqual(lines[2], {"type": "done", "saved": 2, "skippedFrontendIds": []})
+
+    def test_returns_sorted_json_without_ndjson_accept(self, _validate):
+        response = self._post(HTTP_ACCEPT='application/json')
+        response.render()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['index'] for result in response.data['results']], [0, 1])
+
+    @override_settings(BATCH_EXECUTION_MAX_ITEMS=1)
+    def test_validation_error_is_rendered_as_ndjson_line(self, _validate):
+        response = self._post(HTTP_ACCEPT='application/x-ndjson')
+        response.render()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', json.loads(response.content.decode().splitlines()[0]))
+
+
+def _image_file(size=(64, 32), image_format='JPEG', name='photo.jpg', mode='RGB', **save_kwargs):
+    """テスト用の画像ファイル（ノイズ画像。低画質で保存すると高画質での再エンコードの方が大きくなる）"""
+    img = Image.effect_noise(size, 64).convert(mode)
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, **save_kwargs)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=Image.MIME[image_format])
+
+
+@override_settings(
+    IMAGE_NORMALIZE_ENABLED=True,
+    ENGINE_INPUT_MAX_EDGE={'small': 16},
+    ENGINE_INPUT_MAX_EDGE_DEFAULT=2048,
+    IMAGE_NORMALIZE_JPEG_QUALITY=88,
+)
+class ImageNormalizerTests(SimpleTestCase):
+    """edit入力画像の前処理（向きの補正・縮小・メタデータ除去）"""
+
+    def setUp(self):
+        self.normalizer = ImageNormalizer()
+
+    def _normalize(self, upload, engine='default'):
+        result = self.normalizer.normalize(upload, engine)
+        result.seek(0)
+        data = result.read()
+        return result, data, Image.open(io.BytesIO(data))
+
+    def test_applies_exif_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # 右に90度回転して表示
+        _, _, img = self._normalize(_image_file(exif=exif))
+
+        self.assertEqual(img.size, (32, 64))
+        self.assertFalse(img.getexif())
+
+    def test_resizes_to_engine_max_edge(self):
+        result, _, img = self._normalize(_image_file(), engine='small')
+
+        self.assertEqual(img.size, (16, 8))
+        self.assertEqual(result.content_type, 'image/jpeg')
+
+    def test_strips_metadata_even_when_reencoding_is_larger(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'ExampleCamera'  # Make
+        upload = _image_file(quality=10, exif=exif, icc_profile=b'not-a-real-profile')
+        _, data, img = self._normalize(upload)
+
+        self.assertNotEqual(data, upload.file.getvalue())
+        self.assertFalse(img.getexif())
+        self.assertNotIn('icc_profile', img.info)
+
+    def test_keeps_original_without_metadata_when_reencoding_is_not_smaller(self):
+        upload = _image_file(quality=10)
+        result, data, _ = self._normalize(upload)
+
+        self.assertEqual(data, upload.file.getvalue())
+        self.assertEqual((result.name, result.content_type), ('photo.jpg', 'image/jpeg'))
+
+    def test_keeps_transparency_as_png(self):
+        result, _, img = self._normalize(_image_file(image_format='PNG', name='logo.png', mode='RGBA'), engine='small')
+
+        self.assertEqual((result.name, result.content_type), ('logo.png', 'image/png'))
+        self.assertEqual(img.mode, 'RGBA')
+
+    def test_returns_original_file_when_not_an_image(self):
+        upload = SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+
+        self.assertIs(self.normalizer.normalize(upload, 'default'), upload)
+        self.assertEqual(self.normalizer.get_stats()['default']['failures'], 1)
+
+
+class _FakeClock:
+    """time.monotonic / time.sleepの代わり（sleepした分だけ時刻を進める）"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@mock.patch('api.services.generation_job_service.expire_stale_job', side_effect=lambda job: job)
+class WaitForJobTests(SimpleTestCase):
+    """ジョブのロングポーリング（同期ワーカーを長時間占有しない）"""
+
+    def setUp(self):
+        self.clock = _FakeClock()
+        patcher = mock.patch.object(generation_job_service, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.job = mock.Mock(is_finished=False)
+
+    @override_settings(GENERATION_JOB_LONG_POLL_MAX_SECONDS=5, GENERATION_JOB_POLL_INTERVAL_SECONDS=0.5)
+    def test_wait_is_capped_by_long_poll_setting(self, _expire):
+        generation_job_service.wait_for_job(self.job, 60)
+
+        self.assertEqual(self.clock.now, 5)
+
+    @override_settings(GENERATION_JOB_LONG_POLL_MAX_SECONDS=120, GENERATION_JOB_POLL_INTERVAL_SECONDS=0.5)
+    def test_wait_is_capped_by_hard_limit(self, _expire):
+        generation_job_service.wait_for_job(self.job, 110, max_wait=110)
+
+        self.assertEqual(self.clock.now, generation_job_service.MAX_WAIT_SECONDS)
+
+    @override_settings(GENERATION_JOB_POLL_INTERVAL_SECONDS=0.5)
+    def test_returns_as_soon_as_job_finishes(self, _expire):
+        def finish():
+            self.job.is_finished = True
+        self.job.refresh_from_db.side_effect = finish
+
+        generation_job_service.wait_for_job(self.job, 5)
+
+        self.assertEqual(self.clock.now, 0.5)
+
+
+class GenerationJobDetailScopeTests(SimpleTestCase):
+    """生成ジョブの状態確認は作成したユーザーのみ"""
+
+    def setUp(self):
+        self.job = mock.Mock(pk='job-1', user_id='owner')
+
+        def get_job(model, **lookup):
+            if lookup != {'pk': self.job.pk, 'user_id': self.job.user_id}:
+                raise Http404
+            return self.job
+
+        patchers = [
+            mock.patch('api.views.generation_job.get_object_or_404', side_effect=get_job),
+            mock.patch('api.views.generation_job.expire_stale_job', side_effect=lambda job: job),
+            mock.patch('api.views.generation_job.GenerationJobSerializer', side_effect=lambda job: mock.Mock(data={'id': job.pk})),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get(self, query):
+        request = APIRequestFactory().get(f'/api/generation-jobs/job-1/{query}')
+        return GenerationJobDetailView.as_view()(request, job_id='job-1')
+
+    def test_owner_can_read_job(self):
+        self.assertEqual(self._get('?user_id=owner').status_code, 200)
+
+    def test_other_user_gets_404(self):
+        self.assertEqual(self._get('?user_id=someone-else').status_code, 404)
+
+    def test_user_id_is_required(self):
+        self.assertEqual(self._get('').status_code, 400)
+
+
+@override_settings(GCS_REHOST_MODE='sync')
+@mock.patch('api.services.batch_execution_service.schedule_image_deletion')
+@mock.patch('api.services.batch_execution_service.generate_or_edit')
+class BatchRehostFailureTests(SimpleTestCase):
+    """バッチ生成のGCS再ホストで時間切れ・サーキットオープンになったitem"""
+
+    def setUp(self):
+        self.item = {
+            'menu': Menu(id=1, name='menu1', engine='gemini'),
+            'menu_id': 1,
+            'num_images': 2,
+            'frontend_ids': ['f1', 'f2'],
+            'additional_prompt_for_my_car': None,
+            'additional_prompt_for_others': None,
+            'aspect_ratio': None,
+            'prompt_variables': [],
+        }
+        self.batch = BatchExecution([self.item], None, 'user-1')
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.pool.shutdown)
+
+    def _run(self, generate_or_edit, error):
+        generate_or_edit.return_value = (
+            mock.Mock(success=True, status_code=200, data={
+                'image_presigned_url_1': 'https://s3.example.com/1.png',
+                'image_presigned_url_2': 'https://s3.example.com/2.png',
+            }),
+            'prompt',
+        )
+        stored = StoredImage(url='https://storage.googleapis.com/bucket/generated-images/user-1/f1.png')
+        with mock.patch(
+            'api.services.batch_execution_service.gcs_upload_service.store_generated_image_from_url',
+            side_effect=[stored, error],
+        ):
+            return self.batch._run_item(0, self.item, self.pool), stored
+
+    def test_deadline_fails_item_with_504_without_saving_upstream_url(self, generate_or_edit, schedule_image_deletion):
+        result, stored = self._run(generate_or_edit, DeadlineExceeded())
+
+        self.assertEqual(result['status'], 504)
+        self.assertNotIn('images', result)
+        self.assertEqual(self.batch._library_entries, [])
+        schedule_image_deletion.assert_called_once_with([stored.url])
+
+    def test_open_circuit_fails_item_with_503(self, generate_or_edit, schedule_image_deletion):
+        result, _ = self._run(generate_or_edit, UpstreamUnavailable('gcs', 30))
+
+        self.assertEqual(result['status'], 503)
+        self.assertEqual(self.batch._library_entries, [])
+
+    def test_other_upload_errors_keep_upstream_url(self, generate_or_edit, schedule_image_deletion):
+        result, _ = self._run(generate_or_edit, Exception('upload failed'))
+
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(result['images'][1]['generatedImageUrl'], 'https://s3.example.com/2.png')
+        schedule_image_deletion.assert_not_called()
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """サーキットブレーカーの状態遷移（closed → open → half_open → closed / open）"""
+
+    def setUp(self):
+        self.clock = _FakeClock()
+        patcher = mock.patch('api.services.circuit_breaker.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('upstream', failure_threshold=2, recovery_seconds=30)
+
+    def _open(self):
+        for _ in range(2):
+            self.breaker.before_call()
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_open_rejects_with_retry_after(self):
+        self._open()
+        self.clock.sleep(10)
+
+        with self.assertRaises(UpstreamUnavailable) as raised:
+            self.breaker.before_call()
+        self.assertEqual(raised.exception.wait, 20)
+
+    def test_half_open_lets_one_trial_through(self):
+        self._open()
+        self.clock.sleep(30)
+
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, 'half_open')
+        with self.assertRaises(UpstreamUnavailable):
+            self.breaker.before_call()
+
+    def test_trial_success_closes(self):
+        self._open()
+        self.clock.sleep(30)
+        self.breaker.before_call()
+        self.breaker.record_success()
+
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.before_call()
+
+    def test_trial_failure_reopens(self):
+        self._open()
+        self.clock.sleep(30)
+        self.breaker.before_call()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(UpstreamUnavailable):
+            self.breaker.before_call()
+
+    def test_cancelled_trial_is_not_counted(self):
+        self._open()
+        self.clock.sleep(30)
+        self.breaker.before_call()
+        self.breaker.record_cancelled()
+
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.breaker.before_call()
+
+
+class DeadlineTests(SimpleTestCase):
+    """リクエスト単位の時間予算"""
+
+    def setUp(self):
+        self.clock = _FakeClock()
+        patcher = mock.patch('api.services.deadline.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_timeout_is_limited_to_remaining_time(self):
+        deadline = Deadline(10)
+        self.clock.sleep(4)
+
+        self.assertEqual(deadline.timeout((5, 60)), (5, 6))
+        self.assertEqual(deadline.timeout(3), (3, 3))
+        self.assertEqual(deadline.timeout(), (6, 6))
+
+    def test_check_raises_when_budget_is_spent(self):
+        deadline = Deadline(10)
+        deadline.check('generate')
+        self.clock.sleep(10 - Deadline.MIN_CALL_SECONDS / 2)
+
+        self.assertFalse(deadline.expired)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check('generate')
+        with self.assertRaises(DeadlineExceeded):
+            deadline.timeout(5)
+
+    @override_settings(REQUEST_DEADLINE_SECONDS=42)
+    def test_for_request_uses_setting(self):
+        self.assertEqual(Deadline.for_request().budget_seconds, 42)
+
+
+class HTTPClientBreakerAccountingTests(SimpleTestCase):
+    """時間予算切れによるタイムアウトはサーキットブレーカーの失敗に数えない"""
+
+    def setUp(self):
+        self.clock = _FakeClock()
+        for target in ('api.services.deadline.time', 'api.services.circuit_breaker.time'):
+            patcher = mock.patch(target, self.clock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('upstream', failure_threshold=1, recovery_seconds=30)
+        patcher = mock.patch('api.services.http_client.get_circuit_breaker', return_value=self.breaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = PooledHTTPClient()
+        self.client._session = mock.Mock()
+
+    def test_deadline_timeout_is_not_a_breaker_failure(self):
+        def time_out(**kwargs):
+            self.clock.sleep(kwargs['timeout'][1])
+            raise requests.exceptions.ReadTimeout()
+        self.client._session.request.side_effect = time_out
+
+        with self.assertRaises(DeadlineExceeded):
+            self.client.get('https://upstream.example.com/', upstream='upstream', deadline=Deadline(5))
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_upstream_timeout_is_a_breaker_failure(self):
+        self.client._session.request.side_effect = requests.exceptions.ReadTimeout()
+
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.client.get('https://upstream.example.com/', upstream='upstream', deadline=Deadline(100))
+        self.assertEqual(self.breaker.state, 'open')
+
+
+@override_settings(GCS_REHOST_MODE='sync')
+@mock.patch('api.services.menu_execution_service.schedule_rehost')
+@mock.patch('api.services.menu_execution_service.Library.objects.create', return_value=mock.Mock(id=10))
+@mock.patch('api.services.menu_execution_service.generate_or_edit')
+class MenuExecutionRehostDeadlineTests(SimpleTestCase):
+    """生成成功後のGCS再ホスト中の時間切れ"""
+
+    def _run(self, generate_or_edit, error):
+        generate_or_edit.return_value = (
+            mock.Mock(success=True, status_code=200, data={
+                'image_presigned_url_1': 'https://s3.example.com/1.png',
+                'created_at': '2025-08-16T10:00:00+09:00',
+            }),
+            'prompt',
+        )
+        with mock.patch(
+            'api.services.menu_execution_service.gcs_upload_service.store_generated_image_from_url',
+            side_effect=error,
+        ):
+            return run_menu_execution(Menu(id=1, name='menu1', engine='gemini'), {}, {}, 'user-1', 'f1')
+
+    def test_deadline_saves_upstream_url_for_background_rehost(self, generate_or_edit, create, schedule_rehost):
+        status_code, response_data = self._run(generate_or_edit, DeadlineExceeded())
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(response_data['generatedImageUrl'], 'https://s3.example.com/1.png')
+        self.assertEqual(create.call_args.kwargs['rehost_status'], 'pending')
+        schedule_rehost.assert_called_once_with(10)
+
+    def test_open_circuit_is_propagated(self, generate_or_edit, create, schedule_rehost):
+        with self.assertRaises(UpstreamUnavailable):
+            self._run(generate_or_edit, UpstreamUnavailable('generated-image-download', 30))
+        create.assert_not_called()
+
+
+@override_settings(GCS_REHOST_MODE='write_behind')
+@mock.patch('api.services.batch_execution_service.schedule_image_deletion')
+@mock.patch('api.services.batch_execution_service.schedule_rehost')
+@mock.patch('api.services.batch_execution_service.record_libraries_created')
+@mock.patch('api.services.batch_execution_service.Library.objects.bulk_create')
+class BatchSaveLibraryEntriesTests(SimpleTestCase):
+    """バッチ生成結果の保存（ignore_conflictsで主キーが返らないため挿入された行を照合する）"""
+
+    def test_only_inserted_rows_are_counted_and_rehosted(self, bulk_create, record_created, schedule_rehost,
+                                                         schedule_image_deletion):
+        batch = BatchExecution([], None, 'user-1')
+        new_entry = Library(user_id='user-1', frontend_id='new', timestamp=timezone.now(),
+                            image_url='https://s3.example.com/new.png')
+        duplicate = Library(user_id='user-1', frontend_id='dup', timestamp=timezone.now(),
+                            image_url='https://s3.example.com/dup.png')
+        batch._library_entries = [new_entry, duplicate]
+        # dupは別のリクエストで先に保存された行（timestampが異なる）
+        existing_rows = [
+            (101, 'new', new_entry.timestamp),
+            (55, 'dup', duplicate.timestamp - timedelta(seconds=3)),
+        ]
+        with mock.patch('api.services.batch_execution_service.Library.objects.filter') as library_filter:
+            library_filter.return_value.values_list.side_effect = [existing_rows, ['https://s3.example.com/old.png']]
+            batch._save_library_entries()
+
+        self.assertEqual(new_entry.pk, 101)
+        self.assertEqual(batch.saved_count, 1)
+        self.assertEqual(batch.skipped_frontend_ids, ['dup'])
+        record_created.assert_called_once_with([new_entry])
+        schedule_rehost.assert_called_once_with(101)
+
+
+@override_settings(GCS_BUCKET_NAME='bucket', GCS_CUSTOM_DOMAIN='')
+class BackgroundVariantTests(SimpleTestCase):
+    """派生画像（WebPサムネイル）は保存後にバックグラウンドで作成する"""
+
+    @override_settings(GCS_REHOST_MODE='sync')
+    @mock.patch('api.services.menu_execution_service.schedule_variants')
+    @mock.patch('api.services.menu_execution_service.Library.objects.create', return_value=mock.Mock(id=10))
+    @mock.patch('api.services.menu_execution_service.generate_or_edit')
+    def test_menu_execution_defers_variants(self, generate_or_edit, create, schedule_variants):
+        generate_or_edit.return_value = (
+            mock.Mock(success=True, status_code=200, data={
+                'image_presigned_url_1': 'https://s3.example.com/1.png',
+                'created_at': '2025-08-16T10:00:00+09:00',
+            }),
+            'prompt',
+        )
+        with mock.patch(
+            'api.services.menu_execution_service.gcs_upload_service.store_generated_image_from_url',
+            return_value=StoredImage(url='https://storage.googleapis.com/bucket/generated-images/user-1/f1.png'),
+        ) as store:
+            run_menu_execution(Menu(id=1, name='menu1', engine='gemini'), {}, {}, 'user-1', 'f1')
+
+        self.assertFalse(store.call_args.kwargs['with_variants'])
+        self.assertNotIn('image_variants', create.call_args.kwargs)
+        schedule_variants.assert_called_once_with([10])
+
+    @mock.patch('api.services.rehost_service.refresh_public_feed_entries')
+    @mock.patch('api.services.rehost_service.gcs_upload_service.create_variants_for_url')
+    @mock.patch('api.services.rehost_service.Library.objects.filter')
+    def test_create_library_variants_records_only_if_image_unchanged(self, library_filter, create_variants,
+                                                                     refresh_public_feed):
+        image_url = 'https://storage.googleapis.com/bucket/generated-images/user-1/f1.png'
+        variants = {'256': 'https://storage.googleapis.com/bucket/generated-images/user-1/f1_w256.webp'}
+        library_filter.return_value.values.return_value.first.return_value = {'image_url': image_url, 'is_public': True}
+        create_variants.return_value = variants
+
+        library_filter.return_value.update.return_value = 1
+        self.assertTrue(create_library_variants(10))
+        library_filter.assert_called_with(id=10, image_url=image_url, image_variants={})
+        self.assertEqual(library_filter.return_value.update.call_args.kwargs['image_variants'], variants)
+        refresh_public_feed.assert_called_once_with(pk=10)
+
+        # 作成中に画像が差し替えられた行は上書きしない
+        refresh_public_feed.reset_mock()
+        library_filter.return_value.update.return_value = 0
+        self.assertFalse(create_library_variants(10))
+        refresh_public_feed.assert_not_called()
+
+    @mock.patch('api.services.rehost_service.gcs_upload_service.create_variants_for_url')
+    @mock.patch('api.services.rehost_service.Library.objects.filter')
+    def test_create_library_variants_skips_upstream_urls(self, library_filter, create_variants):
+        library_filter.return_value.values.return_value.first.return_value = {
+            'image_url': 'https://s3.example.com/1.png', 'is_public': False,
+        }
+        self.assertFalse(create_library_variants(10))
+        create_variants.assert_not_called()
+
+
+class HashingStreamReaderTests(SimpleTestCase):
+    """上流レスポンスを読み出しながらMD5を計算し、読み出し済みの範囲はシークして読み直せる"""
+
+    data = bytes(range(256)) * 40  # 10240バイト
+
+    def _reader(self, read_size=1000):
+        return HashingStreamReader(io.BytesIO(self.data), io.BytesIO(), read_size=read_size)
+
+    def test_reads_full_size_chunks_until_eof(self):
+        reader = self._reader(read_size=300)
+
+        self.assertEqual(reader.read(4096), self.data[:4096])
+        self.assertEqual(reader.read(4096), self.data[4096:8192])
+        self.assertEqual(reader.read(4096), self.data[8192:])
+        self.assertEqual(reader.read(4096), b'')
+        self.assertEqual(reader.bytes_read, len(self.data))
+        self.assertEqual(reader.md5_base64, base64.b64encode(hashlib.md5(self.data).digest()).decode())
+
+    def test_seek_back_replays_without_rehashing(self):
+        reader = self._reader()
+        reader.read(6000)
+        # 部分コミット: サーバーが2500バイトまで受理したとして再送
+        self.assertEqual(reader.seek(2500), 2500)
+        self.assertEqual(reader.read(5000), self.data[2500:7500])
+        self.assertEqual(reader.tell(), 7500)
+        self.assertEqual(reader.read(), self.data[7500:])
+
+        self.assertEqual(reader.bytes_read, len(self.data))
+        self.assertEqual(reader.md5_base64, base64.b64encode(hashlib.md5(self.data).digest()).decode())
+
+    def test_seek_current_and_bounds(self):
+        reader = self._reader()
+        reader.read(1000)
+        self.assertEqual(reader.seek(-400, io.SEEK_CUR), 600)
+        self.assertEqual(reader.read(400), self.data[600:1000])
+        # 未読の範囲・末尾基準のシークは不可
+        with self.assertRaises(io.UnsupportedOperation):
+            reader.seek(1001)
+        with self.assertRaises(io.UnsupportedOperation):
+            reader.seek(0, io.SEEK_END)
+
+    def test_spool_keeps_full_copy(self):
+        spool = io.BytesIO()
+        reader = HashingStreamReader(io.BytesIO(self.data), spool, read_size=700)
+        reader.read(3000)
+        reader.seek(0)
+        reader.read()
+        self.assertEqual(spool.getvalue(), self.data)
+
+
+class EngineLimiterTests(SimpleTestCase):
+    """エンジンごとの同時実行数制限（待ち行列付き）"""
+
+    def test_full_queue_is_rejected_with_retry_after(self):
+        limiter = EngineLimiter('gemini', max_in_flight=1, max_queue=0, queue_timeout=30)
+        limiter.acquire()
+        limiter.release(4.0)
+        limiter.acquire()
+
+        with self.assertRaises(EngineBusy) as raised:
+            limiter.acquire()
+        response = exception_handler(raised.exception, {})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '4')
+        self.assertEqual(limiter.as_dict()['rejected'], 1)
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_pending_jobs_count_towards_queue(self):
+        limiter = EngineLimiter('gemini', max_in_flight=1, max_queue=1, queue_timeout=30)
+        limiter.acquire()
+        limiter.reserve_pending()
+
+        with self.assertRaises(EngineBusy):
+            limiter.acquire()
+        with self.assertRaises(EngineBusy):
+            limiter.reserve_pending()
+        limiter.release_pending()
+        self.assertEqual(limiter.pending, 0)
+
+    def test_queued_request_waits_for_release(self):
+        limiter = EngineLimiter('gemini', max_in_flight=1, max_queue=1, queue_timeout=5)
+        limiter.acquire()
+        admitted = threading.Event()
+
+        def waiter():
+            limiter.acquire()
+            admitted.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        self.assertFalse(admitted.wait(0.05))
+        self.assertEqual(limiter.queued, 1)
+        limiter.release(1.0)
+        thread.join(5)
+
+        self.assertTrue(admitted.is_set())
+        self.assertEqual(limiter.queued, 0)
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertEqual(limiter.admitted, 2)
+
+    def test_wait_is_limited_by_queue_timeout_and_deadline(self):
+        limiter = EngineLimiter('gemini', max_in_flight=1, max_queue=1, queue_timeout=0.05)
+        limiter.acquire()
+        with self.assertRaises(EngineBusy):
+            limiter.acquire()
+
+        limiter.queue_timeout = 30
+        deadline = mock.Mock(remaining=mock.Mock(return_value=0.05))
+        with self.assertRaises(EngineBusy):
+            limiter.acquire(deadline)
+        self.assertEqual(limiter.timed_out, 2)
+        self.assertEqual(limiter.queued, 0)
+
+
+def _legacy_render(prompt: str, keys: list[str], prompt_variables: list[dict[str, str]]) -> str:
+    """変更前の埋め込み（メニューの変数ごとにstr.replace）"""
+    for key in keys:
+        value = None
+        for prompt_variable in prompt_variables:
+            if key == prompt_variable['key']:
+                value = prompt_variable['value']
+                break
+        prompt = prompt.replace('{{' + key + '}}', value)
+    return prompt
+
+
+class PromptTemplateTests(SimpleTestCase):
+    """コンパイル済みプロンプトの変数埋め込み"""
+
+    def assertMatchesLegacy(self, prompt, keys, prompt_variables):
+        self.assertEqual(
+            PromptTemplate(prompt, keys).render(prompt_variables),
+            _legacy_render(prompt, keys, prompt_variables),
+        )
+
+    def test_matches_per_variable_replace(self):
+        cases = [
+            ('{{car}}を{{place}}で撮影', ['car', 'place'], [{'key': 'car', 'value': 'GR86'}, {'key': 'place', 'value': '海辺'}]),
+            # 前方一致するkey・同じ変数の複数回出現
+            ('{{car}} {{car_name}} {{car}}', ['car', 'car_name'], [{'key': 'car_name', 'value': 'ハチロク'}, {'key': 'car', 'value': 'AE86'}]),
+            # 正規表現の特殊文字・置換文字列のエスケープ
+            ('{{a.b}} {{x}}', ['a.b', 'x'], [{'key': 'a.b', 'value': r'\1 $0 \g<0>'}, {'key': 'x', 'value': '(.*)'}]),
+            # 同じkeyが複数ある場合は最初の値、メニューにない変数・余分なリクエストは無視
+            ('{{car}} {{unknown}}', ['car'], [{'key': 'car', 'value': '1'}, {'key': 'car', 'value': '2'}, {'key': 'extra', 'value': '3'}]),
+            ('変数なし', [], [{'key': 'car', 'value': '1'}]),
+            ('', ['car'], [{'key': 'car', 'value': '1'}]),
+        ]
+        for prompt, keys, prompt_variables in cases:
+            with self.subTest(prompt=prompt):
+                self.assertMatchesLegacy(prompt, keys, prompt_variables)
+
+    def test_values_are_not_rescanned(self):
+        # 従来は先に埋め込んだ値に含まれる {{...}} も後続の変数で置換されていた
+        template = PromptTemplate('{{a}} {{b}}', ['a', 'b'])
+        self.assertEqual(template.render([{'key': 'a', 'value': '{{b}}'}, {'key': 'b', 'value': 'B'}]), '{{b}} B')
+
+    def test_without_variables_returns_prompt(self):
+        self.assertEqual(PromptTemplate('{{car}}', []).render(None), '{{car}}')
+
+    @override_settings(PROMPT_TEMPLATE_CACHE_SIZE=2)
+    def test_cache_is_keyed_by_prompt_version(self):
+        def menu(menu_id, version, prompt):
+            return mock.Mock(id=menu_id, prompt_version=version, prompt=prompt, prompt_variables=mock.Mock(
+                all=mock.Mock(return_value=[mock.Mock(key='car')])
+            ))
+
+        with mock.patch('api.services.prompt_template._cache', OrderedDict()) as cache:
+            first = menu(-1, 1, 'v1 {{car}}')
+            template = get_prompt_template(first)
+            self.assertIs(get_prompt_template(menu(-1, 1, 'ignored')), template)
+            first.prompt_variables.all.assert_called_once()
+
+            updated = get_prompt_template(menu(-1, 2, 'v2 {{car}}'))
+            self.assertEqual(updated.render([{'key': 'car', 'value': 'GR86'}]), 'v2 GR86')
+            self.assertEqual(list(cache), [(-1, 2)])
+
+            get_prompt_template(menu(-2, 1, ''))
+            get_prompt_template(menu(-3, 1, ''))
+            self.assertEqual(list(cache), [(-2, 1), (-3, 1)])
+
+
+class StageTimerTests(SimpleTestCase):
+    """生成パイプラインのステージ別所要時間（Server-Timingヘッダー）"""
+
+    def setUp(self):
+        self.clock = _FakeClock()
+        patcher = mock.patch('api.services.stage_timer.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_server_timing_format(self):
+        timer = StageTimer()
+        with timer.activate():
+            with record_stage('validate'):
+                self.clock.sleep(0.0032)
+            with record_stage('generate'):
+                self.clock.sleep(8.1234)
+            # 同じステージは合算
+            with record_stage('rehost'):
+                self.clock.sleep(0.1)
+            with record_stage('rehost'):
+                self.clock.sleep(0.2)
+            record_bytes('rehost', 100)
+            record_bytes('rehost', 50)
+        self.clock.sleep(0.5)
+
+        self.assertEqual(
+            timer.server_timing(),
+            'validate;dur=3.2, generate;dur=8123.4, rehost;dur=300.0, total;dur=8926.6',
+        )
+        self.assertEqual(timer.bytes, {'rehost': 150})
+
+    def test_stage_is_recorded_when_it_raises(self):
+        timer = StageTimer()
+        with timer.activate(), self.assertRaises(ValueError):
+            with record_stage('generate'):
+                self.clock.sleep(1)
+                raise ValueError
+        self.assertEqual(timer.server_timing(), 'generate;dur=1000.0, total;dur=1000.0')
+
+    def test_without_active_timer_records_nothing(self):
+        self.assertIsNone(get_current_timer())
+        with record_stage('generate'):
+            record_bytes('rehost', 100)
+        timer = StageTimer()
+        with timer.activate():
+            self.assertIs(get_current_timer(), timer)
+        self.assertIsNone(get_current_timer())
+        self.assertEqual(timer.server_timing(), 'total;dur=0.0')
+
+
+class _FakeKeysetQuerySet:
+    """order_by・スライスだけを再現するクエリセット（filterの条件はカーソル側で検証する）"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.ordering = None
+
+    def filter(self, *args, **kwargs):
+        self.filters.append((args, kwargs))
+        return self
+
+    def order_by(self, *ordering):
+        self.ordering = ordering
+        return self
+
+    def __getitem__(self, item):
+        return self.rows[item]
+
+
+def _keyset_request(path):
+    return Request(APIRequestFactory().get(path))
+
+
+class TimelineKeysetPaginationTests(SimpleTestCase):
+    """タイムラインのキーセットページネーション（カーソルのエンコード・デコード）"""
+
+    def setUp(self):
+        self.paginator = TimelineKeysetPagination()
+        self.timestamp = timezone.now()
+        self.pk = uuid.uuid4()
+
+    def _cursor(self, url):
+        return dict(item.split('=', 1) for item in url.split('?', 1)[1].split('&'))['cursor']
+
+    def test_cursor_round_trip(self):
+        for direction in ('next', 'prev'):
+            encoded = self.paginator._encode_cursor((self.timestamp, self.pk), direction)
+            self.assertNotIn('=', encoded)
+            self.assertEqual(
+                self.paginator._decode_cursor(encoded),
+                {'t': self.timestamp, 'i': self.pk, 'd': direction},
+            )
+
+    def test_invalid_cursor_is_not_found(self):
+        invalid = [
+            'not-base64!',
+            base64.urlsafe_b64encode(b'{"t":"x","i":"y","d":"next"}').decode(),
+            TimelineKeysetPagination._encode_cursor((self.timestamp, self.pk), 'sideways'),
+            base64.urlsafe_b64encode(json.dumps({'t': self.timestamp.isoformat()}).encode()).decode(),
+        ]
+        for encoded in invalid:
+            with self.subTest(cursor=encoded), self.assertRaises(NotFound):
+                self.paginator._decode_cursor(encoded)
+
+    def test_without_cursor_or_page_size_returns_all(self):
+        self.assertIsNone(self.paginator.paginate_queryset(_FakeKeysetQuerySet([]), _keyset_request('/timeline/')))
+
+    @override_settings(TIMELINE_PAGE_SIZE=2, TIMELINE_MAX_PAGE_SIZE=3)
+    def test_page_links_follow_last_and_first_rows(self):
+        paginator = TimelineKeysetPagination()
+        rows = [mock.Mock(timestamp=self.timestamp - timedelta(seconds=i), pk=uuid.uuid4()) for i in range(4)]
+
+        # 先頭ページ: 1件多く取得して次ページの有無を判定（page_sizeは上限で切り詰め）
+        queryset = _FakeKeysetQuerySet(rows)
+        page = paginator.paginate_queryset(queryset, _keyset_request('/timeline/?page_size=50'))
+        self.assertEqual(page, rows[:3])
+        self.assertEqual(queryset.ordering, ('-timestamp', '-pk'))
+        self.assertEqual(queryset.filters, [])
+        response = paginator.get_paginated_response([])
+        self.assertIsNone(response.data['previous'])
+        self.assertEqual(
+            paginator._decode_cursor(self._cursor(response.data['next'])),
+            {'t': rows[2].timestamp, 'i': rows[2].pk, 'd': 'next'},
+        )
+
+        # 前ページ方向: 昇順で取得して並べ直す
+        cursor = paginator._encode_cursor((rows[2].timestamp, rows[2].pk), 'prev')
+        queryset = _FakeKeysetQuerySet([rows[1], rows[0]])
+        page = paginator.paginate_queryset(queryset, _keyset_request(f'/timeline/?cursor={cursor}'))
+        self.assertEqual(page, [rows[0], rows[1]])
+        self.assertEqual(queryset.ordering, ('timestamp', 'pk'))
+        self.assertEqual(queryset.filters[0][1], {'timestamp__gte': rows[2].timestamp})
+        response = paginator.get_paginated_response([])
+        self.assertIsNone(response.data['previous'])
+        self.assertEqual(
+            paginator._decode_cursor(self._cursor(response.data['next'])),
+            {'t': rows[1].timestamp, 'i': rows[1].pk, 'd': 'next'},
+        )
+
+
+class SearchRankKeysetPaginationTests(SimpleTestCase):
+    """生成履歴検索の(rank, timestamp, 主キー)キーセットページネーション"""
+
+    def setUp(self):
+        self.paginator = SearchRankKeysetPagination(page_size=2, max_page_size=5)
+        self.timestamp = timezone.now()
+
+    def test_cursor_round_trip(self):
+        pk = uuid.uuid4()
+        encoded = self.paginator._encode_cursor((0.0759, self.timestamp, pk), 'next')
+        self.assertEqual(self.paginator._decode_cursor(encoded), {'r': 0.0759, 't': self.timestamp, 'i': pk})
+
+    def test_invalid_cursor_is_not_found(self):
+        timeline_cursor = TimelineKeysetPagination._encode_cursor((self.timestamp, uuid.uuid4()), 'next')
+        rank_not_number = base64.urlsafe_b64encode(json.dumps({
+            'r': 'high', 't': self.timestamp.isoformat(), 'i': str(uuid.uuid4()),
+        }).encode()).decode()
+        for encoded in (timeline_cursor, rank_not_number, '%%%'):
+            with self.subTest(cursor=encoded), self.assertRaises(NotFound):
+                self.paginator._decode_cursor(encoded)
+
+    def test_always_paginates_and_links_next_page(self):
+        rows = [mock.Mock(rank=0.5 - i * 0.1, timestamp=self.timestamp, pk=uuid.uuid4()) for i in range(3)]
+        queryset = _FakeKeysetQuerySet(rows)
+        page = self.paginator.paginate_queryset(queryset, _keyset_request('/search/?q=GR86'))
+
+        self.assertEqual(page, rows[:2])
+        self.assertEqual(queryset.ordering, ('-rank', '-timestamp', '-pk'))
+        next_link = self.paginator.get_paginated_response([]).data['next']
+        self.assertIn('q=GR86', next_link)
+        cursor = dict(item.split('=', 1) for item in next_link.split('?', 1)[1].split('&'))['cursor']
+        self.assertEqual(
+            self.paginator._decode_cursor(cursor),
+            {'r': rows[1].rank, 't': rows[1].timestamp, 'i': rows[1].pk},
+        )
+
+        # 最終ページには次ページのリンクがない
+        queryset = _FakeKeysetQuerySet(rows[2:])
+        self.paginator.paginate_queryset(queryset, _keyset_request(f'/search/?q=GR86&cursor={cursor}'))
+        self.assertEqual(len(queryset.filters), 1)
+        self.assertIsNone(self.paginator.get_paginated_response([]).data['next'])
+
+
+class ConditionalGetTests(SimpleTestCase):
+    """条件付きGET（ETag / Last-Modifiedが一致すれば本体を作らずに304）"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.validators = Validators(etag='menus.3', last_modified=timezone.now().replace(microsecond=0))
+        self.calls = 0
+
+        @api_view(['GET', 'POST'])
+        @conditional_get(lambda request, **kwargs: self.validators, cache_control='public, max-age=60')
+        def view(request):
+            self.calls += 1
+            if request.query_params.get('missing'):
+                return Response(status=404)
+            return Response({'ok': True})
+
+        self.view = view
+
+    def test_200_sets_validators(self):
+        response = self.view(self.factory.get('/menus/'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]{20}"$')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(response['Last-Modified'], http_date(self.validators.last_modified.timestamp()))
+
+    def test_matching_etag_returns_304_without_running_view(self):
+        etag = self.view(self.factory.get('/menus/'))['ETag']
+        for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.view(self.factory.get('/menus/', HTTP_IF_NONE_MATCH=if_none_match))
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.calls, 1)
+
+    def test_etag_changes_with_version_query_and_accept(self):
+        etag = self.view(self.factory.get('/menus/'))['ETag']
+        self.assertNotEqual(self.view(self.factory.get('/menus/?page=2'))['ETag'], etag)
+        self.assertNotEqual(self.view(self.factory.get('/menus/', HTTP_ACCEPT='text/html'))['ETag'], etag)
+        self.validators = Validators(etag='menus.4')
+        response = self.view(self.factory.get('/menus/', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = http_date(self.validators.last_modified.timestamp())
+        older = http_date(self.validators.last_modified.timestamp() - 60)
+
+        self.assertEqual(self.view(self.factory.get('/menus/', HTTP_IF_MODIFIED_SINCE=last_modified)).status_code, 304)
+        self.assertEqual(self.view(self.factory.get('/menus/', HTTP_IF_MODIFIED_SINCE=older)).status_code, 200)
+        # If-None-Matchがあれば優先する
+        response = self.view(self.factory.get('/menus/', HTTP_IF_MODIFIED_SINCE=last_modified, HTTP_IF_NONE_MATCH='"stale"'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_bypassed_for_writes_missing_validators_and_errors(self):
+        response = self.view(self.factory.post('/menus/', HTTP_IF_NONE_MATCH='*'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+        response = self.view(self.factory.get('/menus/?missing=1'))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+        self.validators = None
+        response = self.view(self.factory.get('/menus/', HTTP_IF_NONE_MATCH='*'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+class CreditReservationTests(TestCase):
+    """クレジットの仮押さえ（held → committed / released / expired）"""
+
+    def setUp(self):
+        UserCredit.objects.create(user_id='user-1', credit_balance=10)
+
+    def _balance(self):
+        return UserCredit.objects.get(user_id='user-1').credit_balance
+
+    def _expire(self, reservation):
+        CreditReservation.objects.filter(id=reservation.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_commit_records_usage_once(self):
+        reservation, _ = UnifiedCreditService.reserve_credits('user-1', 3, menu_id=1)
+        self.assertEqual(self._balance(), 7)
+
+        self.assertTrue(UnifiedCreditService.settle_reservation(reservation.id, 200, 'メニュー実行'))
+        self.assertFalse(UnifiedCreditService.commit_reservation(reservation.id))
+        self.assertFalse(UnifiedCreditService.release_reservation(reservation.id))
+
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'committed')
+        self.assertEqual(self._balance(), 7)
+        usage = CreditTransaction.objects.get(user_id='user-1', transaction_type='usage')
+        self.assertEqual((usage.amount, usage.balance_after), (-3, 7))
+
+    def test_release_refunds(self):
+        reservation, _ = UnifiedCreditService.reserve_credits('user-1', 3)
+        self.assertTrue(UnifiedCreditService.settle_reservation(reservation.id, 500))
+        self.assertFalse(UnifiedCreditService.commit_reservation(reservation.id))
+
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'released')
+        self.assertEqual(self._balance(), 10)
+        self.assertFalse(CreditTransaction.objects.filter(user_id='user-1').exists())
+
+    def test_insufficient_balance_is_not_reserved(self):
+        reservation, message = UnifiedCreditService.reserve_credits('user-1', 11)
+        self.assertIsNone(reservation)
+        self.assertIn('クレジット不足', message)
+        self.assertEqual(self._balance(), 10)
+
+    def test_expired_reservation_is_reclaimed(self):
+        reservation, _ = UnifiedCreditService.reserve_credits('user-1', 3)
+        self._expire(reservation)
+
+        self.assertEqual(UnifiedCreditService.reclaim_expired_reservations(user_id='user-1'), 1)
+        self.assertFalse(UnifiedCreditService.commit_reservation(reservation.id))
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'expired')
+        self.assertEqual(self._balance(), 10)
+
+    def test_late_commit_releases_instead_of_recording_usage(self):
+        reservation, _ = UnifiedCreditService.reserve_credits('user-1', 3)
+        self._expire(reservation)
+
+        self.assertFalse(UnifiedCreditService.commit_reservation(reservation.id))
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'expired')
+        self.assertEqual(self._balance(), 10)
+        self.assertFalse(CreditTransaction.objects.filter(user_id='user-1').exists())
+        # 回収処理が後から走っても二重に戻さない
+        self.assertEqual(UnifiedCreditService.reclaim_expired_reservations(user_id='user-1'), 0)
+        self.assertEqual(self._balance(), 10)
+
+    def test_extend_only_while_held(self):
+        reservation, _ = UnifiedCreditService.reserve_credits('user-1', 3)
+        self.assertTrue(UnifiedCreditService.extend_reservation(reservation.id, 600))
+        self._expire(reservation)
+        self.assertFalse(UnifiedCreditService.extend_reservation(reservation.id, 600))
+        self.assertEqual(self._balance(), 10)
+
+
+class LibraryImageURLLookupTests(TestCase):
+    """image_url_hashのインデックスでimage_urlが一致するLibraryを引く"""
+
+    image_url = 'https://storage.googleapis.com/bucket/generated-images/user-1/f1.png'
+
+    def setUp(self):
+        self.entry = Library.objects.create(
+            user_id='user-1', frontend_id='f1', image_url=self.image_url,
+            display_prompt='prompt', used_form_data={}, timestamp=timezone.now(),
+        )
+
+    def test_lookup_matches_generated_hash(self):
+        lookup = Library.image_url_lookup(self.image_url)
+        self.assertEqual(lookup['image_url_hash'], hashlib.md5(self.image_url.encode()).hexdigest())
+        self.assertEqual(Library.objects.get(**lookup).pk, self.entry.pk)
+        self.assertEqual(Library.objects.filter(pk=self.entry.pk).values_list('image_url_hash', flat=True).get(),
+                         lookup['image_url_hash'])
+        self.assertFalse(Library.objects.filter(**Library.image_url_lookup(self.image_url + '?v=2')).exists())
+
+    def test_hash_follows_image_url_updates(self):
+        new_url = self.image_url.replace('f1.png', 'f1-rehosted.png')
+        Library.objects.filter(pk=self.entry.pk).update(image_url=new_url)
+        self.assertFalse(Library.objects.filter(**Library.image_url_lookup(self.image_url)).exists())
+        self.assertTrue(Library.objects.filter(**Library.image_url_lookup(new_url)).exists())
+
+    @mock.patch('api.views.suzuri.SuzuriAPIService')
+    def test_merchandise_uses_library_entry_image(self, suzuri_service):
+        suzuri_service.return_value.create_car_merchandise.return_value = {'success': False, 'error': 'stop'}
+        request = APIRequestFactory().post('/api/suzuri/merchandise/', {
+            'library_id': str(self.entry.pk),
+            'image_url': 'https://s3.example.com/other.png',
+            'car_name': 'GR86',
+        }, format='json')
+
+        create_merchandise(request)
+
+        self.assertEqual(suzuri_service.return_value.create_car_merchandise.call_args.kwargs['image_url'],
+                         self.image_url)
@@ -4,6 +4,8 @@ from rest_framework.routers import DefaultRouter
 from api.views.category import CategoryViewSet
 from api.views.menu import MenuViewSet
 from api.views.menu_execution import MenuExecutionView
+from api.views.menu_batch_execution import MenuBatchExecutionView
+from api.views.generation_job import GenerationJobDetailView
 from api.views.image_upload import ImageUploadView
 from api.views.menu_image_upload import MenuImageUploadView
 from api.views.car_settings import CarSettingsListCreateView, CarSettingsDetailView
@@ -16,7 +18,13 @@ from api.views.credit_charge import (
     CreditConsumeView,
     stripe_config
 )
-from api.views.library import TimelineListCreateView, TimelineDetailView, PublicTimelineListView
+from api.views.library import (
+    TimelineListCreateView,
+    TimelineDetailView,
+    TimelineBulkUpdateView,
+    TimelineBulkDeleteView,
+    PublicTimelineListView,
+)
 from api.views.public_share import PublicTimelineShareView
 from api.views.public_comments import PublicCommentsView
 from api.views.comment import CommentListCreateView, CommentDeleteView, LikeToggleView, LikeStatusView
@@ -64,7 +72,8 @@ from api.views.admin_credit import (
     delete_user,
     get_all_users,
     get_generation_history_stats,
-    get_generation_history_list
+    get_generation_history_list,
+    search_generation_history
 )
 from api.views.charge_option import (
     ChargeOptionListView,
@@ -86,6 +95,8 @@ from api.views.aws_sms_auth import (
 from api.views.stripe_webhook import stripe_webhook
 from api.views.sales_management import SalesManagementView, SalesMonthlyDetailView
 from api.views.mygarage_auth import register_mygarage_user
+from api.views.upstream_status import get_upstream_metrics
+from api.views.generation_run import get_generation_run_percentiles
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
@@ -97,6 +108,8 @@ urlpatterns += [
     # ヘルスチェック
     path('health/', health_check, name='health'),
     path('menus/<int:menu_id>/execute/', MenuExecutionView.as_view(), name='menu-execute'),
+    path('batch-execute/', MenuBatchExecutionView.as_view(), name='menu-batch-execute'),  # menus/配下はrouterのdetailと衝突するため別パス
+    path('generation-jobs/<uuid:job_id>/', GenerationJobDetailView.as_view(), name='generation-job-detail'),
     path('images/upload/', ImageUploadView.as_view(), name='image-upload'),
     path('menu-images/upload/', MenuImageUploadView.as_view(), name='menu-image-upload'),
     path('car-settings/', CarSettingsListCreateView.as_view(), name='car-settings-list-create'),
@@ -121,6 +134,8 @@ urlpatterns += [
     # タイムライン関連
     path('timeline/', TimelineListCreateView.as_view(), name='timeline-list-create'),
     path('timeline/public/', PublicTimelineListView.as_view(), name='timeline-public'),
+    path('timeline/bulk-update/', TimelineBulkUpdateView.as_view(), name='timeline-bulk-update'),
+    path('timeline/bulk-delete/', TimelineBulkDeleteView.as_view(), name='timeline-bulk-delete'),
     path('timeline/share/<str:frontend_id>/', PublicTimelineShareView.as_view(), name='timeline-share'),
     path('timeline/share/<str:frontend_id>/comments/', PublicCommentsView.as_view(), name='timeline-share-comments'),
     path('timeline/share/<str:frontend_id>/goods/', get_goods_by_image, name='timeline-share-goods'),
@@ -185,6 +200,11 @@ urlpatterns += [
     # 生成履歴管理
     path('admin/generation-history/stats/', get_generation_history_stats, name='generation-history-stats'),
     path('admin/generation-history/list/', get_generation_history_list, name='generation-history-list'),
+    path('admin/generation-history/search/', search_generation_history, name='generation-history-search'),
+    
+    # 外部API監視
+    path('admin/upstream/metrics/', get_upstream_metrics, name='upstream-metrics'),
+    path('admin/generation-runs/percentiles/', get_generation_run_percentiles, name='generation-run-percentiles'),
     
 
     
@@ -10,6 +10,15 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# 生成履歴のカテゴリID → 管理画面のカテゴリキー
+HISTORY_CATEGORY_KEYS = {
+    3: 'illustration',  # イラスト作成
+    1: 'scene_change',  # シーン変更
+    2: 'customization',  # カスタマイズ
+}
+HISTORY_CATEGORY_IDS = {key: category_id for category_id, key in HISTORY_CATEGORY_KEYS.items()}
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def add_credits_to_user(request):
@@ -516,40 +525,36 @@ def delete_user(request):
 @permission_classes([AllowAny])
 def get_generation_history_stats(request):
     """
-    全ユーザーの生成履歴統計を取得
+    全ユーザーの生成履歴統計を取得（日次集計テーブルから集計するため件数に関わらず一定時間で返る）
+    - from / to: 期間（YYYY-MM-DD、両端を含む。未指定は全期間）
     """
+    from datetime import date
+    from api.services.generation_stats_service import get_generation_stats
+    
     try:
-        from api.models.library import Library
-        from django.db.models import Count, Q
-        
-        # 基本統計
-        total_generations = Library.objects.count()
-        library_registrations = Library.objects.filter(is_saved_to_library=True).count()
-        public_images = Library.objects.filter(is_public=True).count()
-        goods_creations = Library.objects.aggregate(
-            total_goods=Count('id', filter=Q(goods_creation_count__gt=0))
-        )['total_goods'] or 0
-        
-        # カテゴリ別統計（カテゴリIDベースで集計）
-        category_stats = {}
-        
-        # イラスト作成（category.id = 3）
-        illustration_count = Library.objects.filter(
-            used_form_data__category__id=3
-        ).count()
-        category_stats['illustration'] = illustration_count
-        
-        # シーン変更（category.id = 1）
-        scene_change_count = Library.objects.filter(
-            used_form_data__category__id=1
-        ).count()
-        category_stats['scene_change'] = scene_change_count
-        
-        # カスタマイズ（category.id = 2）
-        customization_count = Library.objects.filter(
-            used_form_data__category__id=2
-        ).count()
-        category_stats['customization'] = customization_count
+        start = date.fromisoformat(request.query_params['from']) if request.query_params.get('from') else None
+        end = date.fromisoformat(request.query_params['to']) if request.query_params.get('to') else None
+    except ValueError:
+        return Response({
+            'success': False,
+            'error': '期間はYYYY-MM-DD形式で指定してください'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        # カテゴリ別の件数を合計して全体の件数を求める
+        rows = get_generation_stats(start, end, group_by='category_id')
+        
+        total_generations = library_registrations = public_images = goods_creations = 0
+        category_stats = {key: 0 for key in HISTORY_CATEGORY_KEYS.values()}
+        for row in rows:
+            total_generations += row['generation_count']
+            library_registrations += row['library_save_count']
+            public_images += row['public_count']
+            goods_creations += row['goods_count']
+            # カテゴリ別統計（カテゴリIDベースで集計）
+            key = HISTORY_CATEGORY_KEYS.get(row['category_id'])
+            if key:
+                category_stats[key] += row['generation_count']
         
         return Response({
             'success': True,
@@ -559,6 +564,10 @@ def get_generation_history_stats(request):
                 'public_images': public_images,
                 'goods_creations': goods_creations,
                 'category_stats': category_stats
+            },
+            'period': {
+                'from': start.isoformat() if start else None,
+                'to': end.isoformat() if end else None,
             }
         })
         
@@ -570,6 +579,61 @@ def get_generation_history_stats(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _apply_generation_history_filters(queryset, request):
+    """生成履歴のカテゴリ・ユーザー・評価フィルター（一覧・検索で共通）"""
+    category_filter = request.query_params.get('category', '')
+    user_filter = request.query_params.get('user', '')
+    rating_filter = request.query_params.get('rating', '')
+    
+    # カテゴリフィルター（カテゴリIDベース。category_idのインデックスを使用）
+    category_id = HISTORY_CATEGORY_IDS.get(category_filter)
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    
+    # ユーザーフィルター
+    if user_filter:
+        queryset = queryset.filter(user_id__icontains=user_filter)
+    
+    # 評価フィルター
+    if rating_filter:
+        queryset = queryset.filter(rating=rating_filter)
+    
+    return queryset
+
+
+def _build_generation_history_items(items):
+    """生成履歴のレスポンスデータ構築（一覧・検索で共通）"""
+    from api.models.user_profile import UserProfile
+    
+    user_ids = {item.user_id for item in items}
+    user_profiles = {
+        profile.frontend_user_id: profile.nickname 
+        for profile in UserProfile.objects.filter(frontend_user_id__in=user_ids)
+    }
+    
+    history_list = []
+    for item in items:
+        # カテゴリ判定（カテゴリIDベース）
+        category = HISTORY_CATEGORY_KEYS.get(item.category_id, 'customization')  # デフォルトはカスタマイズ
+        
+        history_list.append({
+            'id': str(item.id),
+            'user_id': item.user_id,
+            'user_name': user_profiles.get(item.user_id, 'Unknown User'),
+            'image_url': item.image_url,
+            'display_prompt': item.display_prompt,
+            'menu_name': item.menu_name,
+            'category': category,
+            'rating': item.rating,
+            'is_public': item.is_public,
+            'is_saved_to_library': item.is_saved_to_library,
+            'goods_creation_count': item.goods_creation_count,
+            'created_at': item.created_at.isoformat(),
+            'timestamp': item.timestamp.isoformat()
+        })
+    return history_list
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_generation_history_list(request):
@@ -578,100 +642,23 @@ def get_generation_history_list(request):
     """
     try:
         from api.models.library import Library
-        from api.models.user_profile import UserProfile
-        from django.db.models import Q
+        from api.services.generation_history_search_service import build_history_search_filter
         
         # クエリパラメータ
         limit = min(int(request.query_params.get('limit', 50)), 50)  # 最大50件
         search = request.query_params.get('search', '')
-        category_filter = request.query_params.get('category', '')
-        user_filter = request.query_params.get('user', '')
-        rating_filter = request.query_params.get('rating', '')
         
         # 基本クエリセット
-        queryset = Library.objects.select_related().order_by('-timestamp')
+        queryset = Library.objects.order_by('-timestamp')
         
-        # 検索フィルター
-        if search:
-            queryset = queryset.filter(
-                Q(display_prompt__icontains=search) |
-                Q(menu_name__icontains=search) |
-                Q(user_id__icontains=search)
-            )
-        
-        # カテゴリフィルター（カテゴリIDベース）
-        if category_filter:
-            if category_filter == 'illustration':
-                # イラスト作成（category.id = 3）
-                queryset = queryset.filter(
-                    used_form_data__category__id=3
-                )
-            elif category_filter == 'scene_change':
-                # シーン変更（category.id = 1）
-                queryset = queryset.filter(
-                    used_form_data__category__id=1
-                )
-            elif category_filter == 'customization':
-                # カスタマイズ（category.id = 2）
-                queryset = queryset.filter(
-                    used_form_data__category__id=2
-                )
-        
-        # ユーザーフィルター
-        if user_filter:
-            queryset = queryset.filter(user_id__icontains=user_filter)
-        
-        # 評価フィルター
-        if rating_filter:
-            queryset = queryset.filter(rating=rating_filter)
-        
-        # ユーザー情報を取得（件数制限前に実行）
-        user_ids = list(queryset.values_list('user_id', flat=True).distinct())
+        # 検索フィルター（全文検索・トライグラムのインデックスを使用）
+        if search.strip():
+            queryset = queryset.filter(build_history_search_filter(search))
+        
+        queryset = _apply_generation_history_filters(queryset, request)
         
         # 件数制限
-        queryset = queryset[:limit]
-        user_profiles = {
-            profile.frontend_user_id: profile.nickname 
-            for profile in UserProfile.objects.filter(frontend_user_id__in=user_ids)
-        }
-        
-        # レスポンスデータ構築
-        history_list = []
-        for item in queryset:
-            # カテゴリ判定（カテゴリIDベース）
-            category = 'customization'  # デフォルト
-            try:
-                if item.used_form_data:
-                    import json
-                    form_data = json.loads(item.used_form_data) if isinstance(item.used_form_data, str) else item.used_form_data
-                    if isinstance(form_data, dict) and 'category' in form_data:
-                        category_data = form_data['category']
-                        if isinstance(category_data, dict):
-                            category_id = category_data.get('id')
-                            if category_id == 3:
-                                category = 'illustration'
-                            elif category_id == 1:
-                                category = 'scene_change'
-                            elif category_id == 2:
-                                category = 'customization'
-            except:
-                pass
-            
-            history_list.append({
-                'id': str(item.id),
-                'user_id': item.user_id,
-                'user_name': user_profiles.get(item.user_id, 'Unknown User'),
-                'image_url': item.image_url,
-                'display_prompt': item.display_prompt,
-                'menu_name': item.menu_name,
-                'category': category,
-                'rating': item.rating,
-                'is_public': item.is_public,
-                'is_saved_to_library': item.is_saved_to_library,
-                'goods_creation_count': item.goods_creation_count,
-                'created_at': item.created_at.isoformat(),
-                'timestamp': item.timestamp.isoformat()
-            })
+        history_list = _build_generation_history_items(list(queryset[:limit]))
         
         return Response({
             'success': True,
@@ -684,4 +671,54 @@ def get_generation_history_list(request):
         return Response({
             'success': False,
             'error': '生成履歴一覧の取得に失敗しました'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_generation_history(request):
+    """
+    全ユーザーの生成履歴をランキング付きで検索（カーソルページング）
+    - q: 検索語（プロンプト・メニュー名の部分一致、ユーザーIDの部分一致、IDの完全一致）
+    - category / user / rating: 一覧と同じフィルター
+    - cursor / page_size: レスポンスのnextをそのまま辿る
+    """
+    from django.conf import settings
+    from rest_framework.exceptions import NotFound
+    from api.models.library import Library
+    from api.pagination import SearchRankKeysetPagination
+    from api.services.generation_history_search_service import search_generation_history as search_history
+    
+    search = request.query_params.get('q', '')
+    if not search.strip():
+        return Response({
+            'success': False,
+            'error': '検索語（q）を指定してください'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        queryset = _apply_generation_history_filters(Library.objects.all(), request)
+        queryset = search_history(search, queryset)
+        
+        paginator = SearchRankKeysetPagination(
+            page_size=getattr(settings, 'GENERATION_HISTORY_SEARCH_PAGE_SIZE', 20),
+            max_page_size=getattr(settings, 'GENERATION_HISTORY_SEARCH_MAX_PAGE_SIZE', 50),
+        )
+        items = paginator.paginate_queryset(queryset, request)
+        history_list = _build_generation_history_items(items)
+        for entry, item in zip(history_list, items):
+            entry['rank'] = item.rank
+        
+        return Response({
+            'success': True,
+            'history': history_list,
+            'next': paginator.get_next_link(),
+        })
+        
+    except NotFound:
+        raise
+    except Exception as e:
+        logger.error(f"生成履歴検索エラー: {str(e)}")
+        return Response({
+            'success': False,
+            'error': '生成履歴の検索に失敗しました'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -103,13 +103,14 @@ class CarSettingsListCreateView(APIView):
                                 gcs_upload_service.delete_car_setting_image(existing_url)
                             
                             # 新しい画像をアップロード
-                            image_url = gcs_upload_service.upload_car_setting_image(
+                            stored_image = gcs_upload_service.store_car_setting_image(
                                 data[field_name], 
                                 user_id, 
                                 car_id, 
                                 image_type
                             )
-                            setattr(car_settings, existing_url_field, image_url)
+                            setattr(car_settings, existing_url_field, stored_image.url)
+                            car_settings.image_variants = {**(car_settings.image_variants or {}), existing_url_field: stored_image.variants}
                             
                         except Exception as e:
                             logger.error(f"画像アップロードエラー ({field_name}): {e}")
@@ -137,6 +138,9 @@ class CarSettingsListCreateView(APIView):
                                 gcs_upload_service.delete_car_setting_image(existing_url)
                             # URLフィールドをクリア
                             setattr(car_settings, url_field, None)
+                            car_settings.image_variants = {
+                                key: value for key, value in (car_settings.image_variants or {}).items() if key != url_field
+                            }
                             
                         except Exception as e:
                             logger.error(f"画像削除エラー ({delete_field}): {e}")
@@ -226,13 +230,14 @@ class CarSettingsDetailView(APIView):
                             if existing_url:
                                 gcs_upload_service.delete_car_setting_image(existing_url)
                             
-                            image_url = gcs_upload_service.upload_car_setting_image(
+                            stored_image = gcs_upload_service.store_car_setting_image(
                                 data[field_name], 
                                 car_settings.user_id, 
                                 car_settings.car_id, 
                                 image_type
                             )
-                            setattr(car_settings, existing_url_field, image_url)
+                            setattr(car_settings, existing_url_field, stored_image.url)
+                            car_settings.image_variants = {**(car_settings.image_variants or {}), existing_url_field: stored_image.variants}
                             
                         except Exception as e:
                             logger.error(f"画像アップロードエラー ({field_name}): {e}")
@@ -278,6 +283,9 @@ class CarSettingsDetailView(APIView):
                                 # URLフィールドをクリア
                                 logger.info(f"🔄 {url_field}をNullに設定中...")
                                 setattr(car_settings, url_field, None)
+                                car_settings.image_variants = {
+                                    key: value for key, value in (car_settings.image_variants or {}).items() if key != url_field
+                                }
                                 logger.info(f"✅ {url_field}をNullに設定しました")
                                 
                             except Exception as e:
@@ -6,10 +6,16 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.db import transaction
 
+from api.conditional import conditional_get, table_version_validators
 from api.models.category import Category
+from api.models.table_version import TableVersion
 from api.serializers.category import CategorySerializer
 
 
+def _categories_validators(request, **kwargs):
+    return table_version_validators('categories')
+
+
 class CategoryViewSet(ModelViewSet):
     queryset = Category.objects.all()  # どのデータを対象にするか
     serializer_class = CategorySerializer
@@ -19,6 +25,15 @@ class CategoryViewSet(ModelViewSet):
     ordering_fields = ['name', 'order_index']   # 並び替え
     search_fields = ['name']     # 部分一致検索
 
+    # 一覧・詳細は変更がなければ304を返す（SPAのポーリング対策）
+    @conditional_get(_categories_validators, cache_control='public, max-age=60')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(_categories_validators, cache_control='public, max-age=60')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=['post'])
     def update_order(self, request):
         """
@@ -44,6 +59,8 @@ class CategoryViewSet(ModelViewSet):
                         Category.objects.filter(id=category_id).update(
                             order_index=order_index
                         )
+                # update()はシグナルが発行されないためバージョンを明示的に加算
+                TableVersion.bump('categories')
             
             return Response(
                 {'message': 'カテゴリの順番を更新しました'}, 
@@ -3,6 +3,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.generics import ListCreateAPIView, DestroyAPIView
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.db.models import Q
 import logging
 
@@ -73,13 +74,15 @@ class CommentListCreateView(ListCreateAPIView):
             # コメント作成用シリアライザーでバリデーション
             serializer = CommentCreateSerializer(data=request.data)
             if serializer.is_valid():
-                # コメントを作成
-                comment = Comment.objects.create(
-                    library=library,
-                    user_id=user_id,
-                    user_name=user_name,
-                    content=serializer.validated_data['content']
-                )
+                # コメントを作成（コメント数も同じトランザクションで加算）
+                with transaction.atomic():
+                    comment = Comment.objects.create(
+                        library=library,
+                        user_id=user_id,
+                        user_name=user_name,
+                        content=serializer.validated_data['content']
+                    )
+                    Library.adjust_comment_count(1, library_id=library.id)
                 
                 # レスポンス用シリアライザーで返却
                 response_serializer = CommentSerializer(comment)
@@ -132,7 +135,11 @@ class CommentDeleteView(DestroyAPIView):
                 user_id=user_id
             )
             
-            comment.delete()
+            with transaction.atomic():
+                # 同時に削除された場合に二重に減算しないよう、実際に削除できた件数で減算
+                deleted, _ = Comment.objects.filter(id=comment.id).delete()
+                if deleted:
+                    Library.adjust_comment_count(-deleted, library_id=library.id)
             logger.info(f"コメント削除成功: comment_id={comment_id}, user_id={user_id}")
             
             return Response(
@@ -174,15 +181,18 @@ class LikeToggleView(APIView):
             # ライブラリの存在確認
             library = get_object_or_404(Library, frontend_id=frontend_id)
             
-            # 既存のいいねを確認
-            existing_like = Like.objects.filter(
-                library=library, 
-                user_id=user_id
-            ).first()
+            # 既存のいいねがあれば解除、なければ追加（いいね数も同じトランザクションで加減算）
+            with transaction.atomic():
+                deleted, _ = Like.objects.filter(library=library, user_id=user_id).delete()
+                if deleted:
+                    Library.adjust_like_count(library.id, -deleted)
+                else:
+                    Like.objects.create(library=library, user_id=user_id)
+                    Library.adjust_like_count(library.id, 1)
+            library.refresh_from_db(fields=['like_count'])
             
-            if existing_like:
+            if deleted:
                 # いいね解除
-                existing_like.delete()
                 logger.info(f"いいね解除: frontend_id={frontend_id}, user_id={user_id}")
                 return Response(
                     {
@@ -194,7 +204,6 @@ class LikeToggleView(APIView):
                 )
             else:
                 # いいね追加
-                Like.objects.create(library=library, user_id=user_id)
                 logger.info(f"いいね追加: frontend_id={frontend_id}, user_id={user_id}")
                 return Response(
                     {
@@ -0,0 +1,45 @@
+import logging
+
+from rest_framework import status
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.models.generation_job import GenerationJob
+from api.serializers.generation_job import GenerationJobSerializer
+from api.services.generation_job_service import expire_stale_job, wait_for_job
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationJobDetailView(APIView):
+    """
+    生成ジョブの状態確認（user_idが一致するジョブのみ。他ユーザーのジョブは404）
+    GET /api/generation-jobs/{job_id}/?user_id=... - 進捗と結果（生成画像URL）を取得
+    GET /api/generation-jobs/{job_id}/?user_id=...&wait=5 - 完了まで最大5秒待機（ロングポーリング。上限はGENERATION_JOB_LONG_POLL_MAX_SECONDS）
+    """
+
+    def get(self, request, job_id):
+        user_id = request.query_params.get('user_id')
+        if not user_id:
+            return Response(
+                {'error': 'user_idが必要です'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        job = get_object_or_404(GenerationJob, pk=job_id, user_id=user_id)
+
+        try:
+            wait_seconds = float(request.query_params.get('wait', 0))
+        except ValueError:
+            return Response(
+                {'error': 'waitは秒数で指定してください'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if wait_seconds > 0:
+            job = wait_for_job(job, wait_seconds)
+        else:
+            job = expire_stale_job(job)
+
+        serializer = GenerationJobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_200_OK)
@@ -0,0 +1,43 @@
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from api.services.generation_run_service import get_stage_percentiles
+
+logger = logging.getLogger(__name__)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_generation_run_percentiles(request):
+    """
+    管理者用：エンジン・ステージ別の所要時間（p50/p95/p99）を取得
+    generation_runsの直近hours時間分（デフォルト24時間）を集計。engineで絞り込み可能
+    """
+    try:
+        hours = int(request.query_params.get('hours', 24))
+    except ValueError:
+        return Response({
+            'success': False,
+            'error': 'hoursは整数で指定してください'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    engine = request.query_params.get('engine') or None
+
+    try:
+        since = timezone.now() - timedelta(hours=hours)
+        return Response({
+            'success': True,
+            'since': since,
+            'percentiles': get_stage_percentiles(since, engine),
+        })
+    except Exception as e:
+        logger.error(f"生成ステージ計測値取得エラー: {str(e)}")
+        return Response({
+            'success': False,
+            'error': '生成ステージ計測値の取得に失敗しました'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
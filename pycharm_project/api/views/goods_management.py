@@ -3,6 +3,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from api.conditional import conditional_get, queryset_validators
 from api.models.goods_management import GoodsManagement
 from api.serializers.goods_management import (
     GoodsManagementSerializer,
@@ -205,6 +206,10 @@ def sync_suzuri_items(request):
 
 @api_view(['GET'])
 # @permission_classes([IsAuthenticated, IsAdminUser])  # 一時的に認証を無効化
+@conditional_get(
+    lambda request, **kwargs: queryset_validators(GoodsManagement.objects.filter(is_public=True)),
+    cache_control='public, max-age=60',
+)
 def public_goods_list(request):
     """
     公開グッズ一覧を取得（フロントエンド用）
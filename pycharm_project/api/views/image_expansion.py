@@ -1,6 +1,5 @@
 import logging
 import uuid
-import requests
 from datetime import datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -10,6 +9,10 @@ from rest_framework.decorators import api_view
 from api.models.library import Library
 from api.services.clipdrop_service import ClipdropService
 from api.services.gcs_upload_service import GCSUploadService
+from api.services.circuit_breaker import UpstreamUnavailable
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.http_client import http_client
+from api.services.rehost_service import schedule_variants
 from api.serializers.library import LibrarySerializer
 from api.serializers.image_expansion import ImageExpansionRequestSerializer
 import os
@@ -27,6 +30,8 @@ class ImageExpansionView(APIView):
         """
         画像拡張を実行
         """
+        # リクエスト全体の時間予算（Clipdrop・画像取得の各呼び出しを残り時間で制限）
+        deadline = Deadline.for_request()
         try:
             # リクエストデータのバリデーション
             serializer = ImageExpansionRequestSerializer(data=request.data)
@@ -63,7 +68,7 @@ class ImageExpansionView(APIView):
                 # 実際のClipdrop APIを使用
                 logger.info("実際のClipdrop APIで画像拡張を実行します")
                 try:
-                    clipdrop_service = ClipdropService()
+                    clipdrop_service = ClipdropService(deadline=deadline)
                     expanded_image_data = clipdrop_service.expand_image(
                         image_url=original_image.image_url,  # urlではなくimage_url
                         anchor_position=anchor_position
@@ -72,11 +77,14 @@ class ImageExpansionView(APIView):
                     message = '画像拡張が完了しました'
                     menu_name = "背景拡張"
                     display_prefix = "背景拡張"
+                except DeadlineExceeded:
+                    raise
                 except Exception as e:
+                    # サーキットオープン（UpstreamUnavailable）の場合もここで即座にフォールバック
                     logger.error(f"Clipdrop API エラー: {e}")
                     # Clipdrop APIエラーの場合はモック実装にフォールバック
                     logger.info("Clipdrop APIエラーのため、モック実装を使用します")
-                    response = requests.get(original_image.image_url, timeout=30)  # urlではなくimage_url
+                    response = http_client.get(original_image.image_url, timeout=30, deadline=deadline)  # urlではなくimage_url
                     if response.status_code != 200:
                         return Response(
                             {'error': '元画像の取得に失敗しました'}, 
@@ -90,7 +98,7 @@ class ImageExpansionView(APIView):
             else:
                 # モック実装: 画像拡張をシミュレート（実際には元画像を使用）
                 logger.info("Clipdrop APIキーが設定されていないため、モック実装を使用します")
-                response = requests.get(original_image.image_url, timeout=30)  # urlではなくimage_url
+                response = http_client.get(original_image.image_url, timeout=30, deadline=deadline)  # urlではなくimage_url
                 if response.status_code != 200:
                     return Response(
                         {'error': '元画像の取得に失敗しました'}, 
@@ -106,12 +114,14 @@ class ImageExpansionView(APIView):
             new_frontend_id = str(uuid.uuid4().int)[:16]  # 16桁のfrontend_id生成
             
             gcs_service = GCSUploadService()
-            expanded_image_url = gcs_service.upload_image_from_bytes(
+            expanded_image = gcs_service.store_image_from_bytes(
                 image_data=expanded_image_data,
                 user_id=user_id,
                 frontend_id=new_frontend_id,
-                file_extension='.jpg'
+                file_extension='.jpg',
+                with_variants=False,  # 派生画像は保存後にバックグラウンドで作成
             )
+            expanded_image_url = expanded_image.url
             
             # 元の画像のカテゴリ・メニュー情報を取得
             original_form_data = request.data.get('original_form_data', {})
@@ -144,6 +154,7 @@ class ImageExpansionView(APIView):
                 user_id=user_id,
                 frontend_id=new_frontend_id,
                 image_url=expanded_image_url,  # url → image_url に修正
+                image_size_bytes=expanded_image.size,
                 display_prompt=f"{display_prefix}: {original_image.display_prompt or '元画像'}",
                 menu_name=menu_name,
                 used_form_data=used_form_data,
@@ -154,6 +165,7 @@ class ImageExpansionView(APIView):
                 is_saved_to_library=False  # デフォルトはライブラリ保存なし
             )
             
+            schedule_variants([expanded_entry.id])
             logger.info(f"画像拡張完了: 新しいエントリ作成 frontend_id={new_frontend_id}")
             
             # レスポンス用にシリアライズ
@@ -169,6 +181,9 @@ class ImageExpansionView(APIView):
                 status=status.HTTP_201_CREATED
             )
             
+        except (UpstreamUnavailable, DeadlineExceeded):
+            # DRFの例外ハンドラで503/504として返却
+            raise
         except ValueError as e:
             logger.error(f"画像拡張エラー (ValueError): {e}")
             return Response(
@@ -3,12 +3,25 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.db.models import Q
 import logging
 
 from api.models.library import Library
-from api.serializers.library import LibrarySerializer, LibraryCreateUpdateSerializer
+from api.pagination import TimelineKeysetPagination
+from api.conditional import Validators, conditional_get
+from api.services.public_feed_service import get_public_feed_page, get_public_feed_version
+from api.serializers.library import (
+    LibrarySerializer,
+    LibraryCreateUpdateSerializer,
+    TimelineBulkSerializer,
+    TimelineBulkUpdateSerializer,
+)
 from api.services.gcs_upload_service import gcs_upload_service
+from api.services.rehost_service import (
+    is_gcs_url, is_write_behind, pending_rehost_fields, schedule_rehost, schedule_variants,
+)
+from api.services.timeline_bulk_service import bulk_delete_timeline, bulk_update_timeline, schedule_image_deletion
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +29,11 @@ logger = logging.getLogger(__name__)
 class TimelineListCreateView(ListCreateAPIView):
     """
     タイムラインの一覧取得・作成
-    GET /api/timeline/ - ユーザーのタイムライン一覧を取得
+    GET /api/timeline/ - ユーザーのタイムライン一覧を取得（page_size / cursor指定時はページ単位）
     POST /api/timeline/ - タイムラインに画像を保存（生成時）
     """
     serializer_class = LibrarySerializer
+    pagination_class = TimelineKeysetPagination
     
     def get_queryset(self):
         """
@@ -27,6 +41,9 @@ class TimelineListCreateView(ListCreateAPIView):
         フィルタオプション：
         - saved_only=true: ライブラリ保存済みのみ
         - public_only=true: 公開画像のみ
+        ページネーション（TimelineKeysetPagination）：
+        - page_size=N: 1ページの件数（最新から）
+        - cursor=...: レスポンスのnext / previousのカーソル
         """
         user_id = self.request.query_params.get('user_id')
         saved_only = self.request.query_params.get('saved_only', 'false').lower() == 'true'
@@ -43,8 +60,8 @@ class TimelineListCreateView(ListCreateAPIView):
         if public_only:
             queryset = queryset.filter(is_public=True)
         
-        # prefetch_related でコメント・いいねを効率的に取得（N+1クエリ問題を解決）
-        return queryset.prefetch_related('comments', 'likes').order_by('-timestamp')
+        # コメント・いいね数はLibraryのカウンタ列を参照するため追加のクエリは不要
+        return queryset.order_by('-timestamp')
     
     def post(self, request, *args, **kwargs):
         """
@@ -85,7 +102,14 @@ class TimelineListCreateView(ListCreateAPIView):
                 original_image_url = validated_data.get('image_url')
                 frontend_id = validated_data.get('frontend_id')
                 
-                if original_image_url and frontend_id:
+                write_behind = bool(
+                    original_image_url and frontend_id and is_write_behind() and not is_gcs_url(original_image_url)
+                )
+                if write_behind:
+                    # write-behind: 元のURLで保存してすぐに返却し、GCS再ホストはバックグラウンドで行う
+                    logger.info("📨 GCS再ホストはバックグラウンドで実行します")
+                    validated_data.update(pending_rehost_fields(original_image_url))
+                elif original_image_url and frontend_id:
                     logger.info(f"🖼️ === ライブラリ画像GCSアップロード開始 ===")
                     logger.info(f"📤 original_image_url: {original_image_url}")
                     logger.info(f"👤 user_id: {user_id}")
@@ -99,14 +123,17 @@ class TimelineListCreateView(ListCreateAPIView):
                     try:
                         # 画像をGCPにアップロード
                         logger.info("☁️ GCS Upload Service呼び出し開始...")
-                        gcp_image_url = gcs_upload_service.upload_generated_image_from_url(
+                        stored_image = gcs_upload_service.store_generated_image_from_url(
                             original_image_url, 
                             user_id, 
-                            frontend_id
+                            frontend_id,
+                            with_variants=False,  # 派生画像は保存後にバックグラウンドで作成
                         )
+                        gcp_image_url = stored_image.url
                         
                         # GCPのURLで置き換え
                         validated_data['image_url'] = gcp_image_url
+                        validated_data['image_size_bytes'] = stored_image.size
                         logger.info(f"✅ ライブラリ画像GCSアップロード成功!")
                         logger.info(f"🔗 gcp_image_url: {gcp_image_url}")
                         
@@ -132,6 +159,10 @@ class TimelineListCreateView(ListCreateAPIView):
                 
                 # タイムラインエントリを作成
                 timeline_entry = Library.objects.create(**validated_data)
+                if write_behind:
+                    schedule_rehost(timeline_entry.id)
+                elif is_gcs_url(timeline_entry.image_url):
+                    schedule_variants([timeline_entry.id])
                 
                 # レスポンス用のシリアライザーで返却
                 response_serializer = LibrarySerializer(timeline_entry)
@@ -169,10 +200,9 @@ class TimelineDetailView(RetrieveUpdateDestroyAPIView):
             return Library.objects.none()
         
         # 自分のタイムラインまたは公開されたタイムラインのみアクセス可能
-        # prefetch_related でコメント・いいねを効率的に取得（N+1クエリ問題を解決）
         return Library.objects.filter(
             Q(user_id=user_id) | Q(is_public=True)
-        ).prefetch_related('comments', 'likes')
+        )
     
     def put(self, request, *args, **kwargs):
         """
@@ -247,18 +277,10 @@ class TimelineDetailView(RetrieveUpdateDestroyAPIView):
                 user_id=user_id
             )
             
-            # GCPから画像を削除
-            image_url = timeline_entry.image_url
-            if image_url and 'storage.googleapis.com' in image_url:
-                try:
-                    logger.info(f"🗑️ GCP画像削除開始: {image_url}")
-                    delete_result = gcs_upload_service.delete_generated_image(image_url)
-                    logger.info(f"🗑️ GCP画像削除結果: {delete_result}")
-                except Exception as gcp_error:
-                    logger.error(f"❌ GCP画像削除エラー: {gcp_error}")
-                    # GCP削除に失敗してもデータベースからは削除
-            
-            timeline_entry.delete()
+            with transaction.atomic():
+                timeline_entry.delete()
+                # GCPの画像はコミット後にバックグラウンドで削除（失敗してもデータベースからは削除済み）
+                schedule_image_deletion([timeline_entry.image_url])
             logger.info(f"✅ タイムライン削除成功: frontend_id={frontend_id}, user_id={user_id}")
             
             return Response(status=status.HTTP_204_NO_CONTENT)
@@ -276,25 +298,81 @@ class TimelineDetailView(RetrieveUpdateDestroyAPIView):
             )
 
 
+class TimelineBulkUpdateView(APIView):
+    """
+    タイムラインの一括更新
+    POST /api/timeline/bulk-update/ - 複数のエントリのライブラリフラグ・公開設定・評価をまとめて更新
+    """
+    
+    def post(self, request):
+        serializer = TimelineBulkUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = dict(serializer.validated_data)
+        user_id = data.pop('user_id')
+        frontend_ids = data.pop('ids')
+        try:
+            updated_ids = bulk_update_timeline(user_id, frontend_ids, data)
+        except Exception as e:
+            logger.error(f"タイムライン一括更新エラー: {e}")
+            return Response(
+                {'error': 'タイムラインの一括更新に失敗しました'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response({
+            'ids': updated_ids,
+            'notFoundIds': sorted(set(frontend_ids) - set(updated_ids)),
+        }, status=status.HTTP_200_OK)
+
+
+class TimelineBulkDeleteView(APIView):
+    """
+    タイムラインの一括削除
+    POST /api/timeline/bulk-delete/ - 複数のエントリをまとめて削除（GCP画像はコミット後にまとめて削除）
+    """
+    
+    def post(self, request):
+        serializer = TimelineBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        user_id = serializer.validated_data['user_id']
+        frontend_ids = serializer.validated_data['ids']
+        try:
+            deleted_ids = bulk_delete_timeline(user_id, frontend_ids)
+        except Exception as e:
+            logger.error(f"タイムライン一括削除エラー: {e}")
+            return Response(
+                {'error': 'タイムラインの一括削除に失敗しました'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response({
+            'ids': deleted_ids,
+            'notFoundIds': sorted(set(frontend_ids) - set(deleted_ids)),
+        }, status=status.HTTP_200_OK)
+
+
 class PublicTimelineListView(APIView):
     """
     公開タイムラインの取得（公開画像表示用）
-    GET /api/timeline/public/ - 公開されているタイムライン一覧を取得
+    GET /api/timeline/public/ - 公開されているタイムライン一覧を取得（page_size / cursor指定時はページ単位）
     """
     
+    @conditional_get(
+        lambda request, **kwargs: Validators(etag=f"public_feed.{get_public_feed_version()}"),
+        cache_control='public, max-age=10',
+    )
     def get(self, request):
         """
         公開されているタイムライン一覧を取得
+        事前計算済みの公開タイムライン（PublicFeedEntry）をバージョン付きキャッシュ経由で返す
         """
         try:
-            # 公開設定されているタイムラインのみ取得
-            # prefetch_related でコメント・いいねを効率的に取得（N+1クエリ問題を解決）
-            public_timeline = Library.objects.filter(
-                is_public=True
-            ).prefetch_related('comments', 'likes').order_by('-timestamp')[:50]  # 最新50件
-            
-            serializer = LibrarySerializer(public_timeline, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            data = get_public_feed_page(request, TimelineKeysetPagination())
+            return Response(data, status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"公開タイムライン取得エラー: {e}")
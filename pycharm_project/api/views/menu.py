@@ -6,12 +6,18 @@ from rest_framework.response import Response
 from rest_framework import status
 import logging
 
+from api.conditional import conditional_get, table_version_validators
 from api.models.menu import Menu
+from api.models.table_version import TableVersion
 from api.serializers.menu import MenuSerializer
 
 logger = logging.getLogger(__name__)
 
 
+def _menus_validators(request, **kwargs):
+    return table_version_validators('menus')
+
+
 class MenuViewSet(ModelViewSet):
     queryset = Menu.objects.all()  # どのデータを対象にするか
     serializer_class = MenuSerializer
@@ -26,6 +32,15 @@ class MenuViewSet(ModelViewSet):
         """表示順序でソートされたクエリセットを返す"""
         return Menu.objects.all().order_by('display_order', 'id')
     
+    # 一覧・詳細は変更がなければ304を返す（SPAのポーリング対策）
+    @conditional_get(_menus_validators, cache_control='public, max-age=60')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional_get(_menus_validators, cache_control='public, max-age=60')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=False, methods=['post'])
     def update_order(self, request):
         """メニューの表示順序を一括更新"""
@@ -49,6 +64,9 @@ class MenuViewSet(ModelViewSet):
                     Menu.objects.filter(id=menu_id).update(display_order=display_order)
                     logger.info(f"✅ メニューID {menu_id} の順序を {display_order} に更新")
             
+            # update()はシグナルが発行されないためバージョンを明示的に加算
+            TableVersion.bump('menus')
+            
             logger.info(f"✅ メニュー順序更新完了: {len(menu_orders)}件")
             
             return Response(
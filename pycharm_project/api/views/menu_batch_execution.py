@@ -0,0 +1,101 @@
+import json
+import logging
+
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from api.models.library import Library
+from api.serializers.menu_execution.batch_request import MenuBatchExecutionRequestSerializer
+from api.services.batch_execution_service import BatchExecution
+from api.services.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Accept: application/x-ndjson をコンテントネゴシエーションで受け付けるためのレンダラー
+    ストリーミング以外の応答（バリデーションエラー・409等）は1行のJSONとして返す
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode(self.charset)
+
+
+def _wants_stream(request) -> bool:
+    """
+    itemごとに完了順でストリーミング返却するか
+    - クエリパラメータ ?stream=true
+    - Accept: application/x-ndjson ヘッダー（NDJSONRendererが選ばれた場合）
+    """
+    if request.query_params.get('stream', 'false').lower() == 'true':
+        return True
+    return isinstance(getattr(request, 'accepted_renderer', None), NDJSONRenderer)
+
+
+class MenuBatchExecutionView(APIView):
+    """
+    複数メニュー・複数枚の一括生成
+    POST /api/batch-execute/
+      items: [{menu_id, prompt_variables, num_images, ...}, ...]（multipart/form-dataの場合はJSON文字列）
+      image: 全itemで共有する入力画像（任意）
+    ストリーミング時はNDJSONで1行ずつ（item完了順）返し、最後に {"type": "done"} を返す
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    def post(self, request):
+        deadline = Deadline.for_request()
+
+        serializer = MenuBatchExecutionRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        validated_data = serializer.validated_data
+
+        user_id = request.data.get('user_id', 'anonymous')
+        author_name = request.data.get('author_name', '')
+        logger.info(f"📦 バッチ生成開始: user_id={user_id}, items={len(validated_data['items'])}")
+
+        batch = BatchExecution(
+            validated_data['items'],
+            validated_data.get('image'),
+            user_id,
+            author_name,
+            deadline=deadline,
+        )
+
+        # クライアントの再送等で既に保存済みのfrontend_idがあれば生成前に拒否（生成・再ホストを無駄にしない）
+        existing_ids = list(
+            Library.objects.filter(user_id=user_id, frontend_id__in=batch.requested_frontend_ids)
+            .values_list('frontend_id', flat=True)
+        )
+        if existing_ids:
+            return Response(
+                {"error": "既に保存済みのfrontend_idが含まれています。", "frontendIds": existing_ids},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        if _wants_stream(request):
+            def stream():
+                for result in batch.iter_results():
+                    yield json.dumps(result, ensure_ascii=False) + '\n'
+                yield json.dumps({
+                    "type": "done",
+                    "saved": batch.saved_count,
+                    "skippedFrontendIds": batch.skipped_frontend_ids,
+                }) + '\n'
+
+            return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+        results = sorted(batch.iter_results(), key=lambda result: result["index"])
+        return Response(
+            data={"results": results, "saved": batch.saved_count, "skippedFrontendIds": batch.skipped_frontend_ids},
+            status=status.HTTP_200_OK,
+        )
@@ -1,117 +1,199 @@
 import logging
-import uuid
-import os
+from urllib.parse import urlencode
 
+from django.conf import settings
+from django.urls import reverse
+from rest_framework import status
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from api.models.menu import Menu
-from api.models.library import Library
 from api.serializers.menu_execution.request import MenuExecutionRequestSerializer
-from api.serializers.menu_execution.response import MenuExecutionResponseSerializer
+from api.services.menu_execution_service import build_serializable_form_data, run_menu_execution
+from api.services.generation_job_service import (
+    create_generation_job,
+    fail_job,
+    find_idempotent_job,
+    finish_job,
+    submit_generation_job,
+    wait_for_job,
+)
+from api.services.deadline import Deadline
+from api.services.generation_run_service import record_generation_run
+from api.services.stage_timer import StageTimer, record_stage
 from api.services.unified_credit_service import UnifiedCreditService
-from api.services.tsukuruma_api_execution import generate_or_edit
-from api.services.gcs_upload_service import gcs_upload_service
-from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
 
+def _is_async_request(request) -> bool:
+    """
+    非同期実行モードかどうか
+    - クエリパラメータ ?async=true
+    - Prefer: respond-async ヘッダー
+    """
+    if request.query_params.get('async', 'false').lower() == 'true':
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def _is_charge_request(request) -> bool:
+    """
+    実行と同時にクレジットを消費するかどうか（?charge=true）
+    指定時はMenu.creditを仮押さえし、生成成功で確定・失敗で解放する
+    """
+    return request.query_params.get('charge', 'false').lower() == 'true'
+
+
+def _get_idempotency_key(request, frontend_id) -> str | None:
+    """
+    冪等性キーを取得
+    - Idempotency-Key ヘッダー
+    - 未指定時はfrontend_id（Libraryの(user_id, frontend_id)と同じ単位で重複実行を防ぐ）
+    """
+    return request.headers.get('Idempotency-Key') or frontend_id or None
+
+
+def _accepted_response(job):
+    # ジョブの状態確認は作成したユーザーに限るため、user_idを付けて返す
+    status_url = reverse('generation-job-detail', kwargs={'job_id': job.id})
+    return Response(
+        data={
+            "jobId": str(job.id),
+            "status": job.status,
+            "statusUrl": f"{status_url}?{urlencode({'user_id': job.user_id})}",
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
 class MenuExecutionView(APIView):
     # NOTE menu_idはURLから取得
     def post(self, request, menu_id):
+        # ステージ別の所要時間を計測してServer-Timingヘッダーで返す
+        timer = StageTimer()
+        with timer.activate():
+            response = self._post(request, menu_id)
+        response['Server-Timing'] = timer.server_timing()
+        return response
+
+    def _post(self, request, menu_id):
+        # リクエスト全体の時間予算（以降の外部呼び出しは残り時間のみ使用する）
+        deadline = Deadline.for_request()
+
         # 指定されたIDのMenuモデルのインスタンスを取得
         instance = get_object_or_404(Menu, pk=menu_id)
 
+        # ユーザーIDを取得
+        user_id = request.data.get('user_id', 'anonymous')
+
         # リクエストパラメータ取得
-        serializer = MenuExecutionRequestSerializer(data=request.data, context={"menu_id": menu_id})
-        serializer.is_valid(raise_exception=True)
+        with record_stage('validate'):
+            serializer = MenuExecutionRequestSerializer(
+                data=request.data,
+                context={"menu_id": menu_id, "menu": instance, "user_id": user_id},
+            )
+            serializer.is_valid(raise_exception=True)
         validated_data = serializer.validated_data
         logger.info(f"request parameters: {validated_data}")
 
-        # ユーザーIDを取得
-        user_id = request.data.get('user_id', 'anonymous')
-        
-        # クレジット消費処理を削除 - フロントエンドで管理するため
-        logger.info(f"💳 クレジット消費はフロントエンドで管理: user_id={user_id}")
-
-        # ビジネスロジック
-        result, prompt_formatted = generate_or_edit(instance, **validated_data)
-
-        # レスポンスパラメータ整形
-        if result.success:
-            response_data = {**result.data, "prompt_formatted": prompt_formatted}
-            
-            # フロントエンドから送信されたデータを取得
-            original_image_url = response_data.get("image_presigned_url_1")
-            frontend_id = request.data.get('frontend_id')  # フロントエンドから送信されたfrontend_id
-            
-            if original_image_url and user_id and frontend_id:
-                try:
-                    logger.info(f"📚 === Libraryテーブルへの保存開始 ===")
-                    logger.info(f"📤 original_image_url (S3): {original_image_url}")
-                    logger.info(f"👤 user_id: {user_id}")
-                    logger.info(f"🆔 frontend_id: {frontend_id}")
-                    
-                    # まずGCSにアップロード
-                    logger.info("☁️ GCS Upload Service呼び出し開始...")
-                    gcp_image_url = gcs_upload_service.upload_generated_image_from_url(
-                        original_image_url, 
-                        user_id, 
-                        frontend_id
-                    )
-                    logger.info(f"✅ GCSアップロード成功: {gcp_image_url}")
-                    
-                    # フォームデータをシリアライズ可能な形式に変換
-                    serializable_form_data = {}
-                    for key, value in request.data.items():
-                        if hasattr(value, 'read'):  # ファイルの場合
-                            serializable_form_data[key] = f"<uploaded_file: {getattr(value, 'name', 'unknown')}>"
-                        else:
-                            serializable_form_data[key] = value
-                    
-                    # Libraryテーブルに保存
-                    library_entry = Library.objects.create(
-                        user_id=user_id,
-                        frontend_id=frontend_id,
-                        image_url=gcp_image_url,  # GCSのURL
-                        display_prompt=prompt_formatted,
-                        menu_name=instance.name,
-                        used_form_data=serializable_form_data,  # シリアライズ可能なデータ
-                        rating=None,
-                        is_public=False,
-                        author_name=request.data.get('author_name', ''),
-                        is_saved_to_library=False,  # 生成時は自動的にfalse
-                        timestamp=timezone.now()  # タイムゾーン対応の現在時刻
-                    )
-                    
-                    # GCSのURLをレスポンスに設定
-                    response_data["image_presigned_url_1"] = gcp_image_url
-                    logger.info(f"✅ Libraryテーブル保存成功 - ID: {library_entry.id}")
-                    logger.info(f"🔗 返却するGCS URL: {gcp_image_url}")
-                    
-                except Exception as error:
-                    logger.error(f"❌ === Library保存エラー ===")
-                    logger.error(f"💥 エラータイプ: {type(error).__name__}")
-                    logger.error(f"💥 エラーメッセージ: {str(error)}")
-                    logger.error(f"💥 エラー詳細: {error}")
-                    
-                    # エラーでも元のS3 URLを使用
-                    logger.info("⚠️ エラーのため元のS3 URLを使用します")
-            else:
-                missing = []
-                if not original_image_url:
-                    missing.append("image_url")
-                if not frontend_id:
-                    missing.append("frontend_id")
-                if not user_id:
-                    missing.append("user_id")
-                logger.warning(f"⚠️ 必要な情報が不足: {', '.join(missing)}")
-            
-            response_data = MenuExecutionResponseSerializer(instance=response_data).data
+        frontend_id = request.data.get('frontend_id')  # フロントエンドから送信されたfrontend_id
+        author_name = request.data.get('author_name', '')
+        form_data = build_serializable_form_data(request.data)
+
+        is_async = _is_async_request(request)
+
+        # 同じ冪等性キーのリクエストは再生成せず、保存済みの結果を返す or 実行中のジョブに合流する
+        idempotency_key = _get_idempotency_key(request, frontend_id)
+        if idempotency_key:
+            job = find_idempotent_job(user_id, idempotency_key)
+            if job is not None:
+                return self._replay(job, menu_id, is_async, deadline)
+
+        # ?charge=true: クレジットを仮押さえしてから実行（未指定時はフロントエンドで消費を管理）
+        reservation_id = None
+        if _is_charge_request(request):
+            reservation, message = UnifiedCreditService.reserve_credits(user_id, instance.credit, menu_id=instance.id)
+            if reservation is None:
+                return Response({"error": message}, status=status.HTTP_402_PAYMENT_REQUIRED)
+            reservation_id = reservation.id
         else:
-            response_data = {"error": result.error}
-        logger.info(f"response data: {response_data}")
+            logger.info(f"💳 クレジット消費はフロントエンドで管理: user_id={user_id}")
+
+        # 非同期モード: ジョブを登録してすぐに返却（結果は /generation-jobs/<id>/ でポーリング）
+        if is_async:
+            try:
+                job = submit_generation_job(
+                    instance, validated_data, form_data, user_id, frontend_id, author_name, idempotency_key,
+                    reservation_id=reservation_id,
+                )
+            except Exception:
+                UnifiedCreditService.settle_reservation(reservation_id, status.HTTP_500_INTERNAL_SERVER_ERROR)
+                raise
+            return _accepted_response(job)
+
+        # 同期モード: 冪等性キーがあれば実行中の目印としてジョブを作成してから実行
+        job = None
+        if idempotency_key:
+            job, created = create_generation_job(
+                instance, form_data, user_id, frontend_id, idempotency_key, status='running'
+            )
+            if not created:
+                UnifiedCreditService.settle_reservation(reservation_id, status.HTTP_409_CONFLICT)
+                return self._replay(job, menu_id, is_async, deadline)
+
+        try:
+            status_code, response_data = run_menu_execution(
+                instance,
+                validated_data,
+                form_data,
+                user_id,
+                frontend_id,
+                author_name,
+                deadline=deadline,
+            )
+        except Exception as e:
+            if job:
+                fail_job(job.id, e)
+            UnifiedCreditService.settle_reservation(reservation_id, getattr(e, 'status_code', 500))
+            record_generation_run(instance, user_id, 'sync', getattr(e, 'status_code', 500))
+            raise
+        UnifiedCreditService.settle_reservation(reservation_id, status_code, f"メニュー実行: {instance.name}")
+        if job:
+            finish_job(job.id, status_code, response_data)
+        record_generation_run(instance, user_id, 'sync', status_code)
+        response = Response(data=response_data, status=status_code)
+        if reservation_id is not None:
+            response['X-Credit-Balance'] = str(UnifiedCreditService.get_user_credits(user_id))
+        return response
+
+    def _replay(self, job, menu_id, is_async, deadline):
+        """冪等性キーが一致した既存ジョブの結果を返す"""
+        if job.menu_id != menu_id:
+            return Response(
+                {"error": "Idempotency-Keyが別のメニュー実行で使用されています。"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        logger.info(f"🔁 冪等性キーに一致するジョブを再利用: job_id={job.id}, status={job.status}")
+
+        if is_async:
+            return _accepted_response(job)
 
-        return Response(data=response_data, status=result.status_code)
+        # 実行中なら短時間だけ完了を待つ（ワーカーを占有し続けないよう、間に合わなければ202でポーリング先を返す）
+        if not job.is_finished:
+            job = wait_for_job(
+                job,
+                deadline.remaining() - 1,
+                max_wait=getattr(settings, 'GENERATION_JOB_REPLAY_WAIT_SECONDS', 3),
+            )
+        if not job.is_finished:
+            return _accepted_response(job)
+        if job.status == 'failed':
+            return Response(
+                data={"error": job.error_message},
+                status=job.status_code or status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        response = Response(data=job.result, status=job.status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
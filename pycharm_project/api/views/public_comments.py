@@ -2,6 +2,7 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 import logging
 
 from api.models import Library, PublicComment, Comment
@@ -77,7 +78,10 @@ class PublicCommentsView(APIView):
             
             serializer = PublicCommentSerializer(data=data)
             if serializer.is_valid():
-                serializer.save()
+                # コメント数も同じトランザクションで加算
+                with transaction.atomic():
+                    serializer.save()
+                    Library.adjust_comment_count(1, frontend_id=frontend_id)
                 logger.info(f"コメント投稿: frontend_id={frontend_id}, author={data.get('author_name')}")
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             
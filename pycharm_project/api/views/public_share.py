@@ -4,12 +4,19 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 import logging
 
+from api.conditional import conditional_get, queryset_validators
 from api.models.library import Library
 from api.serializers.library import LibrarySerializer
 
 logger = logging.getLogger(__name__)
 
 
+def _share_validators(request, frontend_id, **kwargs):
+    """公開画像の更新日時から検証子を作る（見つからない場合はNoneで通常処理 → 404）"""
+    validators = queryset_validators(Library.objects.filter(frontend_id=frontend_id, is_public=True))
+    return validators if validators.last_modified else None
+
+
 class PublicTimelineShareView(APIView):
     """
     公開共有用のタイムライン詳細取得（認証不要）
@@ -18,6 +25,7 @@ class PublicTimelineShareView(APIView):
     authentication_classes = []  # 認証不要
     permission_classes = []  # パーミッション不要
     
+    @conditional_get(_share_validators, cache_control='public, max-age=60')
     def get(self, request, frontend_id):
         """
         公開設定されたタイムライン詳細を取得
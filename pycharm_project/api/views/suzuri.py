@@ -3,12 +3,17 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 import logging
 import stripe
 
 from api.services.suzuri_api_service import SuzuriAPIService
+from api.services.public_feed_service import refresh_public_feed_entries
+from api.services.generation_stats_service import apply_rollup_change, rollup_state
+from api.services.circuit_breaker import UpstreamUnavailable
+from api.services.deadline import Deadline, DeadlineExceeded
 
 logger = logging.getLogger(__name__)
 
@@ -22,14 +27,20 @@ def create_merchandise(request):
     
     Request Body:
     {
-        "image_url": "https://example.com/image.jpg",
+        "library_id": "uuid-string",  // 元画像のLibrary ID（library_id / frontend_id / image_urlのいずれかで指定）
+        "frontend_id": "frontend-id",  // 元画像のフロントエンドID
+        "image_url": "https://example.com/image.jpg",  // 未指定時は元画像のURLを使用
         "car_name": "NISSAN FAIRLADY Z",
         "description": "オプション説明"
     }
     """
+    # リクエスト全体の時間予算（画像取得・SUZURI API呼び出しを残り時間で制限）
+    deadline = Deadline.for_request()
     try:
         # リクエストデータを取得
         image_url = request.data.get('image_url')
+        library_id = request.data.get('library_id')
+        frontend_id = request.data.get('frontend_id')
         car_name = request.data.get('car_name', 'AISHA生成画像')
         description = request.data.get('description', '')
         item_type = request.data.get('item_type', 'heavyweight-t-shirt')
@@ -41,6 +52,8 @@ def create_merchandise(request):
         
         logger.info(f"SUZURI merchandise creation request:")
         logger.info(f"  image_url: {image_url}")
+        logger.info(f"  library_id: {library_id}")
+        logger.info(f"  frontend_id: {frontend_id}")
         logger.info(f"  car_name: {car_name}")
         logger.info(f"  description: {description}")
         logger.info(f"  item_type: {item_type}")
@@ -50,7 +63,7 @@ def create_merchandise(request):
         logger.info(f"  print_places: {print_places}")
         logger.info(f"  is_multi_printable: {is_multi_printable}")
         
-        if not image_url:
+        if not image_url and not library_id and not frontend_id:
             logger.error("❌ 画像URLが未設定")
             return Response(
                 {'error': '画像URLが必要です'},
@@ -64,12 +77,46 @@ def create_merchandise(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # 元画像のライブラリエントリ（original_image_creator_user_id・グッズ作成回数の加算先）
+        # IDで指定された場合は主キー・frontend_idのインデックスで、URLのみの場合はimage_url_hashのインデックスで引く
+        from api.models.library import Library
+        library_entry = None
+        if library_id or frontend_id:
+            try:
+                library_entry = Library.objects.filter(
+                    **({'pk': library_id} if library_id else {'frontend_id': frontend_id})
+                ).first()
+            except ValidationError:
+                # library_idがUUIDの形式でない
+                library_entry = None
+            if library_entry is None:
+                logger.error(f"❌ ライブラリエントリが見つかりません: library_id={library_id}, frontend_id={frontend_id}")
+                return Response(
+                    {'error': '指定された画像が見つかりません'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            library_lookup = {'pk': library_entry.pk}
+            # 作成者・グッズ作成回数の加算先と印刷する画像を一致させるため、IDで指定された場合は常にエントリの画像を使う
+            # （write-behindの再ホスト前後で、クライアントが持つURLが上流URLのままの場合もある）
+            if image_url and image_url != library_entry.image_url:
+                logger.warning(
+                    f"⚠️ 指定された画像URLがライブラリエントリと異なるため、エントリの画像を使用します: "
+                    f"library_id={library_entry.pk}, image_url={image_url}"
+                )
+            image_url = library_entry.image_url
+        else:
+            library_lookup = Library.image_url_lookup(image_url)
+            try:
+                library_entry = Library.objects.filter(**library_lookup).first()
+            except Exception as e:
+                logger.warning(f"ライブラリエントリ取得エラー: {str(e)}")
+        
         # 画像URLはそのまま使用（アクセス可能であることを確認済み）
         public_image_url = image_url
         
         # SUZURI API サービスを初期化
         try:
-            suzuri_service = SuzuriAPIService()
+            suzuri_service = SuzuriAPIService(deadline=deadline)
             logger.info("✅ SuzuriAPIService 初期化成功")
         except ValueError as e:
             logger.error(f"❌ SuzuriAPIService 初期化失敗: {str(e)}")
@@ -79,14 +126,6 @@ def create_merchandise(request):
                 'detail': 'SUZURI_API_TOKEN環境変数を設定してください'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # ライブラリエントリを事前に取得（original_image_creator_user_idのため）
-        library_entry = None
-        try:
-            from api.models.library import Library
-            library_entry = Library.objects.filter(image_url=public_image_url).first()
-        except Exception as e:
-            logger.warning(f"ライブラリエントリ取得エラー: {str(e)}")
-        
         # トランザクション内で処理
         from django.db import transaction
         
@@ -161,6 +200,9 @@ def create_merchandise(request):
                 result['management_code'] = f"A{temp_merchandise.id:06d}"
                 result['merchandise_id'] = temp_merchandise.id
                 
+        except (UpstreamUnavailable, DeadlineExceeded):
+            # トランザクションはロールバック済み。DRFの例外ハンドラで503/504として返却
+            raise
         except Exception as e:
             # トランザクションが自動的にロールバックされる
             logger.error(f"❌ グッズ作成トランザクション失敗: {str(e)}")
@@ -186,13 +228,24 @@ def create_merchandise(request):
             try:
                 from django.db.models import F
                 
-                # image_urlに一致するLibraryエントリを検索してカウントを増加
+                # 初めてグッズが作成される画像（日次集計のグッズ数に加算する）
+                first_goods_states = [
+                    rollup_state(library)
+                    for library in Library.objects.filter(
+                        **library_lookup, goods_creation_count=0
+                    ).only(*Library.ROLLUP_FIELDS)
+                ]
+                
+                # 元画像のLibraryエントリ（URL指定時はimage_urlが一致するエントリ）のカウントを増加
                 updated_count = Library.objects.filter(
-                    image_url=public_image_url
+                    **library_lookup
                 ).update(goods_creation_count=F('goods_creation_count') + 1)
                 
                 if updated_count > 0:
                     logger.info(f"✅ グッズ作成回数を更新: {updated_count}件のライブラリエントリ")
+                    refresh_public_feed_entries(**library_lookup)
+                    for state in first_goods_states:
+                        apply_rollup_change(state, state._replace(has_goods=True))
                 else:
                     logger.warning(f"⚠️ 画像URLに一致するライブラリエントリが見つかりません: {public_image_url}")
                     
@@ -220,6 +273,8 @@ def create_merchandise(request):
                 'error': result.get('error')
             }, status=status.HTTP_400_BAD_REQUEST)
             
+    except (UpstreamUnavailable, DeadlineExceeded):
+        raise
     except Exception as e:
         logger.error(f"💥 Merchandise creation exception: {str(e)}")
         logger.error(f"💥 Exception type: {type(e)}")
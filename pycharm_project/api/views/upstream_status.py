@@ -0,0 +1,36 @@
+import logging
+
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from api.services.admission import get_engine_states
+from api.services.circuit_breaker import get_circuit_states
+from api.services.http_client import http_client
+from api.services.image_normalizer import image_normalizer
+
+logger = logging.getLogger(__name__)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_upstream_metrics(request):
+    """
+    管理者用：外部API（Tsukuruma / SUZURI / Clipdrop / 画像取得）のホスト別計測値・サーキット状態・エンジン別の実行数/待ち行列・入力画像前処理の計測値を取得
+    値はこのワーカープロセス内での累計
+    """
+    try:
+        return Response({
+            'success': True,
+            'hosts': http_client.get_metrics(),
+            'circuits': get_circuit_states(),
+            'engines': get_engine_states(),
+            'input_normalization': image_normalizer.get_stats(),
+        })
+    except Exception as e:
+        logger.error(f"外部API計測値取得エラー: {str(e)}")
+        return Response({
+            'success': False,
+            'error': '外部API計測値の取得に失敗しました'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
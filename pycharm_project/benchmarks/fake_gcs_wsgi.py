@@ -0,0 +1,96 @@
+"""
+負荷ベンチマーク用のWSGIエントリーポイント
+
+django_project.wsgi と同じアプリケーションを返すが、gcs_upload_service のバケットを
+ローカルディスクに書き込む偽のオブジェクトストアに差し替える（GCSの認証情報・通信なしで再ホストまで実行できる）。
+
+使用例（generation_load.pyが起動する）:
+    FAKE_GCS_DIR=/tmp/fake-gcs gunicorn --pythonpath benchmarks fake_gcs_wsgi:application
+"""
+import base64
+import hashlib
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+
+application = get_wsgi_application()
+
+from api.services.gcs_upload_service import gcs_upload_service  # noqa: E402
+
+_COPY_CHUNK = 1024 * 1024
+
+
+class FakeBlob:
+    """google.cloud.storage.Blobのうち再ホストで使う操作のみを持つ偽のBlob"""
+
+    def __init__(self, bucket: 'FakeBucket', name: str, chunk_size: int | None = None):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = chunk_size or _COPY_CHUNK
+        self.content_type = None
+        self.md5_hash = None
+        self.size = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.bucket.root, self.name)
+
+    @property
+    def public_url(self) -> str:
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    def upload_from_file(self, file_obj, content_type=None, predefined_acl=None, timeout=None, **kwargs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        md5 = hashlib.md5()
+        size = 0
+        with open(self.path, 'wb') as f:
+            while True:
+                chunk = file_obj.read(self.chunk_size)
+                if not chunk:
+                    break
+                md5.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        self.content_type = content_type or self.content_type
+        self.md5_hash = base64.b64encode(md5.digest()).decode()
+        self.size = size
+
+    def upload_from_string(self, data, content_type=None, **kwargs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = data.encode() if isinstance(data, str) else data
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        self.content_type = content_type or self.content_type
+        self.md5_hash = base64.b64encode(hashlib.md5(data).digest()).decode()
+        self.size = len(data)
+
+    def make_public(self, **kwargs):
+        pass
+
+    def exists(self, **kwargs) -> bool:
+        return os.path.exists(self.path)
+
+    def delete(self, **kwargs):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class FakeBucket:
+    """ローカルディレクトリをバケットとして扱う偽のオブジェクトストア"""
+
+    def __init__(self, root: str, name: str = 'fake-bucket'):
+        self.root = root
+        self.name = name
+
+    def blob(self, blob_name: str, chunk_size: int | None = None) -> FakeBlob:
+        return FakeBlob(self, blob_name, chunk_size)
+
+
+gcs_upload_service.bucket = FakeBucket(os.environ.get('FAKE_GCS_DIR') or tempfile.mkdtemp(prefix='fake-gcs-'))
+gcs_upload_service.bucket_name = gcs_upload_service.bucket.name
+gcs_upload_service._initialized = True
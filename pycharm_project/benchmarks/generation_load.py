@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+"""
+メニュー実行（/api/menus/<id>/execute/）のエンドツーエンド負荷ベンチマーク
+
+Tsukuruma代替サーバー（tsukuruma_standin.py）を起動し、gunicornのワーカー構成ごとに
+Djangoアプリ（fake_gcs_wsgi.py: GCSをローカルディスクに差し替え）を起動して同時リクエストを投げる。
+プロンプト展開 → 上流呼び出し → 再ホスト → Library保存までの全経路を通し、
+ワーカー構成ごとのスループット・レイテンシのパーセンタイル・Server-Timingのステージ別p50/p95を出力する。
+
+使用例:
+    python benchmarks/generation_load.py --menu-id 1 --workers sync:4,gthread:2x8 --concurrency 16 --requests 200
+    python benchmarks/generation_load.py --menu-id 1 --latency fixed:2 --error-rate 0.05 --env GCS_REHOST_MODE=write_behind
+
+DATABASE_URL等は通常の設定（.env）を使用する。--menu-idのメニューは事前に作成しておくこと。
+ベンチマークで作成したLibrary・生成計測ログは終了時に削除する（--keep-dataで残す）。
+"""
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from tsukuruma_standin import add_standin_arguments, config_from_args, start_standin  # noqa: E402
+
+_SERVER_TIMING = re.compile(r'([\w-]+);dur=([\d.]+)')
+
+
+def percentile(values: list[float], p: float) -> float:
+    """最近傍法のパーセンタイル（valuesは昇順ソート済み）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def parse_worker_model(spec: str) -> list[str]:
+    """ワーカー構成の指定（sync:4 / gthread:2x8）をgunicornの引数に変換"""
+    worker_class, _, size = spec.partition(':')
+    workers, _, threads = size.partition('x')
+    arguments = ['--worker-class', worker_class, '--workers', workers or '1']
+    if threads:
+        arguments += ['--threads', threads]
+    return arguments
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(worker_spec: str, port: int, env: dict, fake_gcs_dir: str, timeout: int) -> subprocess.Popen:
+    """gunicornでアプリを起動し、ヘルスチェックが通るまで待つ"""
+    command = [
+        sys.executable, '-m', 'gunicorn', 'fake_gcs_wsgi:application',
+        '--pythonpath', BENCHMARK_DIR,
+        '--chdir', PROJECT_DIR,
+        '--bind', f'127.0.0.1:{port}',
+        '--timeout', str(timeout),
+        '--log-level', 'warning',
+        *parse_worker_model(worker_spec),
+    ]
+    process = subprocess.Popen(
+        command,
+        env={**os.environ, **env, 'FAKE_GCS_DIR': fake_gcs_dir},
+        stdout=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicornの起動に失敗しました: {worker_spec}")
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return process
+        except requests.exceptions.RequestException:
+            time.sleep(0.5)
+    stop_app(process)
+    raise RuntimeError(f"gunicornが起動しませんでした: {worker_spec}")
+
+
+def stop_app(process: subprocess.Popen):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+
+def run_load(base_url: str, menu_id: int, payload: dict, user_id: str, concurrency: int, total: int,
+             timeout: float, image_path: str | None) -> dict:
+    """同時実行数concurrencyでtotal件のメニュー実行を投げ、結果を集計"""
+    url = f'{base_url}/api/menus/{menu_id}/execute/'
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+
+    def session() -> requests.Session:
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def one_request(_):
+        data = {**payload, 'user_id': user_id, 'frontend_id': str(uuid.uuid4())}
+        started = time.monotonic()
+        try:
+            if image_path:
+                with open(image_path, 'rb') as f:
+                    response = session().post(url, data=data, files={'image': f}, timeout=timeout)
+            else:
+                response = session().post(url, json=data, timeout=timeout)
+            status_code = response.status_code
+            server_timing = response.headers.get('Server-Timing', '')
+        except requests.exceptions.RequestException:
+            status_code, server_timing = 0, ''
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with lock:
+            results.append((status_code, elapsed_ms, server_timing))
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total)))
+    wall_seconds = time.monotonic() - started
+
+    latencies = sorted(elapsed for status_code, elapsed, _ in results if 200 <= status_code < 300)
+    statuses: dict[str, int] = {}
+    stages: dict[str, list[float]] = {}
+    for status_code, _, server_timing in results:
+        statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+        for name, duration in _SERVER_TIMING.findall(server_timing):
+            stages.setdefault(name, []).append(float(duration))
+
+    return {
+        'requests': total,
+        'succeeded': len(latencies),
+        'statuses': statuses,
+        'wall_seconds': round(wall_seconds, 2),
+        'throughput_rps': round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+        'latency_ms': {f'p{p}': round(percentile(latencies, p), 1) for p in (50, 95, 99)},
+        'stages_ms': {
+            name: {f'p{p}': round(percentile(sorted(values), p), 1) for p in (50, 95)}
+            for name, values in sorted(stages.items())
+        },
+    }
+
+
+def cleanup(user_id: str):
+    """ベンチマークで作成したLibrary・生成計測ログを削除"""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+    django.setup()
+
+    from api.models.generation_run import GenerationRun
+    from api.models.library import Library
+
+    library_count, _ = Library.objects.filter(user_id=user_id).delete()
+    run_count, _ = GenerationRun.objects.filter(user_id=user_id).delete()
+    print(f"🧹 ベンチマークデータ削除: Library {library_count}件, 生成計測ログ {run_count}件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--menu-id', type=int, required=True, help='実行するメニューID')
+    parser.add_argument('--payload', default='{}', help='リクエストボディ（JSON文字列。prompt_variables等）')
+    parser.add_argument('--image', default=None, help='edit用の入力画像ファイル（指定時はmultipartで送信）')
+    parser.add_argument('--workers', default='sync:4,gthread:2x8', help='比較するgunicornのワーカー構成（カンマ区切り）')
+    parser.add_argument('--concurrency', type=int, default=16, help='同時リクエスト数')
+    parser.add_argument('--requests', type=int, default=100, help='ワーカー構成ごとのリクエスト数')
+    parser.add_argument('--timeout', type=int, default=120, help='gunicorn・クライアントのタイムアウト（秒）')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='アプリに渡す環境変数（例: GCS_REHOST_MODE=write_behind）')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力')
+    parser.add_argument('--keep-data', action='store_true', help='作成したLibrary等を削除しない')
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    standin, standin_stats = start_standin(config_from_args(args))
+    standin_host, standin_port = standin.server_address
+    app_env = {
+        'TSUKURUMA_API_HOST': standin_host,
+        'TSUKURUMA_API_PORT': str(standin_port),
+        **dict(item.split('=', 1) for item in args.env),
+    }
+    user_id = f'bench-{uuid.uuid4().hex[:12]}'
+    payload = json.loads(args.payload)
+    fake_gcs_dir = tempfile.mkdtemp(prefix='fake-gcs-')
+
+    reports = {}
+    try:
+        for worker_spec in args.workers.split(','):
+            port = _free_port()
+            process = start_app(worker_spec, port, app_env, fake_gcs_dir, args.timeout)
+            try:
+                reports[worker_spec] = run_load(
+                    f'http://127.0.0.1:{port}', args.menu_id, payload, user_id,
+                    args.concurrency, args.requests, args.timeout, args.image,
+                )
+            finally:
+                stop_app(process)
+    finally:
+        standin.shutdown()
+        shutil.rmtree(fake_gcs_dir, ignore_errors=True)
+        if not args.keep_data:
+            cleanup(user_id)
+
+    if args.json:
+        print(json.dumps({'workers': reports, 'standin': standin_stats.as_dict()}, indent=2))
+        return
+
+    print(f"{'workers':<14} {'ok/total':>9} {'rps':>7} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}  statuses")
+    for worker_spec, report in reports.items():
+        latency = report['latency_ms']
+        print(
+            f"{worker_spec:<14} {report['succeeded']:>4}/{report['requests']:<4} {report['throughput_rps']:>7.2f} "
+            f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f}  {report['statuses']}"
+        )
+    for worker_spec, report in reports.items():
+        stages = ', '.join(
+            f"{name} {values['p50']:.0f}/{values['p95']:.0f}" for name, values in report['stages_ms'].items()
+        )
+        print(f"  {worker_spec} stages p50/p95(ms): {stages}")
+    print(f"📊 代替サーバー: {json.dumps(standin_stats.as_dict())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+管理画面の生成履歴検索のベンチマーク
+
+api_libraryに実データ相当の件数のダミー履歴（日本語・英語混在のプロンプト、メニュー名、ユーザーID）を投入し、
+従来の検索（icontainsによる逐次走査）と全文検索・トライグラムインデックスを使う検索のレイテンシを比較する。
+検索語ごとにp50/p95と、実行計画がインデックスを使っているかを出力する。
+
+使用例:
+    python benchmarks/history_search.py --rows 1000000
+    python benchmarks/history_search.py --rows 200000 --query 夕焼け --query 赤いスポーツカー --query bench-u00042
+
+DATABASE_URL等は通常の設定（.env）を使用する。マイグレーション0033（検索ベクトル・インデックス）適用済みであること。
+投入したダミー履歴は終了時に削除する（--keep-dataで残し、次回は--rows 0で再利用できる）。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.db.models import Q  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from api.models.library import Library  # noqa: E402
+from api.services.generation_history_search_service import (  # noqa: E402
+    build_history_search_filter,
+    search_generation_history,
+)
+from generation_load import percentile  # noqa: E402
+
+USER_PREFIX = 'bench-u'
+
+_COLORS = ['赤い', '青い', '白い', '黒い', 'シルバーの', 'パールホワイトの', 'マットブラックの', 'metallic blue']
+_CARS = ['スポーツカー', 'SUV', 'ミニバン', '軽自動車', 'クラシックカー', 'ピックアップトラック', 'sedan', 'GT-R']
+_SCENES = ['夕焼けの海岸', '雪山の峠道', '桜並木', '夜の首都高', '砂漠のハイウェイ', 'ネオン街', 'サーキット', 'mountain road']
+_STYLES = ['水彩画風', 'アニメ風', '油絵風', 'フォトリアル', 'ピクセルアート', 'cyberpunk style', '浮世絵風', 'low poly']
+_MENUS = ['愛車を着せ替え', 'シーン変更', 'イラスト作成', 'ステッカー作成', '背景差し替え', 'カスタムペイント']
+
+
+def _dummy_prompt(rng: random.Random) -> str:
+    parts = [
+        f"{rng.choice(_COLORS)}{rng.choice(_CARS)}",
+        f"{rng.choice(_SCENES)}を走る",
+        rng.choice(_STYLES),
+    ]
+    if rng.random() < 0.5:
+        parts.append(f"{rng.randint(1960, 2025)}年式、{rng.choice(['ローダウン', 'リフトアップ', 'ワイドボディ', '純正'])}")
+    return '、'.join(parts)
+
+
+def seed(rows: int, users: int, batch_size: int, seed_value: int):
+    """ダミー履歴を投入（検索ベクトルはDBのトリガーが計算する）"""
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    started = time.monotonic()
+    created = 0
+    while created < rows:
+        size = min(batch_size, rows - created)
+        entries = []
+        for _ in range(size):
+            category_id = rng.choice([1, 2, 3])
+            entries.append(Library(
+                user_id=f"{USER_PREFIX}{rng.randrange(users):05d}",
+                frontend_id=str(uuid.uuid4()),
+                image_url=f"https://storage.googleapis.com/bench/{uuid.uuid4()}.png",
+                display_prompt=_dummy_prompt(rng),
+                menu_name=rng.choice(_MENUS),
+                used_form_data={'category': {'id': category_id}},
+                category_id=category_id,
+                timestamp=now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+            ))
+        Library.objects.bulk_create(entries, batch_size=size)
+        created += size
+        print(f"\r🌱 投入中: {created}/{rows}", end='', flush=True)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE api_library')
+    print(f"\n🌱 ダミー履歴 {rows}件を投入しました（{time.monotonic() - started:.1f}秒）")
+
+
+def cleanup():
+    """投入したダミー履歴を削除（関連データを持たないためSQLで一括削除）"""
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM api_library WHERE user_id LIKE %s', [f'{USER_PREFIX}%'])
+        deleted = cursor.rowcount
+    print(f"🧹 ダミー履歴を削除しました: {deleted}件")
+
+
+def _legacy_queryset(search: str):
+    """従来の検索（icontainsによる逐次走査）"""
+    return Library.objects.filter(
+        Q(display_prompt__icontains=search) |
+        Q(menu_name__icontains=search) |
+        Q(user_id__icontains=search)
+    ).order_by('-timestamp')
+
+
+def _measure(make_queryset, page_size: int, repeat: int) -> dict:
+    timings = []
+    count = 0
+    for _ in range(repeat):
+        started = time.monotonic()
+        count = len(list(make_queryset()[:page_size]))
+        timings.append((time.monotonic() - started) * 1000)
+    timings.sort()
+    plan = make_queryset()[:page_size].explain()
+    return {
+        'rows': count,
+        'p50_ms': round(percentile(timings, 50), 1),
+        'p95_ms': round(percentile(timings, 95), 1),
+        'uses_index': 'Bitmap Index Scan' in plan or 'Index Scan' in plan,
+    }
+
+
+def run(queries: list[str], page_size: int, repeat: int) -> dict:
+    reports = {}
+    for search in queries:
+        reports[search] = {
+            'legacy_icontains': _measure(lambda: _legacy_queryset(search), page_size, repeat),
+            'list_indexed': _measure(
+                lambda: Library.objects.filter(build_history_search_filter(search)).order_by('-timestamp'),
+                page_size, repeat,
+            ),
+            'ranked_search': _measure(lambda: search_generation_history(search), page_size, repeat),
+        }
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='投入するダミー履歴の件数（0で投入しない）')
+    parser.add_argument('--users', type=int, default=20000, help='ダミーのユーザー数')
+    parser.add_argument('--batch-size', type=int, default=5000, help='bulk_createの1回あたりの件数')
+    parser.add_argument('--seed', type=int, default=1, help='乱数シード')
+    parser.add_argument('--query', action='append', default=None,
+                        help='検索語（複数指定可。未指定時は日本語・英語・1文字・ユーザーID・該当なしの代表的な語）')
+    parser.add_argument('--page-size', type=int, default=20, help='1回の検索で取得する件数')
+    parser.add_argument('--repeat', type=int, default=20, help='検索語ごとの計測回数')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力')
+    parser.add_argument('--keep-data', action='store_true', help='投入したダミー履歴を削除しない')
+    args = parser.parse_args()
+
+    queries = args.query or ['夕焼け', '赤いスポーツカー', '桜', 'cyberpunk', f'{USER_PREFIX}0004', '該当しない検索語']
+    if args.rows:
+        seed(args.rows, args.users, args.batch_size, args.seed)
+    try:
+        reports = run(queries, args.page_size, args.repeat)
+    finally:
+        if not args.keep_data:
+            cleanup()
+
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+        return
+
+    print(f"{'query':<18} {'method':<17} {'rows':>5} {'p50(ms)':>9} {'p95(ms)':>9}  index")
+    for search, methods in reports.items():
+        for method, report in methods.items():
+            print(
+                f"{search:<18} {method:<17} {report['rows']:>5} {report['p50_ms']:>9.1f} {report['p95_ms']:>9.1f}  "
+                f"{'✅' if report['uses_index'] else '❌'}"
+            )
+
+
+if __name__ == '__main__':
+    main()
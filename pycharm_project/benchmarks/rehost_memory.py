@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+生成画像のS3→GCS再ホストのメモリ使用量ベンチマーク
+
+ローカルHTTPサーバーから指定サイズの画像（ダミーデータ）を配信し、
+- buffered: 従来方式（response.contentに全体を読み込んでからアップロード）
+- streaming: HashingStreamReaderでチャンク単位に転送
+- resumable: streamingに加え、レジューマブルアップロードの部分コミット（サーバーがチャンクの一部のみ受理し、
+  クライアントが受理済みの位置までシークして再送）を模擬し、再送後の内容とMD5が元画像と一致するか確認
+のピークRSSを計測する。計測はサイズ・方式ごとに別プロセスで行う。
+
+使用例:
+    python benchmarks/rehost_memory.py --sizes 5,50,200
+    python benchmarks/rehost_memory.py --sizes 200 --modes streaming,resumable --max-delta-mb 32
+    python benchmarks/rehost_memory.py --sizes 5,50 --gcs   # 実際にGCSへアップロード（認証情報が必要）
+
+--gcs を指定しない場合はアップロード先をチャンク単位で読み捨てる（ダウンロード側のみ計測）。
+--max-delta-mb を指定すると、buffered以外の方式のピークRSSの増分が上限を超えた場合・
+内容が一致しない場合に終了コード1で終了する。
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MB = 1024 * 1024
+_BLOCK = bytes(range(256)) * 256  # 64KB
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    """/<バイト数> に対して指定サイズのダミー画像をストリーミングで返す"""
+
+    def do_GET(self):
+        size = int(self.path.strip('/'))
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        remaining = size
+        while remaining > 0:
+            block = _BLOCK[:remaining]
+            self.wfile.write(block)
+            remaining -= len(block)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _expected_md5(size: int) -> str:
+    """_ImageHandlerが返す内容のMD5（base64）"""
+    md5 = hashlib.md5()
+    remaining = size
+    while remaining > 0:
+        block = _BLOCK[:remaining]
+        md5.update(block)
+        remaining -= len(block)
+    return base64.b64encode(md5.digest()).decode()
+
+
+def _upload_with_partial_commits(reader, chunk_size: int) -> str:
+    """
+    レジューマブルアップロードの部分コミットを模擬（2チャンクに1回、サーバーが半分だけ受理したとして再送）
+    受理した内容のMD5（base64）を返す
+    """
+    committed = hashlib.md5()
+    offset = 0
+    count = 0
+    while True:
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            break
+        count += 1
+        accepted = len(chunk) // 2 if count % 2 and len(chunk) == chunk_size else len(chunk)
+        committed.update(chunk[:accepted])
+        offset += accepted
+        reader.seek(offset)
+    return base64.b64encode(committed.digest()).decode()
+
+
+def _peak_rss_mb() -> float:
+    # Linuxではru_maxrssはKB単位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_child(mode: str, url: str, size: int, use_gcs: bool):
+    """子プロセス: 1回分の転送を実行してピークRSSをJSONで出力"""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+    django.setup()
+
+    from django.conf import settings
+    from api.services.gcs_upload_service import _SPOOL_MAX_MEMORY, HashingStreamReader, gcs_upload_service
+    from api.services.http_client import http_client
+
+    chunk_size = getattr(settings, 'GCS_UPLOAD_CHUNK_SIZE', MB)
+    blob_name = f"benchmarks/rehost/{uuid.uuid4()}.png"
+    if use_gcs:
+        gcs_upload_service._ensure_initialized()
+
+    baseline = _peak_rss_mb()
+    if mode == 'buffered':
+        response = http_client.get(url)
+        response.raise_for_status()
+        data = response.content
+        md5 = hashlib.md5(data).hexdigest()
+        if use_gcs:
+            blob = gcs_upload_service.bucket.blob(blob_name)
+            blob.upload_from_string(data, content_type='image/png')
+            blob.make_public()
+        transferred = len(data)
+    else:
+        with http_client.get(url, stream=True) as response, \
+                tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY) as spool:
+            response.raise_for_status()
+            reader = HashingStreamReader(response.raw, spool)
+            uploaded_md5 = None
+            if use_gcs:
+                blob = gcs_upload_service._upload_stream(blob_name, reader, 'image/png')
+            elif mode == 'resumable':
+                uploaded_md5 = _upload_with_partial_commits(reader, chunk_size)
+            else:
+                while reader.read(chunk_size):
+                    pass
+            md5 = reader.md5_base64
+            transferred = reader.bytes_read
+            if uploaded_md5 is not None and uploaded_md5 != md5:
+                md5 = f'mismatch (uploaded={uploaded_md5}, read={md5})'
+
+    peak = _peak_rss_mb()
+    if use_gcs:
+        blob.delete()
+
+    print(json.dumps({
+        'mode': mode,
+        'size_mb': size / MB,
+        'transferred': transferred,
+        'md5': md5,
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak, 1),
+        'delta_mb': round(peak - baseline, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='5,50,200', help='画像サイズ（MB、カンマ区切り）')
+    parser.add_argument('--modes', default='buffered,streaming,resumable', help='計測する方式（カンマ区切り）')
+    parser.add_argument('--max-delta-mb', type=float, default=None,
+                        help='buffered以外の方式で許容するピークRSSの増分（MB。超えた場合は終了コード1）')
+    parser.add_argument('--gcs', action='store_true', help='実際にGCSへアップロードする')
+    parser.add_argument('--child', nargs=3, metavar=('MODE', 'URL', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, url, size = args.child
+        _run_child(mode, url, int(size), args.gcs)
+        return
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+
+    print(f"{'mode':<10} {'size(MB)':>9} {'peak RSS(MB)':>13} {'delta(MB)':>10}  check")
+    failures = 0
+    try:
+        for size_mb in [float(s) for s in args.sizes.split(',')]:
+            size = int(size_mb * MB)
+            for mode in args.modes.split(','):
+                command = [sys.executable, os.path.abspath(__file__), '--child', mode,
+                           f"http://{host}:{port}/{size}", str(size)]
+                if args.gcs:
+                    command.append('--gcs')
+                output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                problems = []
+                if result['transferred'] != size or (mode != 'buffered' and result['md5'] != _expected_md5(size)):
+                    problems.append('content mismatch')
+                if args.max_delta_mb is not None and mode != 'buffered' and result['delta_mb'] > args.max_delta_mb:
+                    problems.append(f"delta > {args.max_delta_mb:g}MB")
+                failures += bool(problems)
+                print(f"{mode:<10} {size_mb:>9.0f} {result['peak_rss_mb']:>13.1f} {result['delta_mb']:>10.1f}  "
+                      f"{', '.join(problems) or 'ok'}")
+    finally:
+        server.shutdown()
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+Tsukuruma API（/api/images/generate/, /api/images/edit/）のローカル代替サーバー
+
+レイテンシの分布・エラー率・生成画像のサイズを指定して、上流の画像生成APIを模擬する。
+生成結果のURL（image_presigned_url_N）はこのサーバー自身の /images/ を指し、指定サイズのダミー画像を返す。
+
+使用例:
+    python benchmarks/tsukuruma_standin.py --port 8100 --latency lognormal:8,0.4 --error-rate 0.02 --image-kb 300,1500
+    TSUKURUMA_API_HOST=127.0.0.1 TSUKURUMA_API_PORT=8100 python manage.py runserver
+
+レイテンシの指定（秒）:
+    fixed:2             常に2秒
+    uniform:1,5         1〜5秒の一様分布
+    lognormal:8,0.4     中央値8秒・σ=0.4の対数正規分布（実際の生成時間に近い裾の長い分布）
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_BLOCK = bytes(range(256)) * 256  # 64KB
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def parse_distribution(spec: str):
+    """レイテンシ分布の指定（例: lognormal:8,0.4）を、秒数を返す関数に変換"""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        low, high = values
+        return lambda: random.uniform(low, high)
+    if kind == 'lognormal':
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"未対応のレイテンシ分布: {spec}")
+
+
+def parse_size_range(spec: str) -> tuple[int, int]:
+    """画像サイズの指定（KB。例: 800 / 300,1500）をバイト数の範囲に変換"""
+    values = [int(float(v) * 1024) for v in spec.split(',')]
+    return (values[0], values[0]) if len(values) == 1 else (values[0], values[1])
+
+
+@dataclass
+class StandinConfig:
+    generate_latency: str = 'lognormal:8,0.4'
+    edit_latency: str = 'lognormal:10,0.4'
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 300.0
+    image_kb: str = '800'
+    public_host: str = ''
+
+    def __post_init__(self):
+        self.latencies = {
+            'generate': parse_distribution(self.generate_latency),
+            'edit': parse_distribution(self.edit_latency),
+        }
+        self.image_size_range = parse_size_range(self.image_kb)
+
+
+@dataclass
+class StandinStats:
+    """代替サーバー側で観測した件数（ベンチマーク結果の照合用）"""
+    requests: dict = field(default_factory=lambda: {'generate': 0, 'edit': 0})
+    errors: int = 0
+    timeouts: int = 0
+    images_served: int = 0
+    bytes_served: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'images_served': self.images_served,
+                'bytes_served': self.bytes_served,
+            }
+
+
+class _StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config: StandinConfig
+    stats: StandinStats
+
+    def do_POST(self):
+        match = re.fullmatch(r'/api/images/(generate|edit)/', self.path)
+        if not match:
+            self._send_json(404, {'detail': 'Not found'})
+            return
+        operation = match.group(1)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        num_images = self._num_images(body)
+
+        with self.stats.lock:
+            self.stats.requests[operation] += 1
+
+        roll = random.random()
+        if roll < self.config.timeout_rate:
+            with self.stats.lock:
+                self.stats.timeouts += 1
+            time.sleep(self.config.timeout_seconds)
+            self._send_json(504, {'detail': 'Generation timed out'})
+            return
+
+        time.sleep(self.config.latencies[operation]())
+
+        if roll < self.config.timeout_rate + self.config.error_rate:
+            with self.stats.lock:
+                self.stats.errors += 1
+            self._send_json(500, {'detail': 'Generation failed'})
+            return
+
+        host = self.config.public_host or f"{self.server.server_address[0]}:{self.server.server_address[1]}"
+        low, high = self.config.image_size_range
+        data = {
+            f"image_presigned_url_{number}": f"http://{host}/images/{random.randint(low, high)}/{uuid.uuid4()}.png"
+            for number in range(1, num_images + 1)
+        }
+        data['created_at'] = datetime.now(timezone.utc).isoformat()
+        self._send_json(200, data)
+
+    def do_GET(self):
+        match = re.fullmatch(r'/images/(\d+)/[\w-]+\.png', self.path)
+        if not match:
+            self._send_json(404, {'detail': 'Not found'})
+            return
+        size = int(match.group(1))
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        remaining = size
+        first = True
+        while remaining > 0:
+            block = (_PNG_SIGNATURE + _BLOCK[len(_PNG_SIGNATURE):]) if first else _BLOCK
+            block = block[:remaining]
+            self.wfile.write(block)
+            remaining -= len(block)
+            first = False
+        with self.stats.lock:
+            self.stats.images_served += 1
+            self.stats.bytes_served += size
+
+    @staticmethod
+    def _num_images(body: bytes) -> int:
+        """generateはJSON、editはmultipartのnum_imagesを取り出す（未指定は1）"""
+        try:
+            return int(json.loads(body).get('num_images', 1))
+        except (ValueError, AttributeError):
+            pass
+        match = re.search(rb'name="num_images"\r\n\r\n(\d+)', body)
+        return int(match.group(1)) if match else 1
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_standin(config: StandinConfig, host: str = '127.0.0.1', port: int = 0):
+    """
+    代替サーバーをバックグラウンドスレッドで起動
+
+    Returns:
+        tuple[ThreadingHTTPServer, StandinStats]: (サーバー（shutdown()で停止）, 観測件数)
+    """
+    stats = StandinStats()
+    handler = type('StandinHandler', (_StandinHandler,), {'config': config, 'stats': stats})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def add_standin_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', default='lognormal:8,0.4', help='generateのレイテンシ分布（秒）')
+    parser.add_argument('--edit-latency', default=None, help='editのレイテンシ分布（未指定時は--latency）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='500を返す割合（0〜1）')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='応答せずに待たせる割合（0〜1）')
+    parser.add_argument('--timeout-seconds', type=float, default=300.0, help='--timeout-rateで待たせる秒数')
+    parser.add_argument('--image-kb', default='800', help='生成画像のサイズ（KB。範囲指定は 300,1500）')
+
+
+def config_from_args(args) -> StandinConfig:
+    return StandinConfig(
+        generate_latency=args.latency,
+        edit_latency=args.edit_latency or args.latency,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        image_kb=args.image_kb,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    server, stats = start_standin(config_from_args(args), args.host, args.port)
+    host, port = server.server_address
+    print(f"🚗 Tsukuruma代替サーバー起動: http://{host}:{port}/api/images/")
+    print(f"   TSUKURUMA_API_HOST={host} TSUKURUMA_API_PORT={port}")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"📊 {json.dumps(stats.as_dict())}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -210,3 +210,102 @@ if not DEBUG:
 STRIPE_PUBLISHABLE_KEY = env('STRIPE_PUBLISHABLE_KEY', default='')
 STRIPE_SECRET_KEY = env('STRIPE_SECRET_KEY', default='')
 STRIPE_WEBHOOK_SECRET = env('STRIPE_WEBHOOK_SECRET', default='')
+
+# 画像生成ジョブ（非同期実行）設定
+GENERATION_JOB_WORKERS = env.int('GENERATION_JOB_WORKERS', default=4)  # プロセス・エンジンあたりのワーカースレッド数
+# ロングポーリング（?wait=）・冪等性キーでの同期再送時の待ち時間の上限（待機中は同期ワーカーを占有するため短く。コード側でも10秒で打ち切る）
+GENERATION_JOB_LONG_POLL_MAX_SECONDS = env.int('GENERATION_JOB_LONG_POLL_MAX_SECONDS', default=5)
+GENERATION_JOB_REPLAY_WAIT_SECONDS = env.int('GENERATION_JOB_REPLAY_WAIT_SECONDS', default=3)
+GENERATION_JOB_STALE_SECONDS = env.int('GENERATION_JOB_STALE_SECONDS', default=600)  # これ以上更新がないジョブは失敗扱い
+GENERATION_JOB_MAX_QUEUE_SECONDS = env.int('GENERATION_JOB_MAX_QUEUE_SECONDS', default=120)  # 投入からこれ以上待ったジョブは実行せず失敗扱い
+
+# 外部HTTPクライアント（Tsukuruma / SUZURI / Clipdrop / 画像ダウンロード共通）
+HTTP_POOL_CONNECTIONS = env.int('HTTP_POOL_CONNECTIONS', default=10)  # 保持するホスト別プール数
+HTTP_POOL_MAXSIZE = env.int('HTTP_POOL_MAXSIZE', default=10)  # ホストあたりのKeep-Alive接続数
+HTTP_POOL_MAXSIZE_PER_HOST = env.dict('HTTP_POOL_MAXSIZE_PER_HOST', cast={'value': int}, default={})  # 例: "suzuri.jp=4,clipdrop-api.co=2"
+HTTP_CONNECT_TIMEOUT = env.float('HTTP_CONNECT_TIMEOUT', default=5.0)
+HTTP_READ_TIMEOUT = env.float('HTTP_READ_TIMEOUT', default=90.0)
+
+# 時間予算・サーキットブレーカー
+REQUEST_DEADLINE_SECONDS = env.float('REQUEST_DEADLINE_SECONDS', default=110.0)  # gunicornのtimeout(120秒)より短くする
+GENERATION_JOB_DEADLINE_SECONDS = env.float('GENERATION_JOB_DEADLINE_SECONDS', default=300.0)
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = env.int('CIRCUIT_BREAKER_FAILURE_THRESHOLD', default=5)  # 連続失敗でopen
+CIRCUIT_BREAKER_RECOVERY_SECONDS = env.float('CIRCUIT_BREAKER_RECOVERY_SECONDS', default=30.0)  # open状態の継続時間
+
+# 画像生成エンジンごとの同時実行数制限（プロセスあたり）
+ENGINE_MAX_IN_FLIGHT = env.dict('ENGINE_MAX_IN_FLIGHT', cast={'value': int}, default={})  # 例: "midjourney=2,imagen3=6"
+ENGINE_MAX_IN_FLIGHT_DEFAULT = env.int('ENGINE_MAX_IN_FLIGHT_DEFAULT', default=4)
+ENGINE_MAX_QUEUE = env.dict('ENGINE_MAX_QUEUE', cast={'value': int}, default={})  # 待ち行列の上限（超えたら429）
+ENGINE_MAX_QUEUE_DEFAULT = env.int('ENGINE_MAX_QUEUE_DEFAULT', default=8)
+ENGINE_QUEUE_TIMEOUT_SECONDS = env.float('ENGINE_QUEUE_TIMEOUT_SECONDS', default=30.0)  # 待ち行列での最大待機時間
+
+# コンパイル済みプロンプトテンプレートのキャッシュ件数（プロセスあたり）
+PROMPT_TEMPLATE_CACHE_SIZE = env.int('PROMPT_TEMPLATE_CACHE_SIZE', default=256)
+
+# メニュー実行の冪等性キー（Idempotency-Key / frontend_id）
+IDEMPOTENCY_TTL_SECONDS = env.int('IDEMPOTENCY_TTL_SECONDS', default=86400)  # 保存済み結果を再利用する期間
+IDEMPOTENCY_RESULT_MAX_BYTES = env.int('IDEMPOTENCY_RESULT_MAX_BYTES', default=65536)  # これを超える結果は再利用しない
+IDEMPOTENCY_MAX_KEYS = env.int('IDEMPOTENCY_MAX_KEYS', default=100000)  # cleanup_idempotency_keysで保持する上限件数
+
+# 生成画像のGCS再ホスト（ストリーミング転送のチャンクサイズ、256KBの倍数に切り捨て）
+GCS_UPLOAD_CHUNK_SIZE = env.int('GCS_UPLOAD_CHUNK_SIZE', default=1024 * 1024)
+
+# GCS再ホストのモード（sync: 従来通りアップロード完了後に返却 / write_behind: 上流URLで先に返却しバックグラウンドで差し替え）
+GCS_REHOST_MODE = env('GCS_REHOST_MODE', default='sync')
+GCS_REHOST_WORKERS = env.int('GCS_REHOST_WORKERS', default=2)  # プロセスあたりのワーカースレッド数
+GCS_REHOST_RETRIES = env.int('GCS_REHOST_RETRIES', default=3)  # バックグラウンドでの再試行回数
+GCS_REHOST_RETRY_BACKOFF_SECONDS = env.float('GCS_REHOST_RETRY_BACKOFF_SECONDS', default=2.0)
+GCS_REHOST_MAX_ATTEMPTS = env.int('GCS_REHOST_MAX_ATTEMPTS', default=5)  # これを超えたらfailed（reconcile_rehost --include-failedで再試行）
+
+# 一括生成（バッチ実行）
+BATCH_EXECUTION_MAX_ITEMS = env.int('BATCH_EXECUTION_MAX_ITEMS', default=10)
+BATCH_EXECUTION_MAX_IMAGES_PER_ITEM = env.int('BATCH_EXECUTION_MAX_IMAGES_PER_ITEM', default=4)
+BATCH_EXECUTION_CONCURRENCY = env.int('BATCH_EXECUTION_CONCURRENCY', default=4)  # 1リクエスト内で並行に投げる生成数の上限
+BATCH_REHOST_CONCURRENCY = env.int('BATCH_REHOST_CONCURRENCY', default=4)  # 1リクエスト内で並行に行うGCS再ホスト数の上限
+
+# 参照指定された入力画像（愛車写真・生成画像）のローカルキャッシュ
+IMAGE_REF_CACHE_DIR = env('IMAGE_REF_CACHE_DIR', default='')  # 未指定時は一時ディレクトリ配下
+IMAGE_REF_CACHE_MAX_BYTES = env.int('IMAGE_REF_CACHE_MAX_BYTES', default=512 * 1024 * 1024)
+
+# edit入力画像の前処理（向き補正・縮小・メタデータ除去）
+IMAGE_NORMALIZE_ENABLED = env.bool('IMAGE_NORMALIZE_ENABLED', default=True)
+ENGINE_INPUT_MAX_EDGE = env.dict('ENGINE_INPUT_MAX_EDGE', cast={'value': int}, default={})  # 例: "midjourney=1536,imagen3=2048"
+ENGINE_INPUT_MAX_EDGE_DEFAULT = env.int('ENGINE_INPUT_MAX_EDGE_DEFAULT', default=2048)  # 長辺の上限（px）
+IMAGE_NORMALIZE_JPEG_QUALITY = env.int('IMAGE_NORMALIZE_JPEG_QUALITY', default=88)
+IMAGE_NORMALIZE_CACHE_MAX_BYTES = env.int('IMAGE_NORMALIZE_CACHE_MAX_BYTES', default=64 * 1024 * 1024)  # プロセスあたり
+
+# メニュー実行時のクレジット仮押さえ（?charge=true）
+# 有効期限はGENERATION_JOB_MAX_QUEUE_SECONDS + GENERATION_JOB_DEADLINE_SECONDS + 余裕と、下記の最小値の長い方
+CREDIT_RESERVATION_TTL_SECONDS = env.int('CREDIT_RESERVATION_TTL_SECONDS', default=900)  # 最小値
+CREDIT_RESERVATION_TTL_MARGIN_SECONDS = env.int('CREDIT_RESERVATION_TTL_MARGIN_SECONDS', default=300)  # 余裕（ジョブ開始時の延長にも使用）
+
+# タイムラインのキーセットページネーション（?page_size= / ?cursor= 指定時のみ）
+TIMELINE_PAGE_SIZE = env.int('TIMELINE_PAGE_SIZE', default=30)
+TIMELINE_MAX_PAGE_SIZE = env.int('TIMELINE_MAX_PAGE_SIZE', default=100)
+
+# キャッシュ（未指定時はプロセスごとのメモリキャッシュ。例: CACHE_URL=rediscache://redis:6379/1）
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# 公開タイムライン（事前計算済みのPublicFeedEntryをバージョン付きキャッシュ経由で返す）
+PUBLIC_FEED_DEFAULT_LIMIT = env.int('PUBLIC_FEED_DEFAULT_LIMIT', default=50)  # cursor / page_size未指定時の件数
+PUBLIC_FEED_CACHE_TTL_SECONDS = env.int('PUBLIC_FEED_CACHE_TTL_SECONDS', default=300)  # 変更時はバージョンで無効化される
+
+# 管理画面の生成履歴検索（admin/generation-history/search/）
+GENERATION_HISTORY_SEARCH_PAGE_SIZE = env.int('GENERATION_HISTORY_SEARCH_PAGE_SIZE', default=20)
+GENERATION_HISTORY_SEARCH_MAX_PAGE_SIZE = env.int('GENERATION_HISTORY_SEARCH_MAX_PAGE_SIZE', default=50)
+
+# 生成画像・愛車設定画像の派生画像（一覧表示用のWebPサムネイル。元画像の隣に <名前>_w<幅>.webp で保存）
+IMAGE_VARIANTS_ENABLED = env.bool('IMAGE_VARIANTS_ENABLED', default=True)
+IMAGE_VARIANT_WIDTHS = env.list('IMAGE_VARIANT_WIDTHS', cast=int, default=[256, 768])  # 幅（px）
+IMAGE_VARIANT_WEBP_QUALITY = env.int('IMAGE_VARIANT_WEBP_QUALITY', default=80)
+IMAGE_VARIANT_WORKERS = env.int('IMAGE_VARIANT_WORKERS', default=2)  # 保存後にバックグラウンドで作成するワーカースレッド数
+
+# タイムラインの一括操作（timeline/bulk-update/・timeline/bulk-delete/）
+TIMELINE_BULK_MAX_ITEMS = env.int('TIMELINE_BULK_MAX_ITEMS', default=200)  # 1回に操作できる件数
+GCS_DELETE_WORKERS = env.int('GCS_DELETE_WORKERS', default=1)  # 削除後のGCS画像をまとめて削除するワーカー数
+
+# 未保存タイムラインエントリの保持期間（purge_unsaved_timeline。ライブラリ未保存・非公開・グッズ未作成の行とGCSの画像を削除）
+TIMELINE_UNSAVED_RETENTION_DAYS = env.int('TIMELINE_UNSAVED_RETENTION_DAYS', default=0)  # 0: 削除しない
+TIMELINE_RETENTION_CHUNK_SIZE = env.int('TIMELINE_RETENTION_CHUNK_SIZE', default=1000)  # 1トランザクションで削除する行数